@@ -0,0 +1,453 @@
+# Deterministic fast path for common chat question shapes (AI Squad).
+# Questions like "salinity near the equator in March 2023", "5 floats with highest salinity" or
+# "profiles for float 2902222" do not need a multi-second retriever + LLM round-trip to become SQL.
+# This parser pulls out the pieces such questions are made of:
+#
+#   variable      temperature / salinity / pressure (and synonyms: temp, salty, depth, ...)
+#   region        a named region (equator, Arabian Sea, Bay of Bengal, ...) or an explicit bbox
+#                 ("between 10N and 20N, 60E and 70E", "latitude -5 to 5")
+#   dates         "March 2023", "in 2023", "from Jan 2022 to Jun 2022", "2023-01-01 to 2023-03-31",
+#                 "since 2022", "last 30 days"
+#   month         a calendar month without a year ("in March"): a climatological question
+#   depth         "deeper than 1000 m", "between 0 and 200 dbar", "at the surface"
+#   float id      a 7-digit WMO number
+#   top-k / agg   "5 floats with the highest ...", average / max / min, "how many floats"
+#
+# and maps them onto a fixed set of parameterized query templates. A question is only taken when
+# every word in it is accounted for (a recognised piece or a filler word such as "show me the");
+# anything else -- "compare", "trend", "per month", two float ids -- returns None and falls
+# through to the RAG chain, so the fast path never guesses.
+#
+# Regional averages of temperature or salinity without a date range ("average salinity in the
+# Arabian Sea at 100 m in March") can also be answered from the gridded climatology
+# (data_pipeline/climatology.py): such queries carry a `climatology` request, and main_agent
+# uses the grids when they are current. Questions about a calendar month have only that answer
+# (shape "climatology", no SQL); without usable grids they fall through to the RAG chain.
+#
+# Usage: from code, parse_question(question) -> FastPathQuery or None (main_agent calls it first).
+#        python -m ai_core.intent_parser "salinity near the equator in March 2023"
+
+import re
+import sys
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from data_pipeline.climatology import CLIMATOLOGY_VARIABLES
+
+DEFAULT_ROW_LIMIT = 50      # same cap the RAG prompt asks the LLM for
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 500
+
+VARIABLE_SYNONYMS = {
+    "temperature": "temperature", "temperatures": "temperature", "temp": "temperature",
+    "warmest": "temperature", "coldest": "temperature", "hottest": "temperature",
+    "salinity": "salinity", "salinities": "salinity", "psal": "salinity", "saltiest": "salinity",
+    "freshest": "salinity",
+    "pressure": "pressure", "pres": "pressure", "depth": "pressure", "deepest": "pressure",
+}
+# Superlatives that carry both the variable and the ranking direction.
+RANKING_WORDS = {
+    "highest": "desc", "max": "desc", "maximum": "desc", "largest": "desc", "peak": "desc",
+    "warmest": "desc", "hottest": "desc", "saltiest": "desc", "deepest": "desc",
+    "lowest": "asc", "min": "asc", "minimum": "asc", "smallest": "asc",
+    "coldest": "asc", "freshest": "asc",
+}
+AGGREGATIONS = {"average": "AVG", "avg": "AVG", "mean": "AVG", "maximum": "MAX", "max": "MAX",
+                "highest": "MAX", "peak": "MAX", "minimum": "MIN", "min": "MIN", "lowest": "MIN"}
+
+# (lat_min, lat_max, lon_min, lon_max); lon_min > lon_max wraps across the antimeridian.
+REGIONS = {
+    "equator": (-5, 5, -180, 180),
+    "equatorial": (-5, 5, -180, 180),
+    "equatorial indian ocean": (-5, 5, 40, 100),
+    "arabian sea": (5, 25, 50, 78),
+    "bay of bengal": (5, 23, 78, 100),
+    "andaman sea": (5, 20, 92, 100),
+    "laccadive sea": (6, 14, 71, 79),
+    "indian ocean": (-60, 30, 20, 147),
+    "southern ocean": (-90, -60, -180, 180),
+    "pacific ocean": (-60, 60, 120, -70),
+    "pacific": (-60, 60, 120, -70),
+    "atlantic ocean": (-60, 65, -70, 20),
+    "atlantic": (-60, 65, -70, 20),
+    "mediterranean sea": (30, 46, -6, 36),
+    "mediterranean": (30, 46, -6, 36),
+    "tropics": (-23.5, 23.5, -180, 180),
+}
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTHS["sept"] = 9
+
+# Words that may appear in a fast-path question without changing its meaning.
+FILLER = set("""
+a an the of for in at on near around over within inside across from to between and during by with
+show me list give get find display plot fetch return see view tell about i want need can could you please
+what which where is was were are be been has have had do does did there
+data value values reading readings measurement measurements observation observations record records
+profile profiles float floats argo buoy buoys all any recorded observed measured taken
+water waters sea ocean level levels sample samples info information details
+location locations position positions latest current recent most
+""".split())
+
+_NUMBER = r"-?\d+(?:\.\d+)?"
+_MONTH = r"(?:" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_YEAR = r"(?:19|20)\d{2}"
+
+
+class FastPathQuery:
+    """A question the parser understood: its intent, the SQL template and the bound parameters."""
+
+    def __init__(self, shape, intent, sql, params, climatology=None):
+        self.shape = shape
+        self.intent = intent
+        self.sql = sql
+        self.params = params
+        # {variable, bbox, month, depth}: the same question as a climatology lookup, when it is one.
+        self.climatology = climatology
+
+    @property
+    def display_sql(self):
+        """The SQL with parameters written in, for showing to the user (never executed)."""
+        if self.sql is None:
+            return None
+        def literal(match):
+            value = self.params[match.group(1)]
+            if isinstance(value, datetime):
+                return f"'{value:%Y-%m-%d}'"
+            return repr(value) if isinstance(value, str) else str(value)
+        return re.sub(r":(\w+)", literal, self.sql)
+
+    def __repr__(self):
+        return f"FastPathQuery({self.shape}, {self.intent})"
+
+
+# --- Extraction ---
+
+class _Question:
+    """Normalized question text; recognised spans are blanked out as they are consumed."""
+
+    def __init__(self, question):
+        text = question.lower().replace("°", " ").replace(",", " , ")
+        self.text = re.sub(r"\s+", " ", text).strip()
+
+    def take(self, pattern):
+        """All matches of `pattern`, removed from the text."""
+        matches = list(re.finditer(pattern, self.text))
+        if matches:
+            self.text = re.sub(pattern, " ", self.text)
+        return matches
+
+    def leftover(self):
+        words = re.findall(r"[a-z]+|\d+", self.text)
+        return [word for word in words if word not in FILLER]
+
+
+def _month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + (month == 12), month % 12 + 1, 1)
+    return start, end
+
+
+def _extract_dates(q, now):
+    """Returns (date_from, date_to) as a half-open range, (None, None) when absent, or False when ambiguous."""
+    ranges = []
+    for m in q.take(rf"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b"):
+        days = int(m.group(1)) * {"day": 1, "week": 7, "month": 30, "year": 365}[m.group(2)]
+        ranges.append((now - timedelta(days=days), None))
+    for m in q.take(rf"\b(\d{{4}})-(\d{{2}})-(\d{{2}})\b"):
+        day = datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        ranges.append((day, day + timedelta(days=1)))
+    for m in q.take(rf"\b({_MONTH})\s+({_YEAR})\b"):
+        ranges.append(_month_range(int(m.group(2)), MONTHS[m.group(1).rstrip(".")]))
+    for m in q.take(rf"\b(since|after)\s+({_YEAR})\b"):
+        year = int(m.group(2))
+        ranges.append((datetime(year + (m.group(1) == "after"), 1, 1), None))
+    for m in q.take(rf"\bbefore\s+({_YEAR})\b"):
+        ranges.append((None, datetime(int(m.group(1)), 1, 1)))
+    for m in q.take(rf"\b({_YEAR})\b"):
+        year = int(m.group(1))
+        ranges.append((datetime(year, 1, 1), datetime(year + 1, 1, 1)))
+
+    if not ranges:
+        return None, None
+    if len(ranges) == 1:
+        return ranges[0]
+    if len(ranges) == 2 and all(start is not None for start, _ in ranges):
+        # "from March 2023 to June 2023", "between 2023-01-01 and 2023-03-31"
+        (first, _), (last_start, last_end) = sorted(ranges, key=lambda r: r[0])
+        return first, last_end if last_end is not None else last_start
+    return False
+
+
+def _extract_month(q):
+    """A calendar month without a year ("in March", "during July"). Returns 1-12, None, or False."""
+    matches = q.take(rf"\b(?:in|during)\s+({_MONTH})(?!\s*{_YEAR})")
+    if not matches:
+        return None
+    months = {MONTHS[m.group(1).rstrip(".")] for m in matches}
+    return months.pop() if len(months) == 1 else False
+
+
+def _extract_bbox(q):
+    """Explicit coordinates: "10N to 20N", "60E-70E", "latitude -5 to 5". Returns a bbox, None, or False."""
+    lats, lons = [], []
+    for m in q.take(rf"\b({_NUMBER})\s*([nsew])\b"):
+        value = float(m.group(1)) * (-1 if m.group(2) in "sw" else 1)
+        (lats if m.group(2) in "ns" else lons).append(value)
+    for m in q.take(rf"\b(lat|latitude|lon|lng|longitude)s?\s+(?:between\s+|from\s+)?({_NUMBER})\s*(?:and|to|-)\s*({_NUMBER})\b"):
+        (lats if m.group(1).startswith("lat") else lons).extend([float(m.group(2)), float(m.group(3))])
+    if not lats and not lons:
+        return None
+    if len(lats) not in (0, 2) or len(lons) not in (0, 2):
+        return False
+    lat_min, lat_max = sorted(lats) if lats else (-90, 90)
+    lon_min, lon_max = sorted(lons) if lons else (-180, 180)
+    if not (-90 <= lat_min <= 90 and -90 <= lat_max <= 90 and -180 <= lon_min <= 180 and -180 <= lon_max <= 180):
+        return False
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def _extract_depth(q):
+    """Pressure range in dbar (1 dbar ~ 1 m). Returns (min, max), None, or False."""
+    unit = r"\s*(?:m|meters?|metres?|dbar|db|decibars?)\b"
+    found = []
+    for m in q.take(rf"\b(?:at\s+|near\s+)?(?:the\s+)?(?:sea\s+|ocean\s+)?surface\b"):
+        found.append((0.0, 10.0))
+    for m in q.take(rf"\b(?:depths?\s+|pressures?\s+)?between\s+(\d+(?:\.\d+)?)\s*(?:m|dbar)?\s+and\s+(\d+(?:\.\d+)?){unit}"):
+        found.append(tuple(sorted((float(m.group(1)), float(m.group(2))))))
+    for m in q.take(rf"\b(?:deeper than|below|under|greater than|more than|beyond)\s+(\d+(?:\.\d+)?){unit}"):
+        found.append((float(m.group(1)), None))
+    for m in q.take(rf"\b(?:shallower than|above|less than|within|upper|top)\s+(\d+(?:\.\d+)?){unit}"):
+        found.append((None, float(m.group(1))))
+    for m in q.take(rf"\bat\s+(\d+(?:\.\d+)?){unit}"):
+        depth = float(m.group(1))
+        found.append((max(depth - 10, 0), depth + 10))
+    if not found:
+        return None
+    return found[0] if len(found) == 1 else False
+
+
+def _extract_float_ids(q):
+    matches = q.take(r"\b(?:float|wmo|platform)?\s*(?:id|number|no\.?)?\s*#?\s*([1-7]\d{6})\b")
+    return sorted({int(m.group(1)) for m in matches})
+
+
+def _extract_region(q):
+    for name in sorted(REGIONS, key=len, reverse=True):
+        if q.take(rf"\b{name}\b"):
+            return name
+    return None
+
+
+def extract_intent(question, now=None):
+    """
+    Everything the parser recognises in `question`, as a dict, or None when the question
+    has pieces the fast path does not understand (it then belongs to the RAG chain).
+    """
+    now = now or datetime.now()
+    q = _Question(question)
+    intent = {}
+
+    # Depths first: "deeper than 2000 m" must not be read as the year 2000.
+    depth = _extract_depth(q)
+    dates = _extract_dates(q, now)
+    month = _extract_month(q)
+    bbox = _extract_bbox(q)
+    if depth is False or dates is False or bbox is False or month is False:
+        return None
+    date_from, date_to = dates
+    if month is not None and (date_from is not None or date_to is not None):
+        return None
+    float_ids = _extract_float_ids(q)
+    if len(float_ids) > 1:
+        return None
+    region = _extract_region(q)
+    if region is not None and bbox is not None:
+        return None
+
+    counting = (q.take(r"\bhow many\s+(floats|profiles|measurements)\b")
+                or q.take(r"\b(?:number|count) of\s+(floats|profiles|measurements)\b"))
+
+    top = q.take(rf"\b(?:top|first)?\s*(\d{{1,3}})\s+(?:argo\s+)?floats?\b")
+    single = q.take(r"\b(?:which|what)\s+float\b")
+    plural = q.take(r"\bfloats\b")
+    ranking = [m.group(1) for m in q.take(r"\b(" + "|".join(RANKING_WORDS) + r")\b")]
+    aggregation = [AGGREGATIONS[m.group(1)] for m in q.take(r"\b(average|avg|mean)\b")]
+
+    variables = {VARIABLE_SYNONYMS[m.group(1)]
+                 for m in re.finditer(r"\b(" + "|".join(VARIABLE_SYNONYMS) + r")\b", q.text)}
+    for word in ranking:
+        if word in VARIABLE_SYNONYMS:
+            variables.add(VARIABLE_SYNONYMS[word])
+    q.take(r"\b(" + "|".join(VARIABLE_SYNONYMS) + r")\b")
+    if len(variables) > 1:
+        return None
+
+    leftover = q.leftover()
+    if leftover:
+        return None
+
+    intent["variable"] = next(iter(variables), None)
+    intent["float_id"] = float_ids[0] if float_ids else None
+    if region is not None:
+        intent["region"] = region
+        bbox = REGIONS[region]
+    intent["bbox"] = bbox
+    intent["date_from"], intent["date_to"] = date_from, date_to
+    intent["depth"] = depth
+    if month is not None:
+        intent["month"] = month
+    if counting:
+        intent["count"] = counting[0].group(1)
+    if top or single:
+        intent["top_k"] = min(int(top[0].group(1)), MAX_TOP_K) if top else 1
+    elif plural and ranking:
+        # "floats with the highest salinity": a ranking without a count
+        intent["top_k"] = DEFAULT_TOP_K
+    if ranking:
+        intent["order"] = RANKING_WORDS[ranking[0]]
+    if aggregation:
+        intent["aggregation"] = aggregation[0]
+    elif ranking and "top_k" not in intent:
+        intent["aggregation"] = AGGREGATIONS.get(ranking[0], "MAX" if RANKING_WORDS[ranking[0]] == "desc" else "MIN")
+    return intent
+
+
+# --- Query templates ---
+
+def _filters(intent):
+    """WHERE fragments (a hashable tuple, so templates can be cached) and their parameters."""
+    fragments, params = [], {}
+    if intent.get("float_id") is not None:
+        fragments.append("float_id = :float_id")
+        params["float_id"] = intent["float_id"]
+    bbox = intent.get("bbox")
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        if (lat_min, lat_max) != (-90, 90):
+            fragments.append("latitude BETWEEN :lat_min AND :lat_max")
+            params.update(lat_min=lat_min, lat_max=lat_max)
+        if lon_min > lon_max:
+            fragments.append("(longitude >= :lon_min OR longitude <= :lon_max)")
+            params.update(lon_min=lon_min, lon_max=lon_max)
+        elif (lon_min, lon_max) != (-180, 180):
+            fragments.append("longitude BETWEEN :lon_min AND :lon_max")
+            params.update(lon_min=lon_min, lon_max=lon_max)
+    if intent.get("date_from") is not None:
+        fragments.append("profile_date >= :date_from")
+        params["date_from"] = intent["date_from"]
+    if intent.get("date_to") is not None:
+        fragments.append("profile_date < :date_to")
+        params["date_to"] = intent["date_to"]
+    depth = intent.get("depth")
+    if depth is not None:
+        if depth[0] is not None:
+            fragments.append("pressure >= :depth_min")
+            params["depth_min"] = depth[0]
+        if depth[1] is not None:
+            fragments.append("pressure <= :depth_max")
+            params["depth_max"] = depth[1]
+    return tuple(fragments), params
+
+
+@lru_cache(maxsize=256)
+def _template(shape, variable, aggregation, order, filters):
+    """
+    SQL text for one query shape; built once per (shape, variable, filter set) and reused.
+    For the count shape `variable` is what is counted: floats, profiles or measurements.
+    """
+    where = " AND ".join(filters)
+    value_columns = variable or "temperature, salinity"
+    if shape == "top_floats":
+        nonnull = f"{variable} IS NOT NULL"
+        where = " AND ".join((nonnull,) + filters)
+        return (f"SELECT float_id, AVG(latitude) AS latitude, AVG(longitude) AS longitude, "
+                f"{aggregation}({variable}) AS {variable} FROM argo_profiles WHERE {where} "
+                f"GROUP BY float_id ORDER BY {variable} {order.upper()} LIMIT :top_k")
+    if shape == "aggregate":
+        return (f"SELECT {aggregation}({variable}) AS {aggregation.lower()}_{variable}, COUNT(*) AS measurements "
+                f"FROM argo_profiles" + (f" WHERE {where}" if where else ""))
+    if shape == "count":
+        source = "argo_profiles" + (f" WHERE {where}" if where else "")
+        if variable == "floats":
+            return f"SELECT COUNT(DISTINCT float_id) AS floats FROM {source}"
+        if variable == "profiles":
+            return f"SELECT COUNT(*) AS profiles FROM (SELECT DISTINCT float_id, profile_date FROM {source}) AS p"
+        return f"SELECT COUNT(*) AS measurements FROM {source}"
+    if shape == "float_location":
+        return (f"SELECT float_id, profile_date, latitude, longitude FROM argo_profiles WHERE {where} "
+                f"ORDER BY profile_date DESC LIMIT 1")
+    if shape == "float_data":
+        return (f"SELECT float_id, profile_date, latitude, longitude, pressure, {value_columns} "
+                f"FROM argo_profiles WHERE {where} ORDER BY profile_date, pressure LIMIT :row_limit")
+    if shape == "observations":
+        return (f"SELECT float_id, profile_date, latitude, longitude, pressure, {value_columns} "
+                f"FROM argo_profiles WHERE {where} ORDER BY profile_date LIMIT :row_limit")
+    raise ValueError(f"Unknown query shape: {shape}")
+
+
+def climatology_request(intent):
+    """The intent as a climatology lookup (a regional average without dates), or None."""
+    if (intent.get("aggregation") != "AVG" or intent.get("variable") not in CLIMATOLOGY_VARIABLES
+            or intent.get("float_id") is not None or "count" in intent or "top_k" in intent
+            or intent.get("date_from") is not None or intent.get("date_to") is not None):
+        return None
+    return {"variable": intent["variable"], "bbox": intent.get("bbox"), "month": intent.get("month"),
+            "depth": intent.get("depth")}
+
+
+def build_query(intent, question=""):
+    """Maps an intent onto one of the templates; None when no template fits."""
+    if "month" in intent:
+        # Only the climatology answers questions about a calendar month.
+        climatology = climatology_request(intent)
+        return FastPathQuery("climatology", intent, None, {}, climatology) if climatology else None
+
+    filters, params = _filters(intent)
+    variable = intent.get("variable")
+
+    if "count" in intent:
+        return FastPathQuery("count", intent, _template("count", intent["count"], None, None, filters), params)
+    if "top_k" in intent:
+        if variable is None or intent.get("float_id") is not None:
+            return None
+        order = intent.get("order", "desc")
+        aggregation = "MIN" if order == "asc" else "MAX"
+        params["top_k"] = intent["top_k"]
+        return FastPathQuery("top_floats", intent, _template("top_floats", variable, aggregation, order, filters),
+                             params)
+    if "aggregation" in intent:
+        if variable is None:
+            return None
+        return FastPathQuery("aggregate", intent, _template("aggregate", variable, intent["aggregation"], None,
+                                                            filters), params, climatology_request(intent))
+    if intent.get("float_id") is not None:
+        if re.search(r"\b(where|location|position)\b", question.lower()) and variable is None \
+                and len(filters) == 1:
+            return FastPathQuery("float_location", intent, _template("float_location", None, None, None, filters),
+                                 params)
+        params["row_limit"] = DEFAULT_ROW_LIMIT
+        return FastPathQuery("float_data", intent, _template("float_data", variable, None, None, filters), params)
+    if variable is not None and filters:
+        params["row_limit"] = DEFAULT_ROW_LIMIT
+        return FastPathQuery("observations", intent, _template("observations", variable, None, None, filters), params)
+    return None
+
+
+def parse_question(question, now=None):
+    """FastPathQuery for a question with a known shape, or None to fall through to the RAG chain."""
+    intent = extract_intent(question, now=now)
+    if intent is None:
+        return None
+    return build_query(intent, question)
+
+
+if __name__ == "__main__":
+    for asked in sys.argv[1:] or ["salinity near the equator in March 2023"]:
+        parsed = parse_question(asked)
+        if parsed is None:
+            print(f"🟡 {asked!r}: no fast path, falls through to the RAG chain")
+        else:
+            print(f"✅ {asked!r}: {parsed.shape} {parsed.intent}\n   {parsed.display_sql or parsed.climatology}")
@@ -0,0 +1,287 @@
+# Semantic cache of question -> generated SQL, in front of the RAG chain (AI Squad).
+# Users ask the same things over and over with small wording changes; a hit returns the SQL
+# that was generated (and successfully executed) for an earlier question, so the retriever +
+# Gemini round-trip is skipped entirely. Lookups go in two steps:
+#
+#   - exact:    the normalized question text (case / whitespace-insensitive)
+#   - semantic: cosine similarity of all-MiniLM-L6-v2 embeddings against every cached question,
+#               accepted at or above SQL_CACHE_THRESHOLD -- and only if both questions mention the
+#               same numbers, regions, variables, ranking direction / aggregation and months (the
+#               pieces intent_parser recognises), since "top 5 floats" and "top 50 floats", "in the
+#               Arabian Sea" and "in the Bay of Bengal", "highest" and "lowest" embed almost identically
+#
+# Entries are evicted least-recently-used beyond SQL_CACHE_MAX_ENTRIES and expire after
+# SQL_CACHE_TTL_SECONDS. The cache is persisted to SQL_CACHE_PATH (a .npz file, written atomically)
+# and reloaded on start-up, so restarts keep it warm.
+#
+# Usage: from code, SemanticSQLCache(embed_fn=embeddings.embed_query); main_agent wires it up.
+#        python -m ai_core.sql_cache [--clear]     shows (or clears) the persisted cache
+
+import os
+import re
+import time
+import atexit
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ai_core.intent_parser import REGIONS, VARIABLE_SYNONYMS, RANKING_WORDS, AGGREGATIONS, MONTHS
+
+SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", os.path.join("ai_core", "sql_cache.npz"))
+SQL_CACHE_THRESHOLD = float(os.getenv("SQL_CACHE_THRESHOLD", "0.92"))
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "2000"))
+SQL_CACHE_TTL_SECONDS = float(os.getenv("SQL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Persisting is cheap but not free; new entries are flushed at most this often (and at exit).
+SAVE_INTERVAL_SECONDS = 5.0
+
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+# Word lists of the intent parser; synonyms map to the same key ("pacific" / "pacific ocean").
+_KEY_WORDS = (
+    ("regions", REGIONS),
+    ("variables", VARIABLE_SYNONYMS),
+    ("ranking", RANKING_WORDS),
+    ("aggregation", AGGREGATIONS),
+    ("months", MONTHS),
+)
+_KEY_PATTERNS = [
+    (name, table, re.compile(r"\b(" + "|".join(sorted(map(re.escape, table), key=len, reverse=True)) + r")\b"))
+    for name, table in _KEY_WORDS
+]
+
+
+def normalize_question(question: str) -> str:
+    """Exact-match key: lower-case, single spaces, no trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?.! ")
+
+
+def question_literals(question: str) -> tuple:
+    """
+    What a semantic hit must share with the question exactly: its numbers (counts, years,
+    coordinates, float ids) and the regions, variables, ranking directions, aggregations and
+    months it names.
+    """
+    text = question.lower()
+    key = [("numbers", tuple(sorted(NUMBER_PATTERN.findall(text))))]
+    for name, table, pattern in _KEY_PATTERNS:
+        key.append((name, tuple(sorted({repr(table[m.group(1)]) for m in pattern.finditer(text)}))))
+    return tuple(key)
+
+
+class SemanticSQLCache:
+    """
+    Thread-safe LRU/TTL cache of normalized question -> SQL with embedding-similarity lookups.
+    `embed_fn(text) -> vector` is typically HuggingFaceEmbeddings.embed_query; without it the
+    cache still serves exact (normalized) matches.
+    """
+
+    def __init__(self, embed_fn=None, threshold=SQL_CACHE_THRESHOLD, max_entries=SQL_CACHE_MAX_ENTRIES,
+                 ttl_seconds=SQL_CACHE_TTL_SECONDS, path=SQL_CACHE_PATH):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        # key -> {"question", "sql", "created", "embedding"}; order is recency of use.
+        self.entries = OrderedDict()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0,
+                      "evictions": 0, "expirations": 0, "literal_rejections": 0}
+        self._lock = threading.Lock()
+        self._matrix = None          # unit-length embeddings of self.entries, rebuilt lazily
+        self._matrix_keys = []
+        self._dirty = False
+        self._last_save = 0.0
+        # Embedding of the last missed question per thread, so the store() that follows a miss reuses it.
+        self._local = threading.local()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    # --- Lookup / store ---
+
+    def _embed(self, question):
+        vector = np.asarray(self.embed_fn(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _expire(self, now):
+        if self.ttl_seconds is None:
+            return
+        expired = [key for key, entry in self.entries.items() if now - entry["created"] > self.ttl_seconds]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self.stats["expirations"] += len(expired)
+            self._matrix = None
+            self._dirty = True
+
+    def _similarity_index(self):
+        if self._matrix is None:
+            keys = [key for key, entry in self.entries.items() if entry["embedding"] is not None]
+            self._matrix_keys = keys
+            self._matrix = (np.stack([self.entries[key]["embedding"] for key in keys]) if keys
+                            else np.empty((0, 0), dtype=np.float32))
+        return self._matrix, self._matrix_keys
+
+    def lookup(self, question, embedding=None):
+        """
+        Returns (sql, kind, similarity) for a hit, kind being 'exact' or 'semantic', or None.
+        `embedding` may be passed in when the caller already computed it.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._expire(time.time())
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry["sql"], "exact", 1.0
+
+        if self.embed_fn is None and embedding is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        # Embedding happens outside the lock: it is the slow part (~10 ms on CPU).
+        vector = embedding if embedding is not None else self._embed(question)
+        self._local.last = (key, vector)
+
+        with self._lock:
+            matrix, keys = self._similarity_index()
+            if len(keys):
+                similarities = matrix @ vector
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                literals = question_literals(question)
+                for i in candidates[np.argsort(-similarities[candidates])]:
+                    entry = self.entries[keys[i]]
+                    if question_literals(entry["question"]) != literals:
+                        self.stats["literal_rejections"] += 1
+                        continue
+                    self.entries.move_to_end(keys[i])
+                    self.stats["semantic_hits"] += 1
+                    return entry["sql"], "semantic", float(similarities[i])
+            self.stats["misses"] += 1
+        return None
+
+    def store(self, question, sql, embedding=None):
+        """Caches SQL that was generated for `question` and executed successfully."""
+        key = normalize_question(question)
+        last = getattr(self._local, "last", None)
+        if embedding is None and last is not None and last[0] == key:
+            embedding = last[1]
+        elif embedding is None and self.embed_fn is not None:
+            embedding = self._embed(question)
+        with self._lock:
+            self.entries[key] = {"question": question, "sql": sql, "created": time.time(), "embedding": embedding}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self.stats["stores"] += 1
+            self._matrix = None
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= SAVE_INTERVAL_SECONDS
+        if due:
+            self.save()
+
+    def discard_sql(self, sql):
+        """Drops every entry that maps to `sql`; returns how many were removed."""
+        with self._lock:
+            keys = [key for key, entry in self.entries.items() if entry["sql"] == sql]
+            for key in keys:
+                del self.entries[key]
+            if keys:
+                self._matrix = None
+                self._dirty = True
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._matrix = None
+            self._dirty = True
+        self.save()
+
+    def status(self) -> dict:
+        with self._lock:
+            lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            return {
+                "entries": len(self.entries),
+                "threshold": self.threshold,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                **self.stats,
+            }
+
+    # --- Persistence ---
+
+    def save(self):
+        """Writes the cache to `path` (temp file + rename, so a crash never leaves a torn file)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = list(self.entries.items())
+            self._dirty = False
+            self._last_save = time.monotonic()
+        embedded = [entry["embedding"] is not None for _, entry in entries]
+        dim = next((len(entry["embedding"]) for _, entry in entries if entry["embedding"] is not None), 0)
+        embeddings = np.zeros((len(entries), dim), dtype=np.float32)
+        for i, (_, entry) in enumerate(entries):
+            if entry["embedding"] is not None:
+                embeddings[i] = entry["embedding"]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp.npz"
+        try:
+            np.savez(
+                temp_path,
+                keys=np.array([key for key, _ in entries], dtype=str),
+                questions=np.array([entry["question"] for _, entry in entries], dtype=str),
+                sqls=np.array([entry["sql"] for _, entry in entries], dtype=str),
+                created=np.array([entry["created"] for _, entry in entries], dtype=np.float64),
+                embedded=np.array(embedded, dtype=bool),
+                embeddings=embeddings,
+            )
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist SQL cache to {self.path}: {e}")
+
+    def load(self):
+        """Restores entries persisted by save(); a missing or unreadable file just means a cold cache."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                rows = zip(data["keys"], data["questions"], data["sqls"], data["created"],
+                           data["embedded"], data["embeddings"])
+                with self._lock:
+                    for key, question, sql, created, embedded, embedding in rows:
+                        self.entries[str(key)] = {"question": str(question), "sql": str(sql), "created": float(created),
+                                                  "embedding": embedding.copy() if embedded else None}
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                    self._matrix = None
+                    self._expire(time.time())
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable SQL cache {self.path}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the persisted NL-to-SQL cache.")
+    parser.add_argument('--path', default=SQL_CACHE_PATH)
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args()
+
+    cache = SemanticSQLCache(path=args.path)
+    if args.clear:
+        cache.clear()
+        print(f"✅ Cleared {args.path}")
+        return
+    print(f"📋 {len(cache.entries)} cached questions in {args.path}")
+    for entry in list(cache.entries.values())[-20:]:
+        print(f"  {entry['question']!r}\n    -> {entry['sql']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Live ingest subscriptions.
+==========================
+/ws clients subscribe to the profiles the ETL publishes (data_pipeline/ingest_events.py) with
+a filter: a bbox (lat_min, lat_max, lon_min, lon_max; lon_min > lon_max crosses the
+antimeridian), a list of float ids, a time window (start_date / end_date on the profile date),
+or any mix of these. Every filter given must match.
+
+Matching does not scan the subscriptions for every event. Each subscription is indexed once,
+on its most selective part:
+    float ids   float_id -> subscriptions
+    bbox        1-degree grid cell (the grid_cell of schema.py) -> subscriptions; bboxes covering
+                more than INGEST_GRID_MAX_CELLS of those go into a coarse 10-degree grid instead,
+                so a basin-sized filter costs tens of entries rather than thousands
+    neither     a short list checked for every event
+An event only looks up its own float and its fine and coarse cells, then the candidates get
+the exact check.
+
+Configuration (environment):
+    INGEST_SUBSCRIPTIONS_PER_CLIENT  subscriptions one connection may hold (default 20)
+    INGEST_GRID_MAX_CELLS            largest bbox, in cells, kept in the grid (default 2000)
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from data_pipeline.schema import grid_cell, bbox_cell_ranges
+
+MAX_SUBSCRIPTIONS_PER_CLIENT = int(os.getenv("INGEST_SUBSCRIPTIONS_PER_CLIENT", "20"))
+GRID_MAX_CELLS = int(os.getenv("INGEST_GRID_MAX_CELLS", "2000"))
+
+BBOX_FIELDS = ("lat_min", "lat_max", "lon_min", "lon_max")
+COARSE_DEGREES = 10
+COARSE_COLUMNS = 360 // COARSE_DEGREES
+
+
+class SubscriptionError(ValueError):
+    """A subscribe_ingest message that cannot be honoured."""
+
+
+def coarse_cell(latitude: float, longitude: float) -> int:
+    row = int(min(max(latitude, -90), 89.999) + 90) // COARSE_DEGREES
+    return row * COARSE_COLUMNS + (int((longitude + 180) // COARSE_DEGREES) % COARSE_COLUMNS)
+
+
+def coarse_cells(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> List[int]:
+    """The coarse cells covering a bbox (lon_min > lon_max crosses the antimeridian)."""
+    first_row, last_row = coarse_cell(lat_min, -180) // COARSE_COLUMNS, coarse_cell(lat_max, -180) // COARSE_COLUMNS
+    first_col = coarse_cell(0, min(lon_min, 179.999)) % COARSE_COLUMNS
+    last_col = coarse_cell(0, min(lon_max, 179.999)) % COARSE_COLUMNS
+    if lon_min <= lon_max:
+        columns = range(first_col, last_col + 1)
+    else:
+        columns = list(range(first_col, COARSE_COLUMNS)) + list(range(0, last_col + 1))
+    return [row * COARSE_COLUMNS + col for row in range(first_row, last_row + 1) for col in columns]
+
+
+def _timestamp(value) -> Optional[datetime]:
+    if value is None or value == "":
+        return None
+    try:
+        return pd.Timestamp(value).tz_localize(None).to_pydatetime()
+    except (TypeError, ValueError) as e:
+        raise SubscriptionError(f"Invalid date: {value}") from e
+
+
+class Subscription:
+    """One filter of one client."""
+
+    def __init__(self, client_id: int, subscription_id: str, bbox: Optional[Tuple[float, float, float, float]] = None,
+                 float_ids: Optional[Iterable[int]] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None):
+        self.client_id = client_id
+        self.id = subscription_id
+        self.bbox = bbox
+        self.float_ids = set(float_ids) if float_ids else None
+        self.start = start
+        self.end = end
+
+    @property
+    def key(self):
+        return (self.client_id, self.id)
+
+    @classmethod
+    def from_message(cls, client_id: int, message: dict) -> "Subscription":
+        """Parses {"id", "lat_min", "lat_max", "lon_min", "lon_max", "float_ids", "start_date", "end_date"}."""
+        subscription_id = str(message.get("id") or "default")
+        bbox = None
+        given = [message.get(name) for name in BBOX_FIELDS]
+        if any(value is not None for value in given):
+            if any(value is None for value in given):
+                raise SubscriptionError("A bbox needs lat_min, lat_max, lon_min and lon_max")
+            try:
+                lat_min, lat_max, lon_min, lon_max = (float(value) for value in given)
+            except (TypeError, ValueError) as e:
+                raise SubscriptionError("bbox values must be numbers") from e
+            if not (-90 <= lat_min <= lat_max <= 90 and -180 <= lon_min <= 180 and -180 <= lon_max <= 180):
+                raise SubscriptionError("bbox out of range (lat -90..90 with lat_min <= lat_max, lon -180..180)")
+            bbox = (lat_min, lat_max, lon_min, lon_max)
+        float_ids = message.get("float_ids")
+        if float_ids is not None:
+            float_ids = [float_ids] if isinstance(float_ids, (str, int)) else float_ids
+            try:
+                float_ids = {int(f) for f in float_ids}
+            except (TypeError, ValueError) as e:
+                raise SubscriptionError("float_ids must be integers") from e
+        start, end = _timestamp(message.get("start_date")), _timestamp(message.get("end_date"))
+        if start is not None and end is not None and start > end:
+            raise SubscriptionError("start_date is after end_date")
+        return cls(client_id, subscription_id, bbox, float_ids, start, end)
+
+    def describe(self) -> dict:
+        return {
+            "id": self.id,
+            **(dict(zip(BBOX_FIELDS, self.bbox)) if self.bbox else {}),
+            "float_ids": sorted(self.float_ids) if self.float_ids else None,
+            "start_date": self.start.isoformat() if self.start else None,
+            "end_date": self.end.isoformat() if self.end else None,
+        }
+
+    def matches(self, event: dict, when: Optional[datetime] = None) -> bool:
+        """Exact check; `when` is the event's parsed time."""
+        if self.float_ids is not None and event.get("float_id") not in self.float_ids:
+            return False
+        if self.bbox is not None:
+            latitude, longitude = event.get("latitude"), event.get("longitude")
+            if latitude is None or longitude is None:
+                return False
+            lat_min, lat_max, lon_min, lon_max = self.bbox
+            if not lat_min <= latitude <= lat_max:
+                return False
+            if lon_min <= lon_max:
+                if not lon_min <= longitude <= lon_max:
+                    return False
+            elif lon_max < longitude < lon_min:
+                return False
+        if self.start is not None or self.end is not None:
+            if when is None:
+                return False
+            if (self.start is not None and when < self.start) or (self.end is not None and when > self.end):
+                return False
+        return True
+
+
+class SubscriptionIndex:
+    """Every client's subscriptions, indexed by float id and grid cell."""
+
+    def __init__(self, grid_max_cells: int = GRID_MAX_CELLS, per_client: int = MAX_SUBSCRIPTIONS_PER_CLIENT):
+        self.grid_max_cells = grid_max_cells
+        self.per_client = per_client
+        self.subscriptions: Dict[Tuple[int, str], Subscription] = {}
+        self.by_client: Dict[int, Set[Tuple[int, str]]] = {}
+        self.by_float: Dict[int, Set[Tuple[int, str]]] = {}
+        self.by_cell: Dict[int, Set[Tuple[int, str]]] = {}
+        self.by_coarse_cell: Dict[int, Set[Tuple[int, str]]] = {}
+        self.unindexed: Set[Tuple[int, str]] = set()
+        self._cells: Dict[Tuple[int, str], Tuple[Dict[int, Set[Tuple[int, str]]], List[int]]] = {}
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def add(self, subscription: Subscription):
+        """Adds (or replaces, by client and id) a subscription."""
+        key = subscription.key
+        self.remove(*key)
+        keys = self.by_client.setdefault(subscription.client_id, set())
+        if len(keys) >= self.per_client:
+            raise SubscriptionError(f"At most {self.per_client} ingest subscriptions per connection")
+        keys.add(key)
+        self.subscriptions[key] = subscription
+
+        if subscription.float_ids is not None:
+            for float_id in subscription.float_ids:
+                self.by_float.setdefault(float_id, set()).add(key)
+            return
+        if subscription.bbox is not None:
+            ranges = bbox_cell_ranges(*subscription.bbox)
+            if sum(hi - lo + 1 for lo, hi in ranges) <= self.grid_max_cells:
+                grid, cells = self.by_cell, [cell for lo, hi in ranges for cell in range(lo, hi + 1)]
+            else:
+                grid, cells = self.by_coarse_cell, coarse_cells(*subscription.bbox)
+            for cell in cells:
+                grid.setdefault(cell, set()).add(key)
+            self._cells[key] = (grid, cells)
+            return
+        self.unindexed.add(key)
+
+    def remove(self, client_id: int, subscription_id: str) -> bool:
+        key = (client_id, subscription_id)
+        subscription = self.subscriptions.pop(key, None)
+        if subscription is None:
+            return False
+        self.by_client.get(client_id, set()).discard(key)
+        if not self.by_client.get(client_id):
+            self.by_client.pop(client_id, None)
+        for float_id in subscription.float_ids or ():
+            _discard(self.by_float, float_id, key)
+        grid, cells = self._cells.pop(key, (None, ()))
+        for cell in cells:
+            _discard(grid, cell, key)
+        self.unindexed.discard(key)
+        return True
+
+    def remove_client(self, client_id: int) -> int:
+        keys = list(self.by_client.get(client_id, ()))
+        for _, subscription_id in keys:
+            self.remove(client_id, subscription_id)
+        return len(keys)
+
+    def client_subscriptions(self, client_id: int) -> List[Subscription]:
+        return [self.subscriptions[key] for key in sorted(self.by_client.get(client_id, ()))]
+
+    def candidates(self, event: dict) -> Set[Tuple[int, str]]:
+        keys = set(self.unindexed)
+        keys |= self.by_float.get(event.get("float_id"), set())
+        latitude, longitude = event.get("latitude"), event.get("longitude")
+        if latitude is not None and longitude is not None:
+            if self.by_cell:
+                keys |= self.by_cell.get(grid_cell(latitude, longitude), set())
+            if self.by_coarse_cell:
+                keys |= self.by_coarse_cell.get(coarse_cell(latitude, longitude), set())
+        return keys
+
+    def match(self, events: Iterable[dict]) -> Dict[Tuple[int, str], List[dict]]:
+        """{(client_id, subscription_id): [matching events]} for a batch of events."""
+        matched: Dict[Tuple[int, str], List[dict]] = {}
+        if not self.subscriptions:
+            return matched
+        for event in events:
+            keys = self.candidates(event)
+            if not keys:
+                continue
+            when = _event_time(event)
+            for key in keys:
+                if self.subscriptions[key].matches(event, when):
+                    matched.setdefault(key, []).append(event)
+        return matched
+
+
+def _discard(index: dict, bucket, key):
+    keys = index.get(bucket)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[bucket]
+
+
+def _event_time(event: dict) -> Optional[datetime]:
+    value = event.get("time")
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
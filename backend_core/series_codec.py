@@ -0,0 +1,139 @@
+"""
+Decimation and compact encodings for plotted series.
+====================================================
+The profile and timeseries endpoints return columns of numbers that end up in a chart.
+Two things keep those responses small without changing what the chart looks like:
+
+Decimation (lttb): Largest-Triangle-Three-Buckets keeps, from each of `points` buckets, the
+sample that spans the largest triangle with its neighbours, so peaks, dips and inflections
+survive while flat stretches are thinned. First and last samples are always kept.
+
+Encodings (format=):
+    json    the endpoint's JSON model (default)
+    arrow   an Arrow IPC stream, one record batch; column types and the response metadata in
+            the schema (needs pyarrow)
+    f32     packed little-endian arrays: b"FCB1", a uint32 header length, a UTF-8 JSON header
+            {"fields": [{"name", "dtype", "length"}], ...metadata}, zero padding to 8 bytes,
+            then each field's array in order. Values are float32; times are float64 seconds
+            since the epoch (float32 cannot hold them to the second)
+"""
+
+import json
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+SERIES_FORMATS = ("json", "arrow", "f32")
+BINARY_MAGIC = b"FCB1"
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "f32": "application/octet-stream",
+}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices (ascending) of at most `points` samples of (x, y) chosen by LTTB; x must be sorted."""
+    n = len(x)
+    if points <= 0 or n <= points or n <= 2:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])[:points]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges over the samples between the fixed first and last ones.
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # The next bucket's mean (the last sample for the final bucket) is the third vertex.
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            cx, cy = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        bx, by = x[start:end], y[start:end]
+        areas = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def decimate(columns: Dict[str, np.ndarray], x: str, y: str, points: int) -> Dict[str, np.ndarray]:
+    """All `columns` at the LTTB picks of (columns[x], columns[y])."""
+    keep = lttb(columns[x], columns[y], points)
+    if len(keep) == len(columns[x]):
+        return columns
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def to_epoch_seconds(times: np.ndarray) -> np.ndarray:
+    return times.astype("datetime64[ms]").astype(np.int64) / 1000.0
+
+
+def encode_f32(columns: Dict[str, np.ndarray], metadata: Optional[dict] = None) -> bytes:
+    """The packed binary layout described above; datetime64 columns become float64 epoch seconds."""
+    fields, arrays = [], []
+    for name, values in columns.items():
+        if np.issubdtype(values.dtype, np.datetime64):
+            array = to_epoch_seconds(values).astype("<f8")
+            dtype = "float64"
+        else:
+            array = np.asarray(values, dtype="<f4")
+            dtype = "float32"
+        fields.append({"name": name, "dtype": dtype, "length": len(array)})
+        arrays.append(array)
+    header = json.dumps({"fields": fields, **(metadata or {})}, default=str).encode()
+    padding = (-(len(BINARY_MAGIC) + 4 + len(header))) % 8
+    body = [BINARY_MAGIC, struct.pack("<I", len(header) + padding), header, b"\0" * padding]
+    return b"".join(body + [array.tobytes() for array in arrays])
+
+
+def decode_f32(data: bytes) -> tuple:
+    """(metadata, columns) from encode_f32's bytes; the reference reader for clients."""
+    if data[:4] != BINARY_MAGIC:
+        raise ValueError("Not an FCB1 payload")
+    (header_length,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + header_length].rstrip(b"\0"))
+    offset, columns = 8 + header_length, {}
+    for field in header.pop("fields"):
+        dtype = np.dtype("<f8" if field["dtype"] == "float64" else "<f4")
+        columns[field["name"]] = np.frombuffer(data, dtype=dtype, count=field["length"], offset=offset)
+        offset += dtype.itemsize * field["length"]
+    return header, columns
+
+
+def encode_arrow(columns: Dict[str, np.ndarray], metadata: Optional[dict] = None) -> bytes:
+    """One record batch as an Arrow IPC stream; float columns as float32, times as timestamp[ms]."""
+    arrays, names = [], []
+    for name, values in columns.items():
+        if np.issubdtype(values.dtype, np.datetime64):
+            arrays.append(pa.array(values.astype("datetime64[ms]")))
+        else:
+            arrays.append(pa.array(np.asarray(values, dtype=np.float32)))
+        names.append(name)
+    batch = pa.RecordBatch.from_arrays(arrays, names=names)
+    schema = batch.schema.with_metadata({key: json.dumps(value, default=str) for key, value in (metadata or {}).items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+    return sink.getvalue().to_pybytes()
+
+
+def encode_series(format: str, columns: Dict[str, np.ndarray], metadata: Optional[dict] = None) -> bytes:
+    if format == "arrow":
+        if not ARROW_AVAILABLE:
+            raise ValueError("Arrow responses need pyarrow")
+        return encode_arrow(columns, metadata)
+    if format == "f32":
+        return encode_f32(columns, metadata)
+    raise ValueError(f"Unsupported binary format: {format}")
@@ -0,0 +1,236 @@
+"""
+WebSocket broadcast hub.
+========================
+Every /ws connection gets a bounded send queue and its own writer task; nothing else ever
+writes to the socket. Broadcasting serializes a message once and drops it into the queue of
+each subscribed client without awaiting any of them, so the writers send concurrently and a
+slow or half-dead client only ever delays itself.
+
+Slow consumers: when a broadcast finds a client's queue full, the policy decides:
+    drop_oldest   discard the oldest queued message to make room (default; progress-style
+                  messages are superseded by newer ones anyway)
+    drop_newest   discard the new message
+    disconnect    close the client (code 1013, try again later)
+Messages addressed to one client (its chat stream, replies) wait for queue space instead of
+being dropped, so a client that cannot keep up slows down only its own stream.
+
+Topics: broadcasts carry a topic (e.g. "chat", "exports"); a client receives the topics it
+subscribed to, every topic when it did not say. Clients pick topics with ?topics=a,b on
+connect or {"type": "subscribe" | "unsubscribe", "topics": [...]} later.
+
+Liveness: a client with nothing to send for WS_HEARTBEAT_SECONDS is sent {"type": "ping"};
+one that has sent nothing (a pong counts) for WS_IDLE_TIMEOUT is closed (code 1001), as is
+one whose single send takes longer than WS_SEND_TIMEOUT.
+
+Configuration (environment):
+    WS_QUEUE_SIZE          messages buffered per client (default 256)
+    WS_SLOW_CLIENT_POLICY  drop_oldest | drop_newest | disconnect (default drop_oldest)
+    WS_HEARTBEAT_SECONDS   idle interval before a ping (default 25)
+    WS_IDLE_TIMEOUT        seconds without a message from the client before closing (default 90; 0 = never)
+    WS_SEND_TIMEOUT        seconds one send may take before the client is closed (default 10)
+"""
+
+import os
+import json
+import time
+import asyncio
+import itertools
+from typing import Dict, Iterable, Optional
+
+DEFAULT_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+DEFAULT_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+DEFAULT_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "25"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "90"))
+DEFAULT_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+SLOW_CLIENT_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+# Close codes (RFC 6455): going away, and try again later.
+CLOSE_IDLE = 1001
+CLOSE_SLOW = 1013
+
+_PING = json.dumps({"type": "ping"})
+
+
+class ClientGone(Exception):
+    """The hub closed this client (slow, idle or shutting down)."""
+
+
+def encode(message: dict) -> str:
+    return json.dumps(message, default=str)
+
+
+class Client:
+    """One connection: its socket, send queue, topics and writer task."""
+
+    def __init__(self, hub: "BroadcastHub", websocket, client_id: int, topics: Optional[Iterable[str]] = None):
+        self.hub = hub
+        self.websocket = websocket
+        self.id = client_id
+        self.topics = set(topics) if topics else None          # None: every topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=hub.queue_size)
+        self.last_seen = time.monotonic()
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self.writer: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    def wants(self, topic: Optional[str]) -> bool:
+        return self.topics is None or topic is None or topic in self.topics
+
+    def subscribe(self, topics: Iterable[str]):
+        self.topics = (self.topics or set()) | set(topics)
+
+    def unsubscribe(self, topics: Iterable[str]):
+        # Unsubscribing from "everything" leaves the hub's known topics minus these.
+        current = self.topics if self.topics is not None else set(self.hub.known_topics)
+        self.topics = current - set(topics)
+
+    def touch(self):
+        """Marks the client alive; call on every message received from it."""
+        self.last_seen = time.monotonic()
+
+    def offer(self, text: str) -> bool:
+        """Queues a broadcast without waiting; applies the slow-client policy when full."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+        self.dropped += 1
+        self.hub.stats["dropped"] += 1
+        if self.hub.policy == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.put_nowait(text)
+            return True
+        if self.hub.policy == "disconnect":
+            self.hub.stats["slow_disconnects"] += 1
+            asyncio.ensure_future(self.close(CLOSE_SLOW, "slow consumer"))
+        return False
+
+    async def _unless_closed(self, awaitable):
+        """Awaits `awaitable`, abandoning it with ClientGone if the client is closed meanwhile."""
+        task = asyncio.ensure_future(awaitable)
+        closed = asyncio.ensure_future(self._closed.wait())
+        done, _ = await asyncio.wait({task, closed}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            closed.cancel()
+            return task.result()
+        task.cancel()
+        raise ClientGone(self.close_reason)
+
+    async def receive_json(self):
+        """Next message from the client; raises ClientGone as soon as the hub closes it."""
+        message = await self._unless_closed(self.websocket.receive_json())
+        self.touch()
+        return message
+
+    async def send(self, message: dict):
+        """Queues a message for this client only, waiting for space rather than dropping it."""
+        if self.closed:
+            raise ClientGone(self.close_reason)
+        text = encode(message)
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            await self._unless_closed(self.queue.put(text))
+
+    async def run_writer(self):
+        hub = self.hub
+        try:
+            while not self.closed:
+                try:
+                    text = await asyncio.wait_for(self.queue.get(), timeout=hub.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if hub.idle_timeout and time.monotonic() - self.last_seen > hub.idle_timeout:
+                        hub.stats["idle_disconnects"] += 1
+                        await self.close(CLOSE_IDLE, "idle")
+                        return
+                    text = _PING
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=hub.send_timeout)
+                self.sent += 1
+                hub.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            hub.stats["slow_disconnects"] += 1
+            await self.close(CLOSE_SLOW, "send timeout")
+        except Exception:
+            # The peer is gone; the reader side notices and unregisters the client.
+            await self.close(None, "send failed")
+
+    async def close(self, code: Optional[int] = None, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        self._closed.set()
+        self.hub.unregister(self)
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        if code is not None:
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code, reason=reason), timeout=self.hub.send_timeout)
+            except Exception:
+                pass
+
+
+class BroadcastHub:
+    """Registry of connected clients; broadcasts fan out through each client's queue."""
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, policy: str = DEFAULT_SLOW_CLIENT_POLICY,
+                 heartbeat_seconds: float = DEFAULT_HEARTBEAT_SECONDS, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 send_timeout: float = DEFAULT_SEND_TIMEOUT):
+        if policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow-client policy: {policy} (use {', '.join(SLOW_CLIENT_POLICIES)})")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.heartbeat_seconds = heartbeat_seconds
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.clients: Dict[int, Client] = {}
+        self.known_topics = set()
+        self._ids = itertools.count(1)
+        self.stats = {"published": 0, "delivered": 0, "sent": 0, "dropped": 0,
+                      "slow_disconnects": 0, "idle_disconnects": 0}
+
+    def __len__(self):
+        return len(self.clients)
+
+    def connect(self, websocket, topics: Optional[Iterable[str]] = None) -> Client:
+        """Registers an accepted socket and starts its writer."""
+        client = Client(self, websocket, next(self._ids), topics)
+        self.clients[client.id] = client
+        client.writer = asyncio.create_task(client.run_writer())
+        return client
+
+    def unregister(self, client: Client):
+        self.clients.pop(client.id, None)
+
+    async def disconnect(self, client: Client, code: Optional[int] = None):
+        """Unregisters a client (its reader ended) and stops its writer."""
+        await client.close(code)
+
+    def publish(self, message: dict, topic: Optional[str] = None) -> int:
+        """Queues `message` for every client subscribed to `topic`; returns how many took it."""
+        if topic is not None:
+            self.known_topics.add(topic)
+        if not self.clients:
+            return 0
+        text = encode(message)
+        delivered = sum(client.offer(text) for client in list(self.clients.values()) if client.wants(topic))
+        self.stats["published"] += 1
+        self.stats["delivered"] += delivered
+        return delivered
+
+    def status(self) -> dict:
+        queued = [client.queue.qsize() for client in self.clients.values()]
+        return {"clients": len(self.clients), "policy": self.policy, "queue_size": self.queue_size,
+                "max_queued": max(queued, default=0), **self.stats}
+
+    async def close_all(self, code: int = CLOSE_IDLE):
+        for client in list(self.clients.values()):
+            await client.close(code, "server shutdown")
@@ -0,0 +1,82 @@
+# Benchmark: /api/stats from the ETL-maintained counters (archive_stats.py) vs a full-table scan.
+# Usage: python -m benchmarks.bench_archive_stats [--rows 500000,2000000] [--repeat 20] [--publishes 20]
+# For each archive size, builds a synthetic argo_profiles table in a throwaway SQLite file (indexed
+# on float_id, profile_date as the managed schema is) and times the old stats query (COUNT(DISTINCT),
+# COUNT(*), MAX over argo_profiles) against the queries /api/stats now runs: the one-row counters
+# plus the indexed active-floats count. It then publishes small loads (a new cycle for a few floats),
+# times the float_summary + counter refresh publish_staged_load runs for them, and checks with the
+# reconcile job that the counters still match a full scan.
+
+import os
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from data_pipeline.archive_stats import refresh_summary_and_stats, reconcile_archive_stats
+from benchmarks.load_test_backend import build_sqlite_database
+
+OLD_QUERY = "SELECT COUNT(DISTINCT float_id), COUNT(*), MAX(profile_date) FROM argo_profiles"
+COUNTER_QUERIES = [
+    ("SELECT floats, profiles, levels, last_date, updated_at, reconciled_at FROM archive_stats WHERE id = 1", {}),
+    ("SELECT COUNT(*) FROM float_summary WHERE last_date >= :since", {"since": datetime(2023, 10, 1)}),
+]
+
+
+def median_ms(connection, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sql, params in queries:
+            connection.execute(text(sql), params).fetchall()
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1000
+
+
+def publish_new_cycle(engine, rng, floats_per_load):
+    """A small load: one new cycle for a few floats, then the counters, in one transaction."""
+    with engine.begin() as connection:
+        float_ids = [int(f) for f in 2900000 + rng.choice(400, floats_per_load, replace=False)]
+        for float_id in float_ids:
+            cycle = connection.execute(text("SELECT MAX(cycle_number) FROM argo_profiles WHERE float_id = :f"),
+                                       {"f": float_id}).scalar() + 1
+            date = datetime(2024, 3, 1) + timedelta(days=int(rng.integers(0, 30)))
+            connection.execute(text("""INSERT INTO argo_profiles VALUES (:p, :f, :c, :d, 5.0, 70.0, :pr, 20.0, 35.0)"""),
+                               [{"p": str(float_id), "f": float_id, "c": cycle, "d": date, "pr": float(pr)}
+                                for pr in range(0, 2000, 20)])
+        start = time.perf_counter()
+        refresh_summary_and_stats(connection, float_ids)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counter-backed /api/stats vs a full scan.")
+    parser.add_argument('--rows', default="500000,2000000")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--publishes', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'full scan ms':>13} {'counters ms':>12} {'publish upkeep ms':>18}  reconcile")
+    for rows in [int(r) for r in args.rows.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'stats.db')
+            build_sqlite_database(db_path, rows)
+            engine = create_engine(f"sqlite:///{db_path}")
+            with engine.begin() as connection:
+                # As in the managed schema (schema.py), so per-float summary refreshes are lookups.
+                connection.execute(text("CREATE INDEX ix_bench_float_date ON argo_profiles (float_id, profile_date)"))
+            with engine.connect() as connection:
+                scan_ms = median_ms(connection, [(OLD_QUERY, {})], max(args.repeat // 4, 3))
+                counters_ms = median_ms(connection, COUNTER_QUERIES, args.repeat)
+            rng = np.random.default_rng(rows)
+            upkeep = [publish_new_cycle(engine, rng, 5) for _ in range(args.publishes)]
+            mismatches = reconcile_archive_stats(engine)
+            engine.dispose()
+        verdict = "✅ matches" if not mismatches else f"🔴 {mismatches}"
+        print(f"{rows:10d} {scan_ms:13.1f} {counters_ms:12.3f} {np.median(upkeep) * 1000:18.2f}  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
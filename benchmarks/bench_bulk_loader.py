@@ -0,0 +1,103 @@
+# Benchmark: per-file DataFrame.to_sql vs. the batched BulkLoader.
+# Usage: python -m benchmarks.bench_bulk_loader [--files 300] [--rows-per-file 800]
+# By default it runs against a throwaway SQLite file (INSERT fallback path).
+# Point DATABASE_URL at a scratch PostgreSQL database to measure the COPY path;
+# the benchmark writes to its own table and drops it afterwards.
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from data_pipeline.bulk_loader import BulkLoader, profiles_table
+from data_pipeline.profile_extractor import PROFILE_COLUMNS
+
+BENCH_TABLE = 'argo_profiles_bench'
+
+
+def synthetic_batches(n_files, rows_per_file, seed=42):
+    """Builds columnar batches shaped like real profiles (one float, increasing pressure)."""
+    rng = np.random.default_rng(seed)
+    batches = []
+    for i in range(n_files):
+        float_id = 2900000 + i % 50
+        batches.append({
+            'platform_number': np.full(rows_per_file, str(float_id)),
+            'cycle_number': np.full(rows_per_file, i // 50 + 1, dtype=np.int32),
+            'profile_date': np.full(rows_per_file, np.datetime64('2021-03-08') + np.timedelta64(i, 'D'),
+                                    dtype='datetime64[ns]'),
+            'latitude': np.full(rows_per_file, rng.uniform(-10, 25)),
+            'longitude': np.full(rows_per_file, rng.uniform(50, 100)),
+            'pressure': np.linspace(5, 2000, rows_per_file).astype(np.float32),
+            'temperature': rng.uniform(2, 30, rows_per_file).astype(np.float32),
+            'salinity': rng.uniform(33, 37, rows_per_file).astype(np.float32),
+            'float_id': np.full(rows_per_file, float_id, dtype=np.int64),
+        })
+    return batches
+
+
+def reset_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+    profiles_table(name=BENCH_TABLE).create(engine)
+
+
+def run_to_sql(engine, batches):
+    for columns in batches:
+        pd.DataFrame(columns).to_sql(BENCH_TABLE, engine, if_exists='append', index=False)
+
+
+def run_bulk(engine, batches, batch_rows):
+    with BulkLoader(engine, table_name=BENCH_TABLE, columns=PROFILE_COLUMNS, batch_rows=batch_rows) as loader:
+        for columns in batches:
+            loader.add(columns)
+
+
+def timed(label, fn, engine, total_rows):
+    reset_table(engine)
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    with engine.connect() as connection:
+        count = connection.execute(text(f"SELECT COUNT(*) FROM {BENCH_TABLE}")).scalar()
+    assert count == total_rows, f"{label}: expected {total_rows} rows, found {count}"
+    print(f"{label:<28} {elapsed:8.2f}s  {total_rows / elapsed:12,.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare to_sql and BulkLoader throughput.")
+    parser.add_argument('--files', type=int, default=300)
+    parser.add_argument('--rows-per-file', type=int, default=800)
+    parser.add_argument('--batch-rows', type=int, default=250_000)
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    scratch_dir = None
+    if not database_url:
+        scratch_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(scratch_dir.name, 'bench.db')}"
+    engine = create_engine(database_url)
+
+    batches = synthetic_batches(args.files, args.rows_per_file)
+    total_rows = args.files * args.rows_per_file
+    print(f"--- Bulk loader benchmark: {args.files} files x {args.rows_per_file} rows "
+          f"on {engine.dialect.name} ---")
+
+    baseline = timed("to_sql (one txn per file)", lambda: run_to_sql(engine, batches), engine, total_rows)
+    label = "BulkLoader (COPY)" if engine.dialect.name == 'postgresql' else "BulkLoader (INSERT fallback)"
+    bulk = timed(label, lambda: run_bulk(engine, batches, args.batch_rows), engine, total_rows)
+    print(f"Speed-up: {baseline / bulk:.1f}x")
+
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+    engine.dispose()
+    if scratch_dir is not None:
+        scratch_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Benchmark: /api/chat throughput and event-loop responsiveness with a fake LLM.
+# Usage: python -m benchmarks.bench_chat_pipeline [--requests 200] [--distinct 40] [--llm-latency 0.3]
+# No API key, LangChain or database needed: the RAG chain and SQL database are replaced by
+# local fakes that sleep like the real round-trips, and the FastAPI app is driven in-process
+# through httpx's ASGI transport while a pinger measures "/" latency (event-loop stalls). Compares:
+#   inline   the old handler, which called run_ai_pipeline() on the event loop
+#   async    run_ai_pipeline_async(): thread pool + concurrency limit + coalescing
+# and finishes with a burst larger than the queue to show overload rejection (HTTP 503).
+
+import io
+import time
+import asyncio
+import argparse
+import contextlib
+import numpy as np
+import httpx
+
+import backend_server
+from ai_core import main_agent
+
+
+class FakeChain:
+    """Stands in for the RAG chain: retrieval + LLM round-trip, returns SQL."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def invoke(self, question):
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"```sql\nSELECT float_id, latitude, longitude FROM argo_profiles LIMIT 5 -- {question}\n```"
+
+
+class FakeSQLDatabase:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def run(self, sql):
+        time.sleep(self.latency)
+        return "[(1902672, 15.2, 70.1)]"
+
+
+def questions(n_requests, n_distinct):
+    base = [f"Show me the {i} floats with the highest salinity" for i in range(n_distinct)]
+    return [base[i % n_distinct] for i in range(n_requests)]
+
+
+async def ping_loop(client, stop, latencies):
+    """Health-check pings every 10 ms; latency counts from when the ping was due, so loop stalls show up."""
+    while not stop.is_set():
+        due = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        await client.get("/")
+        latencies.append(time.perf_counter() - due)
+
+
+async def run_scenario(asked, inline=False):
+    """Fires every question at once; returns (elapsed, chat latencies, status codes, ping latencies)."""
+    if inline:
+        # What the handler did before: run the blocking pipeline right on the event loop.
+        async def inline_pipeline(question):
+            return main_agent.run_ai_pipeline(question)
+        original = backend_server.run_ai_pipeline_async
+        backend_server.run_ai_pipeline_async = inline_pipeline
+
+    transport = httpx.ASGITransport(app=backend_server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            stop, pings = asyncio.Event(), []
+            pinger = asyncio.create_task(ping_loop(client, stop, pings))
+            await asyncio.sleep(0.05)
+
+            async def ask(question):
+                start = time.perf_counter()
+                response = await client.post("/api/chat", json={"message": question, "timestamp": "now"})
+                return time.perf_counter() - start, response.status_code
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(ask(q) for q in asked))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await pinger
+    finally:
+        if inline:
+            backend_server.run_ai_pipeline_async = original
+    return elapsed, [r[0] for r in results], [r[1] for r in results], pings
+
+
+def report(label, elapsed, latencies, codes, pings, chain):
+    ok = [lat for lat, code in zip(latencies, codes) if code == 200]
+    rejected = sum(1 for code in codes if code == 503)
+    ms = lambda values, q: np.percentile(np.array(values) * 1000, q) if values else float('nan')
+    print(f"{label:<30} {elapsed:7.2f}s {len(ok) / elapsed:8.1f} {ms(ok, 50):8.0f} {ms(ok, 99):8.0f} "
+          f"{rejected:>8} {chain.calls:>9} {ms(pings, 99):10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the async chat pipeline with a fake LLM.")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=40, help="Distinct questions among the requests.")
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--sql-latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--queue', type=int, default=256)
+    args = parser.parse_args()
+
+    backend_server.AI_AVAILABLE = True
+    # These questions have fast-path shapes; this benchmark measures the LLM path.
+    main_agent.FAST_PATH_ENABLED = False
+    asked = questions(args.requests, args.distinct)
+    print(f"{args.requests} requests, {args.distinct} distinct questions, fake LLM {args.llm_latency * 1000:.0f} ms, "
+          f"SQL {args.sql_latency * 1000:.0f} ms\n")
+    print(f"{'scenario':<30} {'elapsed':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rejected':>8} "
+          f"{'LLM calls':>9} {'ping p99':>10}")
+
+    scenarios = [
+        ("inline (old)", True, args.concurrency, args.queue, asked),
+        (f"async, {args.concurrency} workers", False, args.concurrency, args.queue, asked),
+        (f"async, queue {args.concurrency}, burst", False, args.concurrency, args.concurrency,
+         [f"distinct question {i}" for i in range(args.requests)]),
+    ]
+    for label, inline, concurrency, queue, batch in scenarios:
+        chain = FakeChain(args.llm_latency)
+        main_agent.initialize_ai_core(chain=chain, sql_database=FakeSQLDatabase(args.sql_latency))
+        main_agent._pipeline_executor = main_agent.ChatPipelineExecutor(concurrency, queue)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run_scenario(batch, inline=inline))
+        report(label, *result, chain)
+
+
+if __name__ == "__main__":
+    main()
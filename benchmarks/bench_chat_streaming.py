@@ -0,0 +1,188 @@
+# Benchmark: time-to-first-byte of streamed chat answers (SSE and /ws) with a fake streaming LLM.
+# Usage: python -m benchmarks.bench_chat_streaming [--requests 20] [--retrieval-latency 0.15]
+#                                                  [--tokens 40] [--token-latency 0.03]
+# No API key, LangChain or database needed: the retriever, the token-streaming LLM and the SQL
+# database are local fakes with realistic delays. The real FastAPI app runs under uvicorn
+# in-process; for each request it measures when the first event, the retrieved context, the
+# first token, the SQL and the final reply arrive over /api/chat/stream (SSE), next to the
+# blocking /api/chat. It finishes by streaming one answer over the /ws socket and by checking
+# that a client that disconnects mid-stream stops the LLM.
+
+import io
+import json
+import time
+import asyncio
+import argparse
+import threading
+import contextlib
+import numpy as np
+import httpx
+import uvicorn
+from starlette.testclient import TestClient
+
+import backend_server
+from ai_core import main_agent
+
+PORT = 8766
+
+
+class FakeRetriever:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, question):
+        time.sleep(self.latency)
+        return ["argo_profiles(float_id, profile_date, latitude, longitude, pressure, temperature, salinity)"]
+
+
+class FakeStreamingLLM:
+    """Yields the SQL a few characters at a time, like a token stream. Counts tokens it produced."""
+
+    def __init__(self, tokens, token_latency):
+        self.tokens = tokens
+        self.token_latency = token_latency
+        self.produced = 0
+
+    def _sql(self, question):
+        return f"```sql\nSELECT float_id, latitude, longitude FROM argo_profiles LIMIT 5 -- {question}\n```"
+
+    def stream(self, inputs):
+        sql = self._sql(inputs["question"])
+        step = max(len(sql) // self.tokens, 1)
+        for start in range(0, len(sql), step):
+            time.sleep(self.token_latency)
+            self.produced += 1
+            yield sql[start:start + step]
+
+    def invoke(self, question):
+        return "".join(self.stream({"question": question}))
+
+
+class FakeChain:
+    """The non-streaming RAG chain (used by /api/chat): retrieval, then the whole LLM answer."""
+
+    def __init__(self, retriever, llm):
+        self.retriever = retriever
+        self.llm = llm
+
+    def invoke(self, question):
+        self.retriever.invoke(question)
+        return self.llm.invoke(question)
+
+
+class FakeSQLDatabase:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def run(self, sql, parameters=None):
+        time.sleep(self.latency)
+        return "[(1902672, 15.2, 70.1), (2902746, 12.9, 88.4)]"
+
+
+def start_server():
+    config = uvicorn.Config(backend_server.app, host="127.0.0.1", port=PORT, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def stream_once(client, question):
+    """Arrival time (s) of each event type over SSE."""
+    arrivals = {}
+    start = time.perf_counter()
+    async with client.stream("GET", "/api/chat/stream", params={"message": question}) as response:
+        assert response.status_code == 200, response.status_code
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            now = time.perf_counter() - start
+            arrivals.setdefault("first event", now)
+            arrivals.setdefault(event["type"], now)
+    return arrivals
+
+
+async def blocking_once(client, question):
+    start = time.perf_counter()
+    response = await client.post("/api/chat", json={"message": question, "timestamp": "now"})
+    assert response.status_code == 200, response.status_code
+    return time.perf_counter() - start
+
+
+async def run(args):
+    """Returns (blocking latencies, SSE arrival dicts, tokens produced for an abandoned stream)."""
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=120) as client:
+        blocking = [await blocking_once(client, f"question {i}") for i in range(args.requests)]
+        streamed = [await stream_once(client, f"question {i}") for i in range(args.requests)]
+
+        # A client that gives up after the first token: the pipeline should stop producing tokens.
+        llm = main_agent.sql_generator
+        before = llm.produced
+        async with client.stream("GET", "/api/chat/stream", params={"message": "abandoned"}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: token"):
+                    break
+        await asyncio.sleep(args.token_latency * 5 + 0.5)
+        return blocking, streamed, llm.produced - before
+
+
+def websocket_once():
+    client = TestClient(backend_server.app)
+    start = time.perf_counter()
+    arrivals = {}
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()                                   # welcome message
+        ws.send_json({"type": "chat", "message": "over the socket", "request_id": "r1"})
+        while True:
+            message = ws.receive_json()
+            if message.get("type") != "chat_stream":
+                continue
+            arrivals.setdefault(message["event"]["type"], time.perf_counter() - start)
+            if message["event"]["type"] == "done":
+                break
+    return arrivals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-byte of streamed chat answers.")
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--retrieval-latency', type=float, default=0.15)
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--token-latency', type=float, default=0.03)
+    parser.add_argument('--sql-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    backend_server.AI_AVAILABLE = True
+    main_agent.FAST_PATH_ENABLED = False
+    llm = FakeStreamingLLM(args.tokens, args.token_latency)
+    retriever = FakeRetriever(args.retrieval_latency)
+    main_agent.initialize_ai_core(chain=FakeChain(retriever, llm), sql_database=FakeSQLDatabase(args.sql_latency), retriever=retriever,
+                                  generator=llm, cache=False, results=False)
+    print(f"Fake pipeline: retrieval {args.retrieval_latency * 1000:.0f} ms, {args.tokens} tokens x "
+          f"{args.token_latency * 1000:.0f} ms, SQL {args.sql_latency * 1000:.0f} ms\n")
+
+    server, thread = start_server()
+    try:
+        # The pipeline's own progress prints would drown the report.
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocking, streamed, abandoned_tokens = asyncio.run(run(args))
+            ws_arrivals = websocket_once()
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    print(f"{'milestone':<22} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'blocking /api/chat':<22} {np.median(blocking) * 1000:8.0f} {np.percentile(blocking, 95) * 1000:8.0f}")
+    for milestone in ["first event", "context", "token", "sql", "rows", "reply", "done"]:
+        values = [a[milestone] for a in streamed if milestone in a]
+        print(f"{'SSE ' + milestone:<22} {np.median(values) * 1000:8.0f} {np.percentile(values, 95) * 1000:8.0f}")
+    print("\n/ws stream: " + ", ".join(f"{name} {t * 1000:.0f} ms" for name, t in ws_arrivals.items()))
+    print(f"Abandoned SSE stream after its first token: the LLM produced {abandoned_tokens} of "
+          f"~{args.tokens} tokens before stopping")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Benchmark: regional averages and map tiles from the gridded climatology vs SQL over argo_profiles.
+# Usage: python -m benchmarks.bench_climatology [--rows 1000000] [--degrees 1] [--repeat 20]
+# Builds a synthetic argo_profiles table in a throwaway SQLite file and bins it into climatology
+# grids (data_pipeline/climatology.py), reporting build time and size on disk. It then asks a set
+# of regional-average questions (region x month x depth window) both ways: the aggregate SQL the
+# chat fast path would run, restricted to exactly the cells, months and depth bins the grid
+# covers, and the grid lookup; the two must agree. Map tiles (/api/climatology/.../tiles) are timed
+# at a few zoom levels. Last, a load is published through ClimatologyUpdate (bin the staged
+# rows, apply them to the memory-mapped arrays), timed against a full rebuild and compared with it.
+
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from data_pipeline.climatology import (
+    GridSpec, ClimatologyGrids, ClimatologyUpdate, build_climatology, read_meta
+)
+from data_pipeline.result_cache import ensure_generation_table, bump_generation, read_generation
+from benchmarks.load_test_backend import build_sqlite_database
+
+REGIONS = {
+    "arabian sea": (5, 25, 50, 78),
+    "bay of bengal": (5, 23, 78, 100),
+    "equatorial band": (-5, 5, 50, 100),
+    "small box": (10, 12, 60, 63),
+}
+MONTHS = (None, 3, 8)
+DEPTHS = ((None, None), (0, 10), (90, 110), (500, 1000))
+
+
+def sql_average(connection, variable, answer, month):
+    """AVG / COUNT over exactly the cells, month and depth bins the grid answer covers (SQLite)."""
+    lat_min, lat_max, lon_min, lon_max = answer["bbox"]
+    depth_min, depth_max = answer["depth_range"]
+    where = ["latitude >= :lat_min", "latitude < :lat_max", "longitude >= :lon_min", "longitude < :lon_max",
+             f"{variable} IS NOT NULL", "pressure >= :depth_min"]
+    params = {"lat_min": lat_min, "lat_max": lat_max, "lon_min": lon_min, "lon_max": lon_max,
+              "depth_min": depth_min}
+    if depth_max is not None:
+        where.append("pressure < :depth_max")
+        params["depth_max"] = depth_max
+    if month is not None:
+        where.append("CAST(strftime('%m', profile_date) AS INTEGER) = :month")
+        params["month"] = month
+    return connection.execute(text(
+        f"SELECT AVG({variable}), COUNT(*) FROM argo_profiles WHERE {' AND '.join(where)}"
+    ), params).one()
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - start)
+    return result, np.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Climatology grids vs SQL aggregates.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--degrees', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, grid_path = os.path.join(tmp, 'clim.db'), os.path.join(tmp, 'grids')
+        build_sqlite_database(db_path, args.rows)
+        engine = create_engine(f"sqlite:///{db_path}")
+        ensure_generation_table(engine)
+        spec = GridSpec(args.degrees)
+
+        start = time.perf_counter()
+        build_climatology(engine, grid_path, spec)
+        build_s = time.perf_counter() - start
+        size_mb = sum(os.path.getsize(os.path.join(grid_path, f)) for f in os.listdir(grid_path)) / 1e6
+        print(f"📋 {args.rows} rows binned into {spec.shape} ({args.degrees:g} degree cells) in {build_s:.1f} s; "
+              f"{size_mb:.0f} MB on disk (sum, sumsq, count per variable)")
+
+        grids = ClimatologyGrids(grid_path)
+        print(f"\n{'region':<16} {'month':>5} {'depth':>10} {'SQL ms':>8} {'grid ms':>8} {'mean':>9} {'count':>7}  check")
+        sql_total, grid_total, mismatches = [], [], 0
+        with engine.connect() as connection:
+            for name, bbox in REGIONS.items():
+                for month in MONTHS:
+                    for depth_min, depth_max in DEPTHS:
+                        answer, grid_ms = timed(lambda: grids.region("salinity", bbox, month, depth_min, depth_max),
+                                                args.repeat)
+                        (mean, count), sql_ms = timed(lambda: sql_average(connection, "salinity", answer, month),
+                                                      max(args.repeat // 10, 1))
+                        same = count == answer["count"] and (count == 0 or abs(mean - answer["mean"]) < 1e-9)
+                        mismatches += not same
+                        sql_total.append(sql_ms)
+                        grid_total.append(grid_ms)
+                        depth = "all" if depth_min is None else f"{depth_min}-{depth_max}"
+                        shown = f"{answer['mean']:9.4f}" if answer["mean"] is not None else f"{'-':>9}"
+                        print(f"{name:<16} {month or 'all':>5} {depth:>10} {sql_ms:8.1f} {grid_ms:8.2f} {shown} "
+                              f"{answer['count']:7d}  {'✅' if same else '🔴'}")
+        print(f"\n📈 Regional averages: median {np.median(sql_total):.1f} ms by SQL vs {np.median(grid_total):.2f} ms "
+              f"from the grid; {len(sql_total) - mismatches}/{len(sql_total)} identical")
+
+        rng = np.random.default_rng(25)
+        for zoom in (0, 2, 4):
+            size = 180 / 2 ** zoom
+            tiles = [(int(rng.integers(0, 2 ** (zoom + 1))), int(rng.integers(0, 2 ** zoom))) for _ in range(20)]
+
+            def tile(x, y, month):
+                bbox = (90 - (y + 1) * size, 90 - y * size, -180 + x * size, -180 + (x + 1) * size)
+                return grids.grid("temperature", "mean", bbox, month, 0, 10)
+
+            samples = [timed(lambda: tile(x, y, month), 3)[1] for x, y in tiles for month in (None, 3)]
+            values, _ = tile(*tiles[0], None)
+            print(f"📈 Tiles at zoom {zoom} ({values.shape[0]}x{values.shape[1]} cells): "
+                  f"median {np.median(samples):.2f} ms, max {np.max(samples):.2f} ms")
+
+        # A load: every profile of 50 floats again as new cycles, published the way publish_staged_load does it.
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE staging AS SELECT platform_number, float_id, cycle_number + 10000 AS cycle_number, "
+                "profile_date, latitude, longitude, pressure, temperature + 0.3 AS temperature, salinity "
+                "FROM argo_profiles WHERE float_id IN (SELECT DISTINCT float_id FROM argo_profiles LIMIT 50)"))
+            staged = connection.execute(text("SELECT COUNT(*) FROM staging")).scalar()
+        update = ClimatologyUpdate(grid_path)
+        with engine.begin() as connection:
+            update.generation_before = read_generation(connection)
+            start = time.perf_counter()
+            update.staged(connection, "staging")
+            update_ms = (time.perf_counter() - start) * 1000
+            connection.execute(text("INSERT INTO argo_profiles SELECT * FROM staging"))
+            connection.execute(text("DROP TABLE staging"))
+            bump_generation(connection)
+            generation = read_generation(connection)
+        start = time.perf_counter()
+        applied = update.commit(generation)
+        update_ms += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        build_climatology(engine, grid_path + '_full', spec)
+        rebuild_s = time.perf_counter() - start
+        incremental, full = ClimatologyGrids(grid_path), ClimatologyGrids(grid_path + '_full')
+        worst = max(float(np.abs(np.asarray(incremental.arrays[v][n], dtype=np.float64)
+                                  - np.asarray(full.arrays[v][n], dtype=np.float64)).max())
+                    for v in incremental.arrays for n in ('sum', 'sumsq', 'count'))
+        print(f"\n📈 Publishing {staged} staged rows: {update_ms:.0f} ms to bin and apply them (applied: {applied}, generation "
+              f"{read_meta(grid_path)['generation']}) vs {rebuild_s:.1f} s full rebuild; "
+              f"{'✅ identical' if worst < 1e-6 else f'🔴 max difference {worst}'} to the rebuild")
+        del grids, incremental, full
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Benchmark: the old one-at-a-time download loop vs. the concurrent, resumable Downloader.
+# Usage: python -m benchmarks.bench_downloader [--files 60] [--latency 0.05] [--workers 8]
+# Runs offline: copies real profile files from 'nc files' into a temp folder served by
+# benchmarks.local_http_server with added per-request latency. A second run cuts the first
+# transfer of every file halfway (every file must be retried), and a third starts from
+# half-written .part files, so every file is resumed with a Range request.
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import requests
+
+from data_pipeline.build_database import root_data_folder, find_profile_files
+from data_pipeline.downloader import Downloader, DownloadTask, file_sha256, PART_SUFFIX
+from benchmarks.local_http_server import serve_directory
+
+
+def sequential_download(urls, dest_dir):
+    """The loop from the old check_and_download_from_index.show_and_download."""
+    for url in urls:
+        fn = os.path.join(dest_dir, os.path.basename(url))
+        r = requests.get(url, stream=True, timeout=60)
+        r.raise_for_status()
+        with open(fn, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=8192):
+                f.write(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent downloader.")
+    parser.add_argument('--files', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated server latency per request (s).")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    sources = find_profile_files(root_data_folder)[:args.files]
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = os.path.join(tmp, 'gdac')
+        os.makedirs(serve_dir)
+        for path in sources:
+            shutil.copy(path, serve_dir)
+        names = sorted(os.listdir(serve_dir))
+        checksums = {name: file_sha256(os.path.join(serve_dir, name)) for name in names}
+        total_mb = sum(os.path.getsize(os.path.join(serve_dir, n)) for n in names) / 1e6
+        print(f"{len(names)} files, {total_mb:.1f} MB, {args.latency * 1000:.0f} ms simulated latency\n")
+
+        scenarios = [('plain', False), ('cut + retry', True), ('resume .part', False)]
+        for scenario, cut_first in scenarios:
+            with serve_directory(serve_dir, latency=args.latency, cut_first=cut_first) as base_url:
+                urls = [base_url + name for name in names]
+                if scenario == 'plain':
+                    old_dir = os.path.join(tmp, 'old')
+                    os.makedirs(old_dir)
+                    start = time.perf_counter()
+                    sequential_download(urls, old_dir)
+                    print(f"{'sequential, 8 KB chunks:':<30}{time.perf_counter() - start:6.2f}s")
+
+                new_dir = os.path.join(tmp, scenario.replace(' ', '_'))
+                os.makedirs(new_dir)
+                if scenario == 'resume .part':
+                    for name in names:
+                        with open(os.path.join(serve_dir, name), 'rb') as f:
+                            data = f.read()
+                        with open(os.path.join(new_dir, name + PART_SUFFIX), 'wb') as f:
+                            f.write(data[:len(data) // 2])
+
+                tasks = [DownloadTask(url, os.path.join(new_dir, name), expected_sha256=checksums[name])
+                         for url, name in zip(urls, names)]
+                stats = Downloader(workers=args.workers, backoff=0.05, verbose=False).run(tasks)
+                print(f"{'Downloader, ' + scenario + ':':<30}{stats.elapsed:6.2f}s  {stats.summary()}")
+                assert stats.failed == 0, stats.errors
+
+if __name__ == "__main__":
+    main()
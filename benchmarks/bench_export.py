@@ -0,0 +1,146 @@
+# Benchmark: streaming /api/export (server-side cursor, chunked encoding) vs reading it all first.
+# Usage: python -m benchmarks.bench_export [--rows 2000000] [--formats csv,ndjson,parquet,netcdf]
+# Builds a synthetic argo_profiles table in a throwaway SQLite file, runs the real FastAPI app
+# under uvicorn in-process and downloads a full, unfiltered export in each format. For each it
+# reports time to first byte, total time, throughput and the growth of the server's resident
+# memory while the export ran, next to the old approach (pd.read_sql of the whole result, then
+# one CSV string). It finishes by abandoning a download halfway and checking that the export
+# slot and the database connection are released.
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import httpx
+import uvicorn
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from benchmarks.load_test_backend import build_sqlite_database
+
+PORT = 8767
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class PeakMemory:
+    """Samples this process's RSS in the background; peak growth over the starting value."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+
+    def __enter__(self):
+        self.start = rss_mb()
+        self.peak = self.start
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def _sample(self):
+        while self.running:
+            self.peak = max(self.peak, rss_mb())
+            time.sleep(self.interval)
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+
+    @property
+    def growth(self):
+        return self.peak - self.start
+
+
+def start_server(app):
+    config = uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def download(client, params, stop_after=None):
+    """(time to first byte, total time, bytes); stops reading after `stop_after` bytes if given."""
+    start = time.perf_counter()
+    first, size = None, 0
+    async with client.stream("GET", "/api/export", params=params) as response:
+        assert response.status_code == 200, response.status_code
+        async for block in response.aiter_bytes():
+            first = first if first is not None else time.perf_counter() - start
+            size += len(block)
+            if stop_after is not None and size >= stop_after:
+                break
+    return first, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export: time to first byte, throughput, memory.")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--formats', default="csv,ndjson,parquet,netcdf")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'export.db')
+        build_sqlite_database(db_path, args.rows)
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        import backend_server
+        from backend_core.export_stream import EXPORT_WRITERS
+
+        # The old endpoint: whole result into a DataFrame, then one string.
+        engine = create_engine(f"sqlite:///{db_path}")
+        with PeakMemory() as old_memory:
+            start = time.perf_counter()
+            with engine.connect() as connection:
+                frame = pd.read_sql(text("SELECT * FROM argo_profiles"), connection)
+            body = frame.to_csv(index=False)
+            old_s = time.perf_counter() - start
+        old_size = len(body)
+        del frame, body
+        engine.dispose()
+
+        server, thread = start_server(backend_server.app)
+
+        async def run():
+            results = {}
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=600) as client:
+                for fmt in args.formats.split(","):
+                    if fmt not in EXPORT_WRITERS:
+                        print(f"🟡 {fmt}: writer not available here, skipped")
+                        continue
+                    with PeakMemory() as memory:
+                        first, total, size = await download(client, {"format": fmt})
+                    results[fmt] = (first, total, size, memory.growth)
+                abandoned = await download(client, {"format": "csv"}, stop_after=old_size // 4)
+                await asyncio.sleep(1.0)
+            return results, abandoned
+
+        try:
+            results, abandoned = asyncio.run(run())
+            pool_status = backend_server.database.engine.pool.status()
+            active = backend_server.active_exports
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    print(f"\n📋 Full export of {args.rows} rows\n")
+    print(f"{'format':<22} {'first byte':>11} {'total':>9} {'MB':>8} {'rows/s':>10} {'RSS growth':>11}")
+    print(f"{'old (read all, csv)':<22} {old_s:10.2f}s {old_s:8.2f}s {old_size / 1e6:8.1f} "
+          f"{args.rows / old_s:10.0f} {old_memory.growth:9.0f}MB")
+    for fmt, (first, total, size, growth) in results.items():
+        print(f"{'stream ' + fmt:<22} {first:10.2f}s {total:8.2f}s {size / 1e6:8.1f} {args.rows / total:10.0f} "
+              f"{growth:9.0f}MB")
+    print(f"\nAbandoned a CSV download after {abandoned[2] / 1e6:.1f} MB: active exports now {active}; pool: {pool_status}")
+
+
+if __name__ == "__main__":
+    main()
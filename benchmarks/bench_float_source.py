@@ -0,0 +1,69 @@
+# Benchmark: per-cycle source mode vs. float-level (aggregated _prof.nc) source mode.
+# Usage: python -m benchmarks.bench_float_source [--floats N]
+# Decode only (no database): measures what build_database.py's workers would do for
+# each bundled float in 'nc files', and compares the resulting row counts.
+
+import time
+import argparse
+
+from data_pipeline.build_database import root_data_folder
+from data_pipeline.profile_extractor import extract_profile_columns, SkipFile
+from data_pipeline.float_source import find_float_directories, float_files, extract_float_columns
+from data_pipeline.ingest_manifest import preferred_files
+
+
+def decode_cycle_mode(float_dir):
+    """Every preferred R/D file opened and decoded on its own, as --source cycle does."""
+    _, cycle_files = float_files(float_dir)
+    rows, opened = 0, 0
+    for paths in preferred_files(cycle_files).values():
+        for path in paths:
+            opened += 1
+            try:
+                rows += len(extract_profile_columns(path)['float_id'])
+            except SkipFile:
+                pass
+    return rows, opened
+
+
+def decode_float_mode(float_dir):
+    """One pass over the _prof.nc plus newer/delayed-mode per-cycle files, as --source float does."""
+    try:
+        columns, source_rows = extract_float_columns(float_dir)
+    except SkipFile:
+        return 0, 1
+    return len(columns['float_id']), len(source_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cycle and float source modes.")
+    parser.add_argument('--floats', type=int, default=0, help="Limit the number of floats (0 = all).")
+    args = parser.parse_args()
+
+    float_dirs = list(find_float_directories(root_data_folder).items())
+    if args.floats:
+        float_dirs = float_dirs[:args.floats]
+
+    print(f"{'float':>9} {'cycle files':>11} {'cycle s':>8} {'float files':>11} {'float s':>8} "
+          f"{'speed-up':>8} {'rows (cycle/float)':>20}")
+    totals = [0.0, 0.0]
+    for float_id, float_dir in float_dirs:
+        start = time.perf_counter()
+        cycle_rows, cycle_opened = decode_cycle_mode(float_dir)
+        cycle_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        float_rows, float_opened = decode_float_mode(float_dir)
+        float_time = time.perf_counter() - start
+
+        totals[0] += cycle_time
+        totals[1] += float_time
+        print(f"{float_id:>9} {cycle_opened:>11} {cycle_time:>8.2f} {float_opened:>11} {float_time:>8.2f} "
+              f"{cycle_time / max(float_time, 1e-9):>7.1f}x {cycle_rows:>10}/{float_rows:<9}")
+
+    print(f"\nTotal decode time: cycle mode {totals[0]:.2f}s, float mode {totals[1]:.2f}s "
+          f"({totals[0] / max(totals[1], 1e-9):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Benchmark: /api/floats served from float_summary vs the old request-time aggregation.
+# Usage: python -m benchmarks.bench_float_summary [--rows 2000000] [--requests 50] [--refresh-floats 5]
+# Builds a synthetic argo_profiles table (and its float_summary) in a throwaway SQLite file. Times
+# the old query (GROUP BY float_id over argo_profiles, LIMIT 20, filters applied in Python) next to
+# the filtered, paged float_summary query the endpoint now runs, checks the endpoint through the
+# real FastAPI app (filters, keyset paging), and times an incremental refresh of a few floats
+# against a full rebuild.
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from sqlalchemy import create_engine, text
+from starlette.testclient import TestClient
+
+from data_pipeline.float_summary import refresh_float_summary, rebuild_float_summary
+from benchmarks.load_test_backend import build_sqlite_database
+
+OLD_QUERY = """
+SELECT DISTINCT s.float_id as id, p.latitude as lat, p.longitude as lon, s.last_contact, s.temperature, s.salinity
+FROM (
+    SELECT float_id, MAX(profile_date) as last_contact, AVG(temperature) as temperature, AVG(salinity) as salinity
+    FROM argo_profiles
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    GROUP BY float_id
+    LIMIT 20
+) s
+JOIN argo_profiles p ON p.float_id = s.float_id AND p.profile_date = s.last_contact
+"""
+BBOX = {"lat_min": 0.0, "lat_max": 15.0, "lon_min": 60.0, "lon_max": 80.0}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, np.array(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="float_summary vs request-time aggregation for /api/floats.")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--refresh-floats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'summary.db')
+        build_sqlite_database(db_path, args.rows)
+        engine = create_engine(f"sqlite:///{db_path}")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        import backend_server
+
+        def old_path():
+            with engine.connect() as connection:
+                rows = connection.execute(text(OLD_QUERY)).fetchall()
+            return [r for r in rows if BBOX["lat_min"] <= r.lat <= BBOX["lat_max"]
+                    and BBOX["lon_min"] <= r.lon <= BBOX["lon_max"]]
+
+        clauses, params = backend_server.float_summary_filters(**BBOX)
+        new_query = text(f"SELECT float_id FROM float_summary WHERE {' AND '.join(clauses)} "
+                         f"ORDER BY float_id LIMIT 101")
+
+        def new_path():
+            with engine.connect() as connection:
+                return connection.execute(new_query, params).fetchall()
+
+        old_rows, old_ms = timed(old_path, max(args.requests // 10, 3))
+        new_rows, new_ms = timed(new_path, args.requests)
+        with engine.connect() as connection:
+            floats = connection.execute(text("SELECT COUNT(*) FROM float_summary")).scalar()
+        print(f"📋 {args.rows} rows, {floats} floats; bbox {BBOX}\n")
+        print(f"Old aggregation + Python filter: p50 {np.median(old_ms):8.1f} ms  -> {len(old_rows)} floats "
+              f"(of only the first 20 floats scanned)")
+        print(f"float_summary query:             p50 {np.median(new_ms):8.2f} ms  -> {len(new_rows)} floats "
+              f"(every matching float)")
+
+        # The real endpoint: filters and keyset paging.
+        seen, cursor, pages = [], None, 0
+        with TestClient(backend_server.app) as client:
+            while True:
+                query = {**BBOX, "limit": 25, **({"after": cursor} if cursor else {})}
+                response = client.get("/api/floats", params=query)
+                assert response.status_code == 200, response.text
+                seen += [f["id"] for f in response.json()]
+                pages += 1
+                cursor = response.headers.get("x-next-cursor")
+                if cursor is None:
+                    break
+        assert len(seen) == len(set(seen)) == len(new_rows), (len(seen), len(new_rows))
+        print(f"\n/api/floats paged 25 at a time: {pages} pages, {len(seen)} floats, no duplicates")
+
+        float_ids = [int(f) for f in seen[:args.refresh_floats]] or [2900001]
+        def refresh():
+            with engine.begin() as connection:
+                return refresh_float_summary(connection, float_ids)
+        _, refresh_ms = timed(refresh, 5)
+        _, rebuild_ms = timed(lambda: rebuild_float_summary(engine), 2)
+        print(f"\n📈 Incremental refresh of {len(float_ids)} floats: {np.median(refresh_ms):.1f} ms; "
+              f"full rebuild: {np.median(rebuild_ms):.0f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Benchmark: pd.read_csv + boolean scan (check_and_download_from_index.py) vs. the local index cache.
+# Usage: python -m benchmarks.bench_index_cache [--profiles 2000000]
+# Everything runs offline: a synthetic ar_index_global_prof.txt is written to a temp folder and
+# served by benchmarks.local_http_server, then the script times a cold build, a conditional
+# refresh (304), an incremental append (HTTP Range) and bbox + date queries.
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from data_pipeline.index_cache import IndexCache
+from benchmarks.local_http_server import serve_directory
+
+HEADER = (
+    "# Title : Profile directory file of the Argo Global Data Assembly Center\n"
+    "# Description : The directory file describes all individual profile files of the argo GDAC ftp site.\n"
+    "# FTP root number 1 : ftp://ftp.ifremer.fr/ifremer/argo/dac\n"
+    "file,date,latitude,longitude,ocean,profiler_type,institution,date_update\n"
+)
+QUERIES = [
+    ((8.0, 20.0, 68.0, 76.0), ("2023-03-01", "2023-03-05")),
+    ((-10.0, 25.0, 50.0, 100.0), ("2022-01-01", "2023-12-31")),
+    ((-90.0, 90.0, 170.0, -170.0), (None, None)),
+]
+
+
+def synthetic_lines(n, seed, first_float=1900000):
+    rng = np.random.default_rng(seed)
+    floats = first_float + rng.integers(0, max(n // 150, 1), n)
+    dates = (np.datetime64('2000-01-01') + rng.integers(0, 25 * 365 * 86400, n).astype('timedelta64[s]'))
+    stamps = pd.to_datetime(dates).strftime('%Y%m%d%H%M%S')
+    lat = rng.uniform(-70, 80, n).round(3)
+    lon = rng.uniform(-180, 180, n).round(3)
+    oceans = np.array(['A', 'I', 'P'])[rng.integers(0, 3, n)]
+    return [
+        f"incois/{f}/profiles/R{f}_{i:07d}.nc,{s},{la},{lo},{o},846,IN,{s}\n"
+        for i, f, s, la, lo, o in zip(range(n), floats, stamps, lat, lon, oceans)
+    ]
+
+
+def scan_query(df, bbox, dates):
+    lat_min, lat_max, lon_min, lon_max = bbox
+    mask = df['latitude'].between(lat_min, lat_max)
+    if lon_min <= lon_max:
+        mask &= df['longitude'].between(lon_min, lon_max)
+    else:
+        mask &= (df['longitude'] >= lon_min) | (df['longitude'] <= lon_max)
+    if dates[0]:
+        mask &= df['date'].between(*dates)
+    return df[mask]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local GDAC index cache.")
+    parser.add_argument('--profiles', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = os.path.join(tmp, 'gdac')
+        os.makedirs(serve_dir)
+        index_path = os.path.join(serve_dir, 'ar_index_global_prof.txt')
+        with open(index_path, 'w') as f:
+            f.write(HEADER)
+            f.writelines(synthetic_lines(args.profiles, seed=1))
+        print(f"Synthetic index: {args.profiles} profiles, {os.path.getsize(index_path) / 1e6:.0f} MB")
+
+        with serve_directory(serve_dir) as base_url:
+            url = base_url + 'ar_index_global_prof.txt'
+
+            def old_load():
+                df = pd.read_csv(url, comment='#', header=0)
+                df['date'] = pd.to_datetime(df['date'], format='%Y%m%d%H%M%S')
+                return df
+
+            df, old_load_time = timed(old_load)
+            cache = IndexCache(os.path.join(tmp, 'index_cache'), source=url)
+            status, build_time = timed(cache.refresh)
+            _, load_time = timed(cache.load)
+            status_304, refresh_time = timed(cache.refresh)
+
+            time.sleep(1.1)  # make sure the appended file gets a new Last-Modified second
+            with open(index_path, 'a') as f:
+                f.writelines(synthetic_lines(5000, seed=2, first_float=5900000))
+            status_append, append_time = timed(cache.refresh)
+
+            print(f"\nread_csv over HTTP (every run):   {old_load_time:8.2f}s")
+            print(f"cache build ({status}):           {build_time:8.2f}s")
+            print(f"cache load from Parquet:          {load_time:8.2f}s")
+            print(f"refresh, unchanged ({status_304}):      {refresh_time * 1000:8.1f} ms")
+            print(f"refresh, +5000 rows ({status_append}):     {append_time:8.2f}s")
+            assert len(cache) == args.profiles + 5000, len(cache)
+
+            df = old_load()
+            print(f"\n{'query':>42} {'rows':>8} {'scan ms':>9} {'index ms':>9}")
+            for bbox, dates in QUERIES:
+                expected, scan_time = timed(scan_query, df, bbox, dates)
+                rows, index_time = timed(cache.query_rows, *bbox, *dates)
+                assert len(rows) == len(expected), (len(rows), len(expected))
+                label = f"{bbox} {dates[0] or ''}..{dates[1] or ''}"
+                print(f"{label:>42} {len(rows):>8} {scan_time * 1000:>9.1f} {index_time * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
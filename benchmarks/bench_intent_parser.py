@@ -0,0 +1,102 @@
+# Benchmark: deterministic fast path (ai_core/intent_parser.py) on the bundled question corpus.
+# Usage: python -m benchmarks.bench_intent_parser [--corpus benchmarks/chat_question_corpus.jsonl]
+#                                                 [--rows 200000] [--llm-latency 2.0]
+# Each corpus line is {"question": ..., "shape": <expected template, or null = must fall through>}.
+# Reports the match rate, shape accuracy and false matches (questions that should have gone to
+# the RAG chain), the parse latency, and runs every matched query against a synthetic SQLite
+# argo_profiles table to check it executes and to time it. The end-to-end estimate compares the
+# fast path with a --llm-latency retriever + LLM round-trip for the same questions.
+
+import os
+import json
+import time
+import argparse
+import tempfile
+from collections import Counter
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from ai_core.intent_parser import parse_question
+from benchmarks.load_test_backend import build_sqlite_database
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'chat_question_corpus.jsonl')
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and match rate of the chat fast path.")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--llm-latency', type=float, default=2.0,
+                        help="Typical retriever + LLM time of the RAG path, in seconds.")
+    parser.add_argument('--repeat', type=int, default=200, help="Parses per question for the latency figure.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    parsed = [parse_question(entry["question"]) for entry in corpus]
+
+    expected_fast = [entry for entry in corpus if entry["shape"] is not None]
+    matched = [p for p in parsed if p is not None]
+    correct = sum(1 for entry, p in zip(corpus, parsed) if (p.shape if p else None) == entry["shape"])
+    false_matches = [(entry["question"], p.shape) for entry, p in zip(corpus, parsed)
+                     if p is not None and entry["shape"] is None]
+    missed = [entry["question"] for entry, p in zip(corpus, parsed) if p is None and entry["shape"] is not None]
+    wrong_shape = [(entry["question"], entry["shape"], p.shape) for entry, p in zip(corpus, parsed)
+                   if p is not None and entry["shape"] is not None and p.shape != entry["shape"]]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for entry in corpus:
+            parse_question(entry["question"])
+    parse_us = (time.perf_counter() - start) / (args.repeat * len(corpus)) * 1e6
+
+    print(f"📋 Corpus: {len(corpus)} questions ({len(expected_fast)} with a fast-path shape, "
+          f"{len(corpus) - len(expected_fast)} that must fall through)\n")
+    print(f"Matched by the fast path:   {len(matched)}/{len(corpus)} ({len(matched) / len(corpus):.0%} of all questions)")
+    print(f"Shape accuracy:             {correct}/{len(corpus)}")
+    print(f"Missed fast-path questions: {len(missed)}")
+    print(f"False matches:              {len(false_matches)}")
+    print(f"Parse latency:              {parse_us:.0f} µs per question (hit or miss)")
+    print(f"Shapes: {dict(Counter(p.shape for p in matched))}")
+    for question in missed:
+        print(f"  🟡 missed: {question!r}")
+    for question, shape in false_matches:
+        print(f"  🔴 false match ({shape}): {question!r}")
+    for question, expected, got in wrong_shape:
+        print(f"  🔴 {question!r}: expected {expected}, got {got}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'intent.db')
+        build_sqlite_database(db_path, args.rows)
+        engine = create_engine(f"sqlite:///{db_path}")
+        query_ms, failures = [], []
+        with engine.connect() as connection:
+            # Climatology-only questions have no SQL (see bench_climatology.py for the grids).
+            for p in [p for p in matched if p.sql is not None]:
+                start = time.perf_counter()
+                try:
+                    connection.execute(text(p.sql), p.params).fetchall()
+                except Exception as e:
+                    failures.append((p.display_sql, str(e)))
+                query_ms.append((time.perf_counter() - start) * 1000)
+        engine.dispose()
+
+    print(f"\nExecuted {len(query_ms)} fast-path queries on {args.rows} synthetic rows: {len(failures)} failed, "
+          f"median {np.median(query_ms):.1f} ms, max {max(query_ms):.1f} ms")
+    for sql, error in failures:
+        print(f"  🔴 {sql}\n     {error}")
+
+    fast_s = parse_us / 1e6 + np.median(query_ms) / 1000
+    rag_s = args.llm_latency + np.median(query_ms) / 1000
+    share = len(matched) / len(corpus)
+    print(f"\n📈 Time to SQL + result for a matched question: {fast_s * 1000:.1f} ms vs ~{rag_s * 1000:.0f} ms "
+          f"through the RAG chain; mean over the corpus: "
+          f"{(share * fast_s + (1 - share) * (rag_s + parse_us / 1e6)) * 1000:.0f} ms vs {rag_s * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
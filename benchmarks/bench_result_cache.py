@@ -0,0 +1,95 @@
+# Benchmark: generation-tagged result cache on the data endpoints (data_pipeline/result_cache.py).
+# Usage: python -m benchmarks.bench_result_cache [--rows 1000000] [--requests 50]
+# Builds a synthetic argo_profiles table in a throwaway SQLite file, drives the FastAPI app
+# in-process (httpx ASGI transport) and times /api/stats, /api/floats and a profile request
+# with the cache bypassed versus warm. Then publishes a "load" (bumps the data generation the
+# way ingest_manifest.publish_staged_load does) and checks that the next request after the
+# poll interval sees the new data instead of the cached result.
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+import httpx
+from sqlalchemy import text
+
+from benchmarks.load_test_backend import build_sqlite_database
+
+PATHS = ["/api/stats", "/api/floats", "/api/floats/2900001/profile"]
+
+
+async def time_requests(client, path, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code, response.text)
+    return np.array(latencies) * 1000
+
+
+async def run(args, backend):
+    from data_pipeline.result_cache import ResultCache, ensure_generation_table, bump_generation
+    from data_pipeline.archive_stats import refresh_summary_and_stats
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        print(f"{'endpoint':<32} {'uncached p50':>13} {'cached p50':>11} {'speed-up':>9}")
+        for path in PATHS:
+            backend.result_cache = ResultCache(max_bytes=0)          # nothing fits: every request hits the DB
+            cold = await time_requests(client, path, max(args.requests // 10, 3))
+            backend.result_cache = ResultCache()
+            warm = await time_requests(client, path, args.requests)
+            print(f"{path:<32} {np.median(cold):10.1f} ms {np.median(warm):8.2f} ms "
+                  f"{np.median(cold) / np.median(warm):8.0f}x")
+        print(f"\n📋 {backend.result_cache.status()}")
+
+        # An ETL publish: new rows, the touched floats' summary and counters, and a generation bump
+        # in one transaction.
+        engine = backend.database.engine
+        ensure_generation_table(engine)
+        before = (await client.get("/api/stats")).json()["total_profiles"]
+        with engine.begin() as connection:
+            connection.execute(text("""INSERT INTO argo_profiles (platform_number, float_id, cycle_number, profile_date,
+                                       latitude, longitude, pressure, temperature, salinity)
+                                       SELECT platform_number, float_id, cycle_number + 1000, profile_date,
+                                              latitude, longitude, pressure, temperature, salinity
+                                       FROM argo_profiles LIMIT 1000"""))
+            touched = [r[0] for r in connection.execute(text(
+                "SELECT DISTINCT float_id FROM argo_profiles WHERE cycle_number > 1000"))]
+            refresh_summary_and_stats(connection, touched)
+            bump_generation(connection)
+        start = time.perf_counter()
+        while True:
+            after = (await client.get("/api/stats")).json()["total_profiles"]
+            if after != before:
+                break
+            await asyncio.sleep(0.05)
+        print(f"\n✅ After the publish, /api/stats went from {before} to {after} profiles within "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms (poll interval {backend.result_cache.poll_seconds}s); "
+              f"invalidations: {backend.result_cache.stats['invalidations']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generation-tagged result cache.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'result_cache.db')
+        print(f"Building synthetic SQLite database with {args.rows} rows...\n")
+        build_sqlite_database(db_path, args.rows)
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+        import backend_server
+        backend_server.setup_database()
+        try:
+            asyncio.run(run(args, backend_server))
+        finally:
+            backend_server.database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Benchmark: bucketed timeseries from profile_rollups vs aggregating raw argo_profiles levels.
+# Usage: python -m benchmarks.bench_rollups [--floats 200] [--cycles 100] [--reloads 20]
+# Builds a synthetic argo_profiles table shaped like real Argo data (floats x 10-day cycles x
+# levels every 2 dbar to 200 dbar, then every 10 dbar to 2000) in a throwaway SQLite file, or uses
+# DATABASE_URL if set, indexes it on (float_id, cycle_number) and times a full rollup build.
+# For a sample of floats it then answers "monthly mean/min/max of
+# temperature in 0-200 dbar" twice: from the raw levels (every row fetched and aggregated, as a
+# client of the old endpoint had to) and from the rollups, and checks the answers agree. Finally it
+# rewrites single profiles the way an incremental ETL publish does, times refresh_profile_rollups
+# for just those profiles, and checks the result is identical to a full rebuild.
+
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from data_pipeline.profile_rollups import (
+    ROLLUP_TABLE, rebuild_profile_rollups, refresh_profile_rollups, depth_bins_for, combine_rollups
+)
+
+DEPTH_RANGE = (0.0, 200.0)
+SAMPLE_FLOATS = 50
+
+
+def build_profile_database(path, floats, cycles, seed=5):
+    rng = np.random.default_rng(seed)
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE argo_profiles (platform_number TEXT, float_id BIGINT, cycle_number INTEGER,
+                          profile_date DATETIME, latitude FLOAT, longitude FLOAT, pressure FLOAT,
+                          temperature FLOAT, salinity FLOAT)""")
+    pressure = np.concatenate([np.arange(1, 200, 2), np.arange(200, 2001, 10)]).astype(float)
+    levels = len(pressure)
+    for float_id in range(2900000, 2900000 + floats):
+        first = np.datetime64('2019-01-01') + rng.integers(0, 365)
+        rows = []
+        for cycle in range(1, cycles + 1):
+            date = str(first + np.timedelta64(10 * cycle, 'D'))
+            lat, lon = rng.uniform(-10, 25), rng.uniform(50, 100)
+            temperature = 4 + 24 / (1 + np.exp((pressure - 150) / 40)) + rng.normal(0, 0.2, levels)
+            salinity = 34.5 + 0.5 * np.exp(-pressure / 300) + rng.normal(0, 0.02, levels)
+            rows.extend(zip([str(float_id)] * levels, [float_id] * levels, [cycle] * levels, [date] * levels,
+                            [lat] * levels, [lon] * levels, pressure.tolist(), temperature.tolist(),
+                            salinity.tolist()))
+        connection.executemany("INSERT INTO argo_profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    connection.execute("CREATE INDEX ix_argo_profiles_float_cycle ON argo_profiles (float_id, cycle_number)")
+    connection.commit()
+    connection.close()
+
+
+def raw_monthly(connection, float_id):
+    frame = pd.read_sql(text("SELECT profile_date, temperature FROM argo_profiles WHERE float_id = :f "
+                             "AND pressure >= :lo AND pressure < :hi AND temperature IS NOT NULL"),
+                        connection, params={"f": float_id, "lo": DEPTH_RANGE[0], "hi": DEPTH_RANGE[1]})
+    months = pd.to_datetime(frame["profile_date"]).dt.to_period("M").dt.start_time
+    return frame.groupby(months)["temperature"].agg(["mean", "min", "max", "count"])
+
+
+def rollup_monthly(connection, float_id):
+    first_bin, last_bin, _, _ = depth_bins_for(*DEPTH_RANGE)
+    rows = connection.execute(text(
+        f"SELECT cycle_number, profile_date, SUM(temperature_sum), SUM(temperature_count), MIN(temperature_min), "
+        f"MAX(temperature_max) FROM {ROLLUP_TABLE} WHERE float_id = :f AND depth_bin BETWEEN :a AND :b "
+        f"GROUP BY cycle_number, profile_date ORDER BY profile_date"), {"f": float_id, "a": first_bin, "b": last_bin}
+    ).fetchall()
+    return combine_rollups(rows, "month")
+
+
+def same_answer(raw, buckets):
+    if len(raw) != len(buckets):
+        return False
+    ours = np.array([[b["mean"], b["min"], b["max"], b["count"]] for b in buckets])
+    return np.allclose(raw.to_numpy(dtype=np.float64), ours)
+
+
+def snapshot(connection):
+    return sorted(tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+                  for row in connection.execute(text(f"SELECT * FROM {ROLLUP_TABLE}")).fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup-backed bucketed timeseries vs raw aggregation.")
+    parser.add_argument('--floats', type=int, default=200)
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--reloads', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = os.getenv("DATABASE_URL")
+        if not url:
+            db_path = os.path.join(tmp, 'rollups.db')
+            build_profile_database(db_path, args.floats, args.cycles)
+            url = f"sqlite:///{db_path}"
+        engine = create_engine(url)
+
+        start = time.perf_counter()
+        rollup_rows = rebuild_profile_rollups(engine)
+        build_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(11)
+        with engine.connect() as connection:
+            float_ids = [int(f) for f in rng.choice(
+                [r[0] for r in connection.execute(text("SELECT DISTINCT float_id FROM argo_profiles"))],
+                SAMPLE_FLOATS, replace=False)]
+            raw_s = rollup_s = 0.0
+            agree = 0
+            for float_id in float_ids:
+                start = time.perf_counter()
+                raw = raw_monthly(connection, float_id)
+                raw_s += time.perf_counter() - start
+                start = time.perf_counter()
+                buckets = rollup_monthly(connection, float_id)
+                rollup_s += time.perf_counter() - start
+                agree += same_answer(raw, buckets)
+            source_rows = connection.execute(text("SELECT COUNT(*) FROM argo_profiles")).scalar()
+
+        # Incremental: rewrite single profiles as a publish would, then refresh just those.
+        refresh_s = 0.0
+        with engine.connect() as connection:
+            profiles = connection.execute(text(
+                "SELECT DISTINCT float_id, cycle_number FROM argo_profiles LIMIT 5000")).fetchall()
+        picks = [profiles[i] for i in rng.choice(len(profiles), args.reloads, replace=False)]
+        for float_id, cycle in picks:
+            with engine.begin() as connection:
+                connection.execute(text("UPDATE argo_profiles SET temperature = temperature + 1 "
+                                        "WHERE float_id = :f AND cycle_number = :c"), {"f": float_id, "c": cycle})
+                start = time.perf_counter()
+                refresh_profile_rollups(connection, [(float_id, cycle)])
+                refresh_s += time.perf_counter() - start
+        with engine.connect() as connection:
+            incremental = snapshot(connection)
+        rebuild_profile_rollups(engine)
+        with engine.connect() as connection:
+            consistent = incremental == snapshot(connection)
+        engine.dispose()
+
+    print(f"📋 {source_rows} levels -> {rollup_rows} rollup rows; full build {build_s:.1f} s\n")
+    print(f"Monthly temperature, {DEPTH_RANGE[0]:.0f}-{DEPTH_RANGE[1]:.0f} dbar, {SAMPLE_FLOATS} floats:")
+    print(f"   raw levels: {raw_s / SAMPLE_FLOATS * 1000:8.2f} ms per float")
+    print(f"   rollups:    {rollup_s / SAMPLE_FLOATS * 1000:8.2f} ms per float  ({raw_s / rollup_s:.1f}x)")
+    print(f"   {'✅' if agree == SAMPLE_FLOATS else '🔴'} same answer for {agree}/{SAMPLE_FLOATS} floats\n")
+    print(f"Incremental refresh of one profile: {refresh_s / args.reloads * 1000:.2f} ms "
+          f"(full build {build_s * 1000:.0f} ms)")
+    print(f"   {'✅' if consistent else '🔴'} after {args.reloads} incremental refreshes the rollups "
+          f"{'match' if consistent else 'differ from'} a full rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Benchmark: the backend's argo_profiles queries before and after the managed schema (schema.py).
+# Usage: python -m benchmarks.bench_schema [--rows 2000000] [--repeat 20]
+# Builds the legacy table (no indexes, as to_sql created it) in a throwaway SQLite file, or uses
+# DATABASE_URL if set, times the queries the backend and the chat fast path run, migrates with
+# migrate_profiles_table and times them again. Bbox queries use the grid_cell ranges after the
+# migration. Results are compared so the migration is checked to be lossless.
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from data_pipeline.schema import migrate_profiles_table, describe_profiles_table, bbox_grid_clause
+from benchmarks.load_test_backend import build_sqlite_database
+
+FLOAT_ID = 2900123
+# (lat_min, lat_max, lon_min, lon_max): a 2-degree box and a 7-degree one.
+BBOXES = {"bbox 2 deg": (5.0, 7.0, 65.0, 67.0), "bbox 7 deg": (5.0, 12.0, 65.0, 72.0)}
+
+
+def bbox_query(bbox, managed):
+    where = "latitude BETWEEN :lat_min AND :lat_max AND longitude BETWEEN :lon_min AND :lon_max"
+    params = dict(zip(("lat_min", "lat_max", "lon_min", "lon_max"), bbox))
+    if managed:
+        grid_sql, grid_params = bbox_grid_clause(*bbox)
+        where = f"{grid_sql} AND {where}"
+        params.update(grid_params)
+    return f"SELECT COUNT(*), AVG(salinity) FROM argo_profiles WHERE {where}", params
+
+
+def queries(managed):
+    """name -> (sql, params): the backend's per-float reads, a date window and bboxes."""
+    return {
+        "profile (float_id)": ("SELECT pressure, temperature, profile_date FROM argo_profiles "
+                               "WHERE float_id = :float_id ORDER BY pressure LIMIT 100", {"float_id": FLOAT_ID}),
+        "timeseries (float_id, date)": ("SELECT profile_date, temperature, pressure FROM argo_profiles "
+                                        "WHERE float_id = :float_id AND profile_date >= :start ORDER BY profile_date",
+                                        {"float_id": FLOAT_ID, "start": "2023-01-01"}),
+        "one month": ("SELECT COUNT(*), AVG(temperature) FROM argo_profiles "
+                      "WHERE profile_date >= :start AND profile_date < :end",
+                      {"start": "2022-03-01", "end": "2022-04-01"}),
+        **{name: bbox_query(bbox, managed) for name, bbox in BBOXES.items()},
+        "stats (full scan)": ("SELECT COUNT(DISTINCT float_id), COUNT(*), MAX(profile_date) FROM argo_profiles", {}),
+    }
+
+
+def run_queries(engine, managed, repeat):
+    timings, results = {}, {}
+    with engine.connect() as connection:
+        for name, (sql, params) in queries(managed).items():
+            samples = []
+            for _ in range(repeat if "full scan" not in name else max(repeat // 5, 1)):
+                start = time.perf_counter()
+                rows = connection.execute(text(sql), params).fetchall()
+                samples.append(time.perf_counter() - start)
+            timings[name] = np.median(samples) * 1000
+            # Rows with equal sort keys may come back in either order.
+            results[name] = sorted(tuple(round(v, 6) if isinstance(v, float) else v for v in row) for row in rows)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend queries before/after the managed argo_profiles schema.")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = os.getenv("DATABASE_URL")
+        if not url:
+            db_path = os.path.join(tmp, 'schema.db')
+            build_sqlite_database(db_path, args.rows)
+            url = f"sqlite:///{db_path}"
+        engine = create_engine(url)
+
+        before, before_results = run_queries(engine, managed=False, repeat=args.repeat)
+        start = time.perf_counter()
+        copied = migrate_profiles_table(engine)
+        migrate_s = time.perf_counter() - start
+        after, after_results = run_queries(engine, managed=True, repeat=args.repeat)
+        description = describe_profiles_table(engine)
+        engine.dispose()
+
+    print(f"📋 {copied} rows on {engine.dialect.name}; migration took {migrate_s:.1f} s")
+    print(f"   indexes: {', '.join(description['indexes'])}\n")
+    print(f"{'query':<30} {'before ms':>10} {'after ms':>10} {'speed-up':>9}  same result")
+    for name in before:
+        same = "✅" if before_results[name] == after_results[name] else "🔴"
+        print(f"{name:<30} {before[name]:10.2f} {after[name]:10.2f} {before[name] / after[name]:8.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Benchmark: response size and fidelity of decimated / binary profile and timeseries payloads.
+# Usage: python -m benchmarks.bench_series_encoding [--samples 200000] [--points 1000,2000,5000]
+# Builds a synthetic float record (thermocline-shaped profiles with noise and a few sharp
+# intrusions, sampled over time) and encodes it the way the profile / timeseries endpoints do:
+# the old verbose JSON of every sample, then JSON, f32 and Arrow of the full series and of LTTB
+# decimations. Fidelity compares each decimation against every-k-th-sample striding of the same
+# size: how much of the value range survives and the RMS / worst error of the interpolated curve.
+
+import json
+import time
+import argparse
+import numpy as np
+
+from backend_core.series_codec import lttb, encode_f32, encode_arrow, ARROW_AVAILABLE, to_epoch_seconds
+
+
+def synthetic_series(samples, seed=3):
+    rng = np.random.default_rng(seed)
+    depth = np.sort(rng.uniform(0, 2000, samples))
+    value = 4 + 24 / (1 + np.exp((depth - 150) / 40)) + rng.normal(0, 0.05, samples)
+    # A few thin intrusions that a plot should still show.
+    for centre in rng.uniform(100, 1800, 6):
+        value += 3 * np.exp(-((depth - centre) / 2) ** 2)
+    time = np.datetime64('2023-01-01', 'ms') + np.sort(rng.integers(0, 365 * 86400_000, samples)).astype('timedelta64[ms]')
+    return {"depth": depth, "value": value, "time": time}
+
+
+def old_json(columns):
+    # The previous endpoint: ISO timestamps and a dict per sample.
+    times = np.datetime_as_string(columns["time"], unit="s").tolist()
+    rows = [{"timestamp": t, "temperature": v, "depth": d}
+            for t, v, d in zip(times, columns["value"].tolist(), columns["depth"].tolist())]
+    return json.dumps({"float_id": "2900001", "data": rows}).encode()
+
+
+def new_json(columns):
+    return json.dumps({"depth": columns["depth"].tolist(), "values": columns["value"].tolist(),
+                       "timestamps": np.datetime_as_string(columns["time"], unit="s").tolist()}).encode()
+
+
+def fidelity(x, y, keep):
+    """(share of the value range kept, RMS and worst error of the interpolated curve over every sample)"""
+    kept_range = (y[keep].max() - y[keep].min()) / (y.max() - y.min())
+    error = np.abs(np.interp(x, x[keep], y[keep]) - y)
+    return kept_range, np.sqrt(np.mean(error ** 2)), error.max()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decimated and binary series payloads: bytes and fidelity.")
+    parser.add_argument('--samples', type=int, default=200_000)
+    parser.add_argument('--points', default="1000,2000,5000")
+    args = parser.parse_args()
+
+    columns = synthetic_series(args.samples)
+    x, y = columns["depth"], columns["value"]
+    print(f"📋 {args.samples} samples\n")
+    print(f"{'payload':<28} {'bytes':>12} {'encode ms':>10}")
+    body, ms = timed(lambda: old_json(columns))
+    print(f"{'old JSON, every sample':<28} {len(body):12,d} {ms:10.1f}")
+    for name, encode in [("JSON", new_json), ("f32", encode_f32)] + ([("arrow", encode_arrow)] if ARROW_AVAILABLE else []):
+        body, ms = timed(lambda: encode(columns))
+        print(f"{name + ', every sample':<28} {len(body):12,d} {ms:10.1f}")
+
+    print(f"\n{'decimation':<28} {'bytes f32':>12} {'lttb ms':>10} {'range kept':>11} {'RMS error':>10} {'max error':>10}")
+    for points in [int(p) for p in args.points.split(",")]:
+        keep, ms = timed(lambda: lttb(x, y, points))
+        stride = np.unique(np.linspace(0, len(x) - 1, points).astype(np.int64))
+        decimated = {name: values[keep] for name, values in columns.items()}
+        size = len(encode_f32(decimated))
+        for label, picks, cost in [(f"LTTB {points}", keep, ms), (f"stride {points}", stride, 0.0)]:
+            kept_range, rms, worst = fidelity(x, y, picks)
+            print(f"{label:<28} {size:12,d} {cost:10.1f} {kept_range:10.1%} {rms:10.3f} {worst:10.3f}")
+
+    t = to_epoch_seconds(columns["time"])
+    keep, ms = timed(lambda: lttb(t, y, 1000))
+    print(f"\nTimeseries LTTB to 1000 points over time: {ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Benchmark: semantic NL-to-SQL cache (ai_core/sql_cache.py) in front of a fake LLM.
+# Usage: python -m benchmarks.bench_sql_cache [--questions 400] [--llm-latency 0.3] [--threshold 0.92]
+# Replays a stream of paraphrased questions through run_ai_pipeline with the RAG chain and the
+# SQL database replaced by fakes, and reports LLM calls, latency, exact/semantic hit rates and
+# wrong hits (a cached SQL served for a question that needed a different one). Then reloads the
+# cache from disk to show it survives a restart.
+# Embeddings come from all-MiniLM-L6-v2 when sentence-transformers is installed; otherwise a
+# hashed character-trigram embedder stands in (cruder, so pair it with a lower --threshold, e.g. 0.8).
+# Last, near misses -- questions one region, variable, direction or month apart -- are looked up
+# with the very embedding of the cached question (similarity 1.0, the worst case of any embedder);
+# none may be served the cached SQL.
+
+import io
+import os
+import time
+import zlib
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+from ai_core import main_agent
+from ai_core.sql_cache import SemanticSQLCache
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+# (intent SQL, paraphrases); numbers are filled in so that "top 5" and "top 10" are different intents.
+INTENTS = [
+    ("SELECT float_id, latitude, longitude, salinity FROM argo_profiles ORDER BY salinity DESC LIMIT {n}",
+     ["Show me the {n} floats with the highest salinity", "show me the {n} floats with highest salinity?",
+      "Which {n} floats have the highest salinity", "List the {n} floats with the highest salinity values"]),
+    ("SELECT AVG(temperature) FROM argo_profiles WHERE EXTRACT(YEAR FROM profile_date) = {year}",
+     ["What was the average temperature in {year}", "average temperature in {year}?",
+      "What is the mean temperature for {year}", "Show the average temperature during {year}"]),
+    ("SELECT profile_date, pressure, temperature FROM argo_profiles WHERE float_id = {wmo} LIMIT 50",
+     ["Show the temperature profile of float {wmo}", "temperature profile for float {wmo}",
+      "Plot the temperature profile of float {wmo}", "Give me the temperature profile of float {wmo}"]),
+]
+
+# (cached question, question that must not get its SQL)
+NEAR_MISSES = [
+    ("average salinity in the Arabian Sea", "average salinity in the Bay of Bengal"),
+    ("Show me the 5 floats with the highest salinity", "Show me the 5 floats with the lowest salinity"),
+    ("average temperature in the Arabian Sea in March", "average temperature in the Arabian Sea in April"),
+    ("maximum temperature near the equator", "maximum salinity near the equator"),
+    ("average temperature in 2023", "maximum temperature in 2023"),
+]
+
+
+class HashedTrigramEmbedder:
+    """Bag of hashed character trigrams: a dependency-free stand-in for a sentence embedding."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def __call__(self, text):
+        text = f"  {text.lower()}  "
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(len(text) - 2):
+            vector[zlib.crc32(text[i:i + 3].encode()) % self.dim] += 1
+        return vector
+
+
+class FakeChain:
+    """Stands in for retriever + Gemini: sleeps, then returns the SQL for the question's intent."""
+
+    def __init__(self, latency, answers):
+        self.latency = latency
+        self.answers = answers
+        self.calls = 0
+
+    def invoke(self, question):
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"```sql\n{self.answers[question]}\n```"
+
+
+class FakeSQLDatabase:
+    def run(self, sql):
+        return "[(1902672, 15.2, 70.1)]"
+
+
+def question_stream(n_questions, seed=3):
+    """Zipf-ish mix of intents and paraphrases, like a real chat log; returns [(question, expected SQL)]."""
+    rng = np.random.default_rng(seed)
+    variants = []
+    for sql, phrasings in INTENTS:
+        for n, year, wmo in [(5, 2021, 2902746), (10, 2022, 1902672), (20, 2023, 2900001)]:
+            expected = sql.format(n=n, year=year, wmo=wmo)
+            variants.append([(p.format(n=n, year=year, wmo=wmo), expected) for p in phrasings])
+    weights = 1 / np.arange(1, len(variants) + 1)
+    picks = rng.choice(len(variants), size=n_questions, p=weights / weights.sum())
+    return [variants[i][rng.integers(len(variants[i]))] for i in picks]
+
+
+def run_stream(stream, cache, latency):
+    answers = dict(stream)
+    chain = FakeChain(latency, answers)
+    main_agent.initialize_ai_core(chain=chain, sql_database=FakeSQLDatabase(), cache=cache if cache else False)
+    latencies, wrong = [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for question, expected in stream:
+            start = time.perf_counter()
+            result = main_agent.run_ai_pipeline(question)
+            latencies.append(time.perf_counter() - start)
+            wrong += result["sql_query"] != expected
+    return chain.calls, np.array(latencies) * 1000, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the semantic NL-to-SQL cache with a fake LLM.")
+    parser.add_argument('--questions', type=int, default=400)
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="Similarity threshold (default 0.92 with MiniLM, 0.8 with the trigram stand-in).")
+    args = parser.parse_args()
+    # These questions have fast-path shapes; this benchmark measures the LLM path.
+    main_agent.FAST_PATH_ENABLED = False
+
+    if SENTENCE_TRANSFORMERS_AVAILABLE:
+        model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        embed, embedder, default_threshold = model.encode, "all-MiniLM-L6-v2", 0.92
+    else:
+        embed, embedder, default_threshold = HashedTrigramEmbedder(), "hashed trigrams (stand-in)", 0.8
+    threshold = args.threshold if args.threshold is not None else default_threshold
+
+    stream = question_stream(args.questions)
+    print(f"{args.questions} questions, {len(set(q for q, _ in stream))} distinct wordings, "
+          f"{len(set(s for _, s in stream))} distinct SQL; fake LLM {args.llm_latency * 1000:.0f} ms; "
+          f"embedder: {embedder}, threshold {threshold}\n")
+    print(f"{'scenario':<24} {'LLM calls':>9} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'exact':>6} {'semantic':>8} {'wrong':>6}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sql_cache.npz')
+        scenarios = [
+            ("no cache", None),
+            ("exact only", SemanticSQLCache(embed_fn=None, path=None)),
+            ("exact + semantic", SemanticSQLCache(embed_fn=embed, threshold=threshold, path=path)),
+        ]
+        for label, cache in scenarios:
+            calls, ms, wrong = run_stream(stream, cache, args.llm_latency)
+            stats = cache.status() if cache else {"exact_hits": 0, "semantic_hits": 0}
+            print(f"{label:<24} {calls:>9} {ms.mean():8.1f} {np.percentile(ms, 50):8.1f} "
+                  f"{np.percentile(ms, 99):8.1f} {stats['exact_hits']:>6} {stats['semantic_hits']:>8} {wrong:>6}")
+
+        scenarios[-1][1].save()
+        restarted = SemanticSQLCache(embed_fn=embed, threshold=threshold, path=path)
+        calls, ms, wrong = run_stream(stream, restarted, args.llm_latency)
+        print(f"{'after restart (disk)':<24} {calls:>9} {ms.mean():8.1f} {np.percentile(ms, 50):8.1f} "
+              f"{np.percentile(ms, 99):8.1f} {restarted.stats['exact_hits']:>6} "
+              f"{restarted.stats['semantic_hits']:>8} {wrong:>6}")
+        print(f"\n📋 Cache file: {os.path.getsize(path) / 1e3:.1f} kB, {len(restarted.entries)} entries")
+
+    served = 0
+    for cached, other in NEAR_MISSES:
+        cache = SemanticSQLCache(embed_fn=None, path=None)
+        vector = np.asarray(embed(cached), dtype=np.float32)
+        vector /= np.linalg.norm(vector)
+        cache.store(cached, "SELECT 1", embedding=vector)
+        hit = cache.lookup(other, embedding=vector)
+        served += hit is not None
+        print(f"   {'🔴 served' if hit else '✅ rejected'}: {other!r} (cached: {cached!r})")
+    print(f"📈 Near misses at similarity 1.0: {served}/{len(NEAR_MISSES)} served the cached SQL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Benchmark: WebSocket broadcast through the per-client-queue hub vs the old serial loop.
+# Usage: python -m benchmarks.bench_ws_fanout [--clients 500] [--messages 20] [--send-ms 1.0]
+# Simulates hundreds of local clients in one event loop: each is a socket stand-in whose
+# send_text takes --send-ms (healthy), 50 ms (slow) or never returns (dead). For three mixes --
+# all healthy, 5% slow, and one dead client -- it broadcasts --messages chat-sized messages with
+# the old approach (await each client's send in turn, as broadcast_to_websockets did) and with
+# BroadcastHub, and reports how long the broadcasting request was blocked, the delivery latency
+# seen by healthy clients (p50 / p99), and what happened to the slow and dead ones. A last,
+# hub-only run sends 100 messages a second to 100 clients, faster than slow clients can take
+# them, so their queues overflow (drop_oldest) while healthy clients keep up. (All clients share
+# the benchmark's one event loop, so far higher aggregate rates measure the simulation instead.) Real sockets
+# behave the same way once a client's TCP buffers are full; uvicorn needs a WebSocket library
+# that is not part of this repo's requirements, so the clients are simulated.
+
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from backend_core.ws_hub import BroadcastHub, encode
+
+SLOW_SEND_MS = 50.0
+# The old loop has no timeout; a dead client would block it forever, so the benchmark gives up here.
+LEGACY_GIVE_UP_SECONDS = 5.0
+
+
+class SimulatedSocket:
+    """send_text / close / receive_json of a client whose every send costs `send_ms` (None: hangs)."""
+
+    def __init__(self, send_ms):
+        self.send_ms = send_ms
+        self.latencies = []
+        self.closed_with = None
+
+    async def send_text(self, text):
+        if self.send_ms is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.send_ms / 1000)
+        sent_at = float(text[text.index('"sent_at": ') + 11:text.rindex('}')])
+        self.latencies.append(time.perf_counter() - sent_at)
+
+    async def send_json(self, message):
+        await self.send_text(encode(message))
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+    async def receive_json(self):
+        await asyncio.Event().wait()
+
+
+def make_sockets(clients, send_ms, slow_share, dead):
+    sockets = []
+    for i in range(clients):
+        if i < dead:
+            sockets.append(SimulatedSocket(None))
+        elif i < dead + int(clients * slow_share):
+            sockets.append(SimulatedSocket(SLOW_SEND_MS))
+        else:
+            sockets.append(SimulatedSocket(send_ms))
+    return sockets
+
+
+def message(i):
+    return {"type": "chat_response", "data": {"reply": "x" * 400, "seq": i}, "sent_at": time.perf_counter()}
+
+
+async def run_legacy(sockets, messages, interval):
+    blocked = []
+    for i in range(messages):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(legacy_broadcast(sockets, message(i)), LEGACY_GIVE_UP_SECONDS)
+        except asyncio.TimeoutError:
+            blocked.append(time.perf_counter() - start)
+            return blocked, True
+        blocked.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return blocked, False
+
+
+async def legacy_broadcast(sockets, payload):
+    # backend_server.broadcast_to_websockets before the hub: one awaited send per client, in order.
+    for ws in sockets:
+        try:
+            await ws.send_json(payload)
+        except Exception:
+            pass
+
+
+async def run_hub(sockets, messages, interval):
+    hub = BroadcastHub(policy="drop_oldest", heartbeat_seconds=3600, idle_timeout=0, send_timeout=2.0)
+    for ws in sockets:
+        hub.connect(ws)
+    blocked = []
+    for i in range(messages):
+        start = time.perf_counter()
+        hub.publish(message(i), topic="chat")
+        blocked.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    # Let healthy writers drain; the dead client hits the send timeout.
+    await asyncio.sleep(max(SLOW_SEND_MS / 1000 * min(messages, hub.queue_size), 2.5))
+    status = hub.status()
+    await hub.close_all()
+    return blocked, status
+
+
+def report(name, sockets, blocked, extra):
+    healthy = [ws for ws in sockets if ws.send_ms is not None and ws.send_ms < SLOW_SEND_MS]
+    latencies = np.array([l for ws in healthy for l in ws.latencies]) * 1000
+    delivered = sum(len(ws.latencies) for ws in healthy)
+    lat = f"{np.percentile(latencies, 50):8.1f} {np.percentile(latencies, 99):8.1f}" if len(latencies) else f"{'-':>8} {'-':>8}"
+    print(f"  {name:<8} {np.mean(blocked) * 1000:12.2f} {lat} {delivered:>10}  {extra}")
+
+
+async def scenario(title, args, slow_share, dead, messages=None, interval=0.05, serial=True, clients=None):
+    messages = messages or args.messages
+    clients = clients or args.clients
+    expected = (clients - dead - int(clients * slow_share)) * messages
+    print(f"\n📋 {title}: {clients} clients, {messages} broadcasts; healthy deliveries expected {expected}")
+    print(f"  {'':<8} {'blocked ms':>12} {'p50 ms':>8} {'p99 ms':>8} {'delivered':>10}")
+
+    if serial:
+        sockets = make_sockets(clients, args.send_ms, slow_share, dead)
+        blocked, gave_up = await run_legacy(sockets, messages, interval)
+        report("serial", sockets, blocked,
+               f"🔴 stalled on a dead client, gave up after {LEGACY_GIVE_UP_SECONDS:.0f}s" if gave_up else "")
+
+    sockets = make_sockets(clients, args.send_ms, slow_share, dead)
+    blocked, status = await run_hub(sockets, messages, interval)
+    report("hub", sockets, blocked, f"dropped {status['dropped']}, slow disconnects {status['slow_disconnects']}")
+
+
+async def run(args):
+    await scenario("All healthy", args, 0.0, 0)
+    await scenario("5% slow consumers", args, 0.05, 0)
+    await scenario("One dead client", args, 0.0, 1)
+    await scenario("Sustained 100/s, 5% slow (hub only)", args, 0.05, 0, messages=600, interval=0.01, serial=False,
+                   clients=100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out: per-client queues vs serial sends.")
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--send-ms', type=float, default=1.0, help="Cost of one send to a healthy client.")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
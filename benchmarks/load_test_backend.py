@@ -0,0 +1,157 @@
+# Load test: latency of cheap endpoints while heavy queries run (backend_server.py).
+# Usage: python -m benchmarks.load_test_backend [--rows 3000000] [--heavy-clients 4] [--requests 300]
+# Builds a synthetic argo_profiles table in a throwaway SQLite file (or uses DATABASE_URL if set),
+# starts the real FastAPI app under uvicorn in-process, and measures p50/p95/p99 of cheap endpoints
+# ("/" and the primary-key /api/quality lookup) first idle, then while clients hammer a float's raw
+# timeseries (a full scan of the unindexed synthetic table). It finishes by abandoning heavy requests mid-flight and checking that
+# the server cancels their queries instead of running them to completion.
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import sqlite3
+import numpy as np
+
+import httpx
+import uvicorn
+from sqlalchemy import create_engine
+
+from data_pipeline.float_summary import rebuild_float_summary
+from data_pipeline.profile_rollups import rebuild_profile_rollups
+from data_pipeline.archive_stats import rebuild_archive_stats
+
+PORT = 8765
+CHEAP_PATHS = ["/", "/api/quality/2900001"]
+HEAVY_PATH = "/api/floats/2900001/timeseries?days=100000&points=0"
+
+
+def build_sqlite_database(path, rows, seed=7):
+    """
+    argo_profiles with `rows` synthetic levels, plus one float_quality row for the cheap lookup
+    and the float_summary / archive_stats / profile_rollups tables behind /api/floats, /api/stats and
+    the bucketed timeseries.
+    """
+    rng = np.random.default_rng(seed)
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE argo_profiles (platform_number TEXT, float_id BIGINT, cycle_number INTEGER,
+                          profile_date DATETIME, latitude FLOAT, longitude FLOAT, pressure FLOAT,
+                          temperature FLOAT, salinity FLOAT)""")
+    chunk = 500_000
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        float_ids = 2900000 + rng.integers(0, 400, n)
+        dates = (np.datetime64('2020-01-01') + rng.integers(0, 1500, n).astype('timedelta64[D]')).astype(str)
+        connection.executemany(
+            "INSERT INTO argo_profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(float_ids.astype(str), float_ids.tolist(), rng.integers(1, 200, n).tolist(), dates.tolist(),
+                rng.uniform(-10, 25, n).tolist(), rng.uniform(50, 100, n).tolist(), rng.uniform(0, 2000, n).tolist(),
+                rng.uniform(2, 30, n).tolist(), rng.uniform(33, 37, n).tolist()))
+    connection.execute("""CREATE TABLE float_quality (float_id BIGINT PRIMARY KEY, profiles INTEGER, levels BIGINT,
+                          overall_quality FLOAT, temperature_quality FLOAT, salinity_quality FLOAT,
+                          missing_data_fraction FLOAT, flagged_profiles INTEGER, computed_at DATETIME)""")
+    connection.execute("INSERT INTO float_quality VALUES (2900001, 10, 1000, 0.97, 0.98, 0.96, 0.01, 0, '2024-01-01')")
+    connection.commit()
+    connection.close()
+    engine = create_engine(f"sqlite:///{path}")
+    rebuild_float_summary(engine)
+    rebuild_archive_stats(engine)
+    rebuild_profile_rollups(engine)
+    engine.dispose()
+
+
+def start_server():
+    import backend_server
+    config = uvicorn.Config(backend_server.app, host="127.0.0.1", port=PORT, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return backend_server, server, thread
+
+
+def percentiles(samples):
+    values = np.array(samples) * 1000
+    return f"p50 {np.percentile(values, 50):7.1f} ms  p95 {np.percentile(values, 95):7.1f} ms  " \
+           f"p99 {np.percentile(values, 99):7.1f} ms  max {values.max():7.1f} ms"
+
+
+async def measure_cheap(client, n_requests):
+    latencies = {path: [] for path in CHEAP_PATHS}
+    for i in range(n_requests):
+        path = CHEAP_PATHS[i % len(CHEAP_PATHS)]
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies[path].append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code, response.text)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def heavy_loop(client, stop, durations):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(HEAVY_PATH, timeout=120)
+        durations.append((time.perf_counter() - start, response.status_code))
+
+
+async def run(args, backend):
+    base_url = f"http://127.0.0.1:{PORT}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await client.get("/")
+        idle = await measure_cheap(client, args.requests)
+
+        stop = asyncio.Event()
+        durations = []
+        heavy = [asyncio.create_task(heavy_loop(httpx.AsyncClient(base_url=base_url), stop, durations))
+                 for _ in range(args.heavy_clients)]
+        await asyncio.sleep(0.5)
+        loaded = await measure_cheap(client, args.requests)
+        stop.set()
+        await asyncio.gather(*heavy)
+
+    print(f"\nHeavy query ({HEAVY_PATH}): {len(durations)} completed, "
+          f"mean {np.mean([d for d, _ in durations]):.2f}s each, {args.heavy_clients} clients in a loop")
+    for path in CHEAP_PATHS:
+        print(f"\n{path}")
+        print(f"  idle:              {percentiles(idle[path])}")
+        print(f"  under heavy load:  {percentiles(loaded[path])}")
+
+    # Clients that give up: the server should notice the disconnect and cancel their queries.
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        abandoned = [asyncio.create_task(client.get(HEAVY_PATH, timeout=0.3)) for _ in range(args.heavy_clients)]
+        await asyncio.gather(*abandoned, return_exceptions=True)
+    start = time.perf_counter()
+    while backend.database.in_flight and time.perf_counter() - start < 10:
+        await asyncio.sleep(0.05)
+    print(f"\nAbandoned {args.heavy_clients} heavy requests after 0.3s; server-side queries drained in "
+          f"{time.perf_counter() - start:.2f}s (in flight now: {backend.database.in_flight})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cheap-endpoint latency while heavy queries run.")
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--heavy-clients', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=300, help="Cheap requests per phase.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not os.getenv("DATABASE_URL"):
+            db_path = os.path.join(tmp, 'load_test.db')
+            print(f"Building synthetic SQLite database with {args.rows} rows...")
+            build_sqlite_database(db_path, args.rows)
+            os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+        backend, server, thread = start_server()
+        try:
+            asyncio.run(run(args, backend))
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
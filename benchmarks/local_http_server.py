@@ -0,0 +1,130 @@
+# Offline stand-in for the GDAC HTTP server, used by the index and download benchmarks.
+# Serves a directory with the headers the real server sends: ETag / Last-Modified
+# (answering conditional requests with 304) and single-range "Range: bytes=N-" requests (206).
+# It can also add per-request latency (to mimic a remote server) and cut the first transfer of
+# every file halfway (to exercise resume).
+# Usage: python -m benchmarks.local_http_server DIRECTORY [--port 8765] [--latency 0.05] [--cut-first]
+#   or from code:  with serve_directory('some/dir', latency=0.05) as base_url: ...
+
+import os
+import argparse
+import time
+import threading
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler plus ETag validators and single byte-range support."""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    cut_first = False
+    _cut_paths = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) or not os.path.exists(path):
+            return super().send_head()
+
+        if self.latency:
+            time.sleep(self.latency)
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime_ns):x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        if self.headers.get('If-None-Match') == etag or self._not_modified_since(stat.st_mtime):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        start, end = 0, stat.st_size - 1
+        range_header = self.headers.get('Range')
+        if range_header and range_header.startswith('bytes='):
+            first, _, last = range_header[len('bytes='):].partition('-')
+            start = int(first) if first else 0
+            end = min(int(last), end) if last else end
+            if start >= stat.st_size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{stat.st_size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{stat.st_size}')
+        else:
+            self.send_response(200)
+
+        f = open(path, 'rb')
+        f.seek(start)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self._remaining = end - start + 1
+        if self.cut_first and path not in self._cut_paths:
+            self._cut_paths.add(path)
+            self._remaining = max(self._remaining // 2, 1)
+            self.close_connection = True
+        return f
+
+    def _not_modified_since(self, mtime):
+        since = self.headers.get('If-Modified-Since')
+        if not since or self.headers.get('If-None-Match'):
+            return False
+        try:
+            return int(mtime) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, '_remaining', None)
+        while remaining is None or remaining > 0:
+            chunk = source.read(64 * 1024 if remaining is None else min(64 * 1024, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+
+def make_server(directory, port=0, latency=0.0, cut_first=False):
+    handler = type('Handler', (RangeRequestHandler,), {'latency': latency, 'cut_first': cut_first, '_cut_paths': set()})
+    return ThreadingHTTPServer(('127.0.0.1', port), partial(handler, directory=directory))
+
+
+@contextmanager
+def serve_directory(directory, port=0, latency=0.0, cut_first=False):
+    """Serves `directory` on localhost in a background thread; yields the base URL."""
+    server = make_server(directory, port, latency, cut_first)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a directory like the GDAC HTTP server.")
+    parser.add_argument('directory')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before each response.")
+    parser.add_argument('--cut-first', action='store_true', help="Cut the first transfer of every file halfway.")
+    args = parser.parse_args()
+    server = make_server(args.directory, args.port, args.latency, args.cut_first)
+    print(f"Serving '{args.directory}' on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Archive-wide counters behind /api/stats (Data Squad).
+# One row, so the polled stats endpoint never scans argo_profiles:
+#
+#   archive_stats  id (= 1), floats, profiles (distinct float x cycle), levels (argo_profiles rows),
+#                  last_date (latest profile date), updated_at (last publish), reconciled_at
+#
+# The ETL maintains it incrementally from float_summary: publish_staged_load reads the touched
+# floats' summary totals before and after refreshing them and adds the difference to the counters,
+# in the same transaction as the data. Floats active in the last N days are not a counter (they
+# depend on "now"); the backend counts them from float_summary.last_date, which is indexed.
+#
+# The reconcile job checks the counters (and float_summary's totals) against a full scan of
+# argo_profiles and, with --fix, rewrites them (and float_summary, when that drifted too) from it.
+#
+# Usage: python -m data_pipeline.archive_stats --status | --rebuild | --reconcile [--fix]
+
+import sys
+import argparse
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, DateTime
+from sqlalchemy import text, bindparam
+
+from data_pipeline.bulk_loader import TABLE_NAME
+from data_pipeline.float_summary import FLOAT_SUMMARY_TABLE, refresh_float_summary, REFRESH_CHUNK
+
+ARCHIVE_STATS_TABLE = 'archive_stats'
+COUNTERS = ('floats', 'profiles', 'levels')
+
+
+def archive_stats_table(metadata=None):
+    return Table(
+        ARCHIVE_STATS_TABLE, metadata if metadata is not None else MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('floats', BigInteger, nullable=False),
+        Column('profiles', BigInteger, nullable=False),
+        Column('levels', BigInteger, nullable=False),
+        Column('last_date', DateTime),
+        Column('updated_at', DateTime),
+        Column('reconciled_at', DateTime),
+    )
+
+
+def ensure_archive_stats_table(engine):
+    metadata = MetaData()
+    archive_stats_table(metadata)
+    metadata.create_all(engine, checkfirst=True)
+
+
+def summary_totals(connection, float_ids=None):
+    """{floats, profiles, levels} summed over float_summary (only `float_ids` when given)."""
+    query = f"SELECT COUNT(*), COALESCE(SUM(cycles), 0), COALESCE(SUM(levels), 0) FROM {FLOAT_SUMMARY_TABLE}"
+    if float_ids is None:
+        row = connection.execute(text(query)).one()
+        return dict(zip(COUNTERS, (int(v) for v in row)))
+    totals = dict.fromkeys(COUNTERS, 0)
+    float_ids = sorted({int(f) for f in float_ids})
+    for start in range(0, len(float_ids), REFRESH_CHUNK):
+        statement = text(f"{query} WHERE float_id IN :float_ids").bindparams(bindparam('float_ids', expanding=True))
+        row = connection.execute(statement, {'float_ids': float_ids[start:start + REFRESH_CHUNK]}).one()
+        for name, value in zip(COUNTERS, row):
+            totals[name] += int(value)
+    return totals
+
+
+def _as_datetime(value):
+    # SQLite hands back MAX() of a date column as text.
+    return pd.Timestamp(value).to_pydatetime() if value is not None else None
+
+
+def _last_date(connection):
+    # Served by ix_float_summary_last_date.
+    return _as_datetime(connection.execute(text(f"SELECT MAX(last_date) FROM {FLOAT_SUMMARY_TABLE}")).scalar())
+
+
+def write_archive_stats(connection, totals, last_date, reconciled=False):
+    """Overwrites the counters with `totals`."""
+    now = datetime.now()
+    values = {**totals, 'last_date': last_date, 'updated_at': now}
+    if reconciled:
+        values['reconciled_at'] = now
+    assignments = ", ".join(f"{name} = :{name}" for name in values)
+    updated = connection.execute(text(f"UPDATE {ARCHIVE_STATS_TABLE} SET {assignments} WHERE id = 1"), values)
+    if updated.rowcount == 0:
+        connection.execute(archive_stats_table().insert(), {'id': 1, **values})
+
+
+def refresh_summary_and_stats(connection, float_ids=None):
+    """
+    refresh_float_summary for `float_ids` (every float when None) inside the caller's transaction,
+    moving the archive counters by the change in those floats' totals. A full refresh, or counters
+    that do not exist yet, are recomputed from the whole summary instead.
+    """
+    has_counters = connection.execute(text(f"SELECT COUNT(*) FROM {ARCHIVE_STATS_TABLE} WHERE id = 1")).scalar()
+    if float_ids is None or not has_counters:
+        refresh_float_summary(connection, float_ids)
+        write_archive_stats(connection, summary_totals(connection), _last_date(connection))
+        return
+
+    before = summary_totals(connection, float_ids)
+    refresh_float_summary(connection, float_ids)
+    after = summary_totals(connection, float_ids)
+    deltas = {name: after[name] - before[name] for name in COUNTERS}
+    assignments = ", ".join(f"{name} = {name} + :{name}" for name in COUNTERS)
+    connection.execute(text(
+        f"UPDATE {ARCHIVE_STATS_TABLE} SET {assignments}, last_date = :last_date, updated_at = :now WHERE id = 1"
+    ), {**deltas, 'last_date': _last_date(connection), 'now': datetime.now()})
+
+
+def rebuild_archive_stats(engine):
+    """Recomputes the counters from float_summary (no scan of argo_profiles)."""
+    ensure_archive_stats_table(engine)
+    with engine.begin() as connection:
+        totals = summary_totals(connection)
+        write_archive_stats(connection, totals, _last_date(connection))
+    return totals
+
+
+def scan_totals(connection):
+    """{floats, profiles, levels, last_date} from a full scan of argo_profiles."""
+    floats, levels, last_date = connection.execute(text(
+        f"SELECT COUNT(DISTINCT float_id), COUNT(*), MAX(profile_date) FROM {TABLE_NAME}"
+    )).one()
+    profiles = connection.execute(text(
+        f"SELECT COUNT(*) FROM (SELECT DISTINCT float_id, cycle_number FROM {TABLE_NAME} "
+        f"WHERE cycle_number IS NOT NULL) p"
+    )).scalar()
+    return {'floats': int(floats), 'profiles': int(profiles), 'levels': int(levels),
+            'last_date': _as_datetime(last_date)}
+
+
+def read_archive_stats(connection):
+    row = connection.execute(text(
+        f"SELECT floats, profiles, levels, last_date, updated_at, reconciled_at FROM {ARCHIVE_STATS_TABLE} WHERE id = 1"
+    )).mappings().first()
+    return dict(row) if row else None
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, int):
+        return a == b
+    return _as_datetime(a) == _as_datetime(b)
+
+
+def reconcile_archive_stats(engine, fix=False):
+    """
+    Compares the counters and float_summary's totals with a full scan of argo_profiles.
+    Returns {name: (expected, counter, summary)} for every mismatch; with `fix`, and a mismatch,
+    recomputes float_summary and rewrites the counters from the scan.
+    """
+    ensure_archive_stats_table(engine)
+    with engine.begin() as connection:
+        scanned = scan_totals(connection)
+        counters = read_archive_stats(connection) or {}
+        summary = {**summary_totals(connection), 'last_date': _last_date(connection)}
+        mismatches = {}
+        for name in COUNTERS + ('last_date',):
+            if not (_same(scanned[name], counters.get(name)) and _same(scanned[name], summary[name])):
+                mismatches[name] = (scanned[name], counters.get(name), summary[name])
+        if fix and mismatches:
+            if any(not _same(scanned[name], summary[name]) for name in mismatches):
+                refresh_float_summary(connection)
+            write_archive_stats(connection, {name: scanned[name] for name in COUNTERS}, scanned['last_date'],
+                                reconciled=True)
+        elif not mismatches:
+            connection.execute(text(f"UPDATE {ARCHIVE_STATS_TABLE} SET reconciled_at = :now WHERE id = 1"),
+                               {'now': datetime.now()})
+    return mismatches
+
+
+def main(argv=None):
+    from data_pipeline.build_database import create_db_engine
+
+    parser = argparse.ArgumentParser(description="Maintain and verify the archive_stats counters.")
+    parser.add_argument('--status', action='store_true', help="Print the current counters.")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute the counters from float_summary.")
+    parser.add_argument('--reconcile', action='store_true', help="Check the counters against a full scan.")
+    parser.add_argument('--fix', action='store_true', help="With --reconcile, rewrite the counters from the scan.")
+    args = parser.parse_args(argv)
+
+    engine = create_db_engine()
+    ensure_archive_stats_table(engine)
+    if args.rebuild:
+        totals = rebuild_archive_stats(engine)
+        print(f"✅ {ARCHIVE_STATS_TABLE}: {totals}")
+    elif args.reconcile:
+        mismatches = reconcile_archive_stats(engine, fix=args.fix)
+        if not mismatches:
+            print(f"✅ {ARCHIVE_STATS_TABLE} matches a full scan of {TABLE_NAME}.")
+            return
+        for name, (expected, counter, summary) in mismatches.items():
+            print(f"🔴 {name}: scan {expected}, counter {counter}, float_summary {summary}")
+        if args.fix:
+            print("✅ Counters (and float_summary) rewritten from the scan.")
+        else:
+            sys.exit(1)
+    elif args.status:
+        with engine.connect() as connection:
+            print(f"📋 {read_archive_stats(connection)}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
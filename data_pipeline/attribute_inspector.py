@@ -1,83 +1,270 @@
 # This is an upgraded, intelligent utility for the Data Squad.
-# It scans all .nc files, determines a "common" set of attributes based on the first file,
-# and then reports only the files that have different attributes, specifying what's missing or extra.
+# It scans all .nc files, groups them by "schema signature" (the set of variables with
+# their dimensions and types), and reports how each group differs from the most common one,
+# specifying what's missing or extra.
+#
+# Only NetCDF headers are read (netCDF4, no xarray decoding), files are scanned across a
+# process pool, and each file's schema is cached by (size, mtime) so re-runs only open
+# files that changed.
+# Usage: python -m data_pipeline.attribute_inspector [--workers N] [--no-cache]
+# Or from code: scan_schemas('nc files') returns a SchemaScanResult.
 
 import os
-import xarray as xr
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import netCDF4
 
 # --- Configuration ---
 root_data_folder = 'nc files'
+DEFAULT_CACHE_PATH = '.schema_scan_cache.json'
+CACHE_VERSION = 1
+
+
+def find_profile_files(root_folder):
+    """Recursively find all profile files, sorted."""
+    nc_files_to_inspect = []
+    for root, dirs, files in os.walk(root_folder):
+        for file in files:
+            if file.endswith('.nc') and (file.startswith('D') or file.startswith('R')):
+                nc_files_to_inspect.append(os.path.join(root, file))
+    return sorted(nc_files_to_inspect)
 
-print(f"--- 🌊 Starting Smart ARGO Attribute Inspector for folder: '{root_data_folder}' ---\n")
 
-# --- Phase 1: Scan all files and collect their attributes ---
-all_files_attributes = {}
-nc_files_to_inspect = []
+def read_header_schema(file_path):
+    """
+    Reads only the header of a NetCDF file. Returns {variable: "dtype(dim, ...)"}
+    for every non-coordinate variable (what xarray would expose as data_vars).
+    """
+    with netCDF4.Dataset(file_path, 'r') as ds:
+        schema = {}
+        for name, var in ds.variables.items():
+            if name in ds.dimensions:
+                continue
+            schema[name] = f"{var.dtype}({', '.join(var.dimensions)})"
+        return schema
 
-for root, dirs, files in os.walk(root_data_folder):
-    for file in files:
-        if file.endswith('.nc') and (file.startswith('D') or file.startswith('R')):
-            nc_files_to_inspect.append(os.path.join(root, file))
 
-if not nc_files_to_inspect:
-    print(f"⚠️ No profile (.nc) files found in '{root_data_folder}'. Exiting.")
-    exit()
+def schema_signature(schema):
+    """Short stable hash of a schema, used to group identical files."""
+    canonical = json.dumps(sorted(schema.items()), separators=(',', ':'))
+    return hashlib.sha1(canonical.encode()).hexdigest()[:12]
 
-print(f"Found {len(nc_files_to_inspect)} profile files to scan...")
 
-for file_path in nc_files_to_inspect:
-    filename = os.path.basename(file_path)
+def scan_file(file_path):
+    """Worker entry point. Never raises: returns (file_path, schema or None, error or None)."""
     try:
-        with xr.open_dataset(file_path) as dataset:
-            # Store the attributes as a set for easy comparison
-            all_files_attributes[filename] = set(dataset.data_vars.keys())
+        return file_path, read_header_schema(file_path), None
     except Exception as e:
-        print(f"⚠️ Could not read {filename}. Skipping. Error: {e}")
-
-if not all_files_attributes:
-    print("Could not successfully read any files. Exiting.")
-    exit()
-
-print(f"Successfully scanned {len(all_files_attributes)} files.\n")
-
-# --- Phase 2: Analyze the attributes for consistency ---
-
-# Use the first successfully scanned file as the "gold standard"
-first_file_name = list(all_files_attributes.keys())[0]
-base_attributes = all_files_attributes[first_file_name]
-
-print("="*50)
-print(f"Common Attribute Set (based on '{first_file_name}'):")
-for var in sorted(list(base_attributes)):
-    print(f"  - {var}")
-print("="*50)
-
-# Find any files that have a different set of attributes
-inconsistent_files = []
-for filename, attributes in all_files_attributes.items():
-    if attributes != base_attributes:
-        inconsistent_files.append(filename)
-
-# --- Phase 3: Report the findings ---
-if not inconsistent_files:
-    print("\n✅ SUCCESS: All scanned files have a consistent set of data variables.")
-else:
-    print(f"\n⚠️ WARNING: Found {len(inconsistent_files)} files with inconsistent attributes.")
-    for filename in inconsistent_files:
-        print(f"\n📄 Details for: {filename}")
-        file_attributes = all_files_attributes[filename]
-        
-        missing_vars = base_attributes - file_attributes
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+
+def load_scan_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get('files', {}) if data.get('version') == CACHE_VERSION else {}
+
+
+def save_scan_cache(cache_path, entries):
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'files': entries}, f)
+    os.replace(tmp_path, cache_path)
+
+
+class SchemaGroup:
+    """Files sharing one schema signature."""
+
+    def __init__(self, signature, schema):
+        self.signature = signature
+        self.schema = schema
+        self.files = []
+
+    @property
+    def variables(self):
+        return set(self.schema)
+
+    def to_dict(self):
+        return {'signature': self.signature, 'variables': sorted(self.schema), 'files': self.files}
+
+
+class SchemaScanResult:
+    """Structured result of a scan: schema groups (largest first), per-file errors, and timings."""
+
+    def __init__(self):
+        self.groups = {}
+        self.errors = []
+        self.files_scanned = 0
+        self.cache_hits = 0
+        self.elapsed = 0.0
+
+    def add(self, file_path, schema):
+        signature = schema_signature(schema)
+        group = self.groups.get(signature)
+        if group is None:
+            group = self.groups[signature] = SchemaGroup(signature, schema)
+        group.files.append(file_path)
+
+    def sorted_groups(self):
+        return sorted(self.groups.values(), key=lambda g: (-len(g.files), g.signature))
+
+    @property
+    def common_group(self):
+        groups = self.sorted_groups()
+        return groups[0] if groups else None
+
+    def differences(self, group):
+        """(missing variables, extra variables) of a group compared with the most common schema."""
+        base = self.common_group.variables
+        return sorted(base - group.variables), sorted(group.variables - base)
+
+    def to_dict(self):
+        return {
+            'files_scanned': self.files_scanned,
+            'cache_hits': self.cache_hits,
+            'elapsed_seconds': self.elapsed,
+            'groups': [g.to_dict() for g in self.sorted_groups()],
+            'errors': [{'file': path, 'error': error} for path, error in self.errors],
+        }
+
+
+def scan_schemas(root_folder=root_data_folder, workers=None, cache_path=DEFAULT_CACHE_PATH,
+                 executor='process', file_paths=None):
+    """
+    Scans every profile file under `root_folder` (or the given `file_paths`) and groups
+    them by schema signature. Files whose (size, mtime) match the cache are not opened.
+    `executor` is 'process' (default; the netCDF C library is not thread-safe) or 'thread'.
+    """
+    started = time.perf_counter()
+    result = SchemaScanResult()
+    file_paths = find_profile_files(root_folder) if file_paths is None else list(file_paths)
+    cached = load_scan_cache(cache_path)
+    new_cache = {}
+
+    to_scan = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        entry = cached.get(file_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            result.cache_hits += 1
+            new_cache[file_path] = entry
+        else:
+            to_scan.append((file_path, stat))
+
+    if to_scan:
+        paths = [path for path, _ in to_scan]
+        if workers == 1:
+            scanned = map(scan_file, paths)
+            pool = None
+        else:
+            pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+            pool = pool_class(max_workers=workers)
+            scanned = pool.map(scan_file, paths, chunksize=32)
+        try:
+            stats = dict(to_scan)
+            for file_path, schema, error in scanned:
+                if error:
+                    result.errors.append((file_path, error))
+                    continue
+                stat = stats[file_path]
+                new_cache[file_path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'schema': schema}
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    # Group in input order so the report is deterministic.
+    for file_path in file_paths:
+        if file_path in new_cache:
+            result.add(file_path, new_cache[file_path]['schema'])
+    result.files_scanned = len(file_paths)
+
+    if cache_path:
+        # Keep entries for files outside this scan so scanning a sub-folder doesn't evict the rest.
+        save_scan_cache(cache_path, {**cached, **new_cache})
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def print_report(result):
+    """Prints the inspector report for a SchemaScanResult."""
+    for file_path, error in result.errors:
+        print(f"⚠️ Could not read {os.path.basename(file_path)}. Skipping. Error: {error}")
+
+    common = result.common_group
+    if common is None:
+        print("Could not successfully read any files. Exiting.")
+        return
+
+    print(f"Successfully scanned {result.files_scanned - len(result.errors)} files "
+          f"({result.cache_hits} from cache) in {result.elapsed:.2f}s.\n")
+
+    print("="*50)
+    print(f"Common Attribute Set (signature {common.signature}, {len(common.files)} files):")
+    for var in sorted(common.variables):
+        print(f"  - {var}")
+    print("="*50)
+
+    others = result.sorted_groups()[1:]
+    if not others:
+        print("\n✅ SUCCESS: All scanned files have a consistent set of data variables.")
+        return
+
+    inconsistent = sum(len(g.files) for g in others)
+    print(f"\n⚠️ WARNING: Found {inconsistent} files with inconsistent attributes in {len(others)} schema groups.")
+    for group in others:
+        example = ', '.join(os.path.basename(p) for p in group.files[:3])
+        more = f" (+{len(group.files) - 3} more)" if len(group.files) > 3 else ""
+        print(f"\n📄 Schema {group.signature}: {len(group.files)} files, e.g. {example}{more}")
+        missing_vars, extra_vars = result.differences(group)
         if missing_vars:
             print("   └── 🔴 Missing Attributes:")
-            for var in sorted(list(missing_vars)):
+            for var in missing_vars:
                 print(f"       - {var}")
-
-        extra_vars = file_attributes - base_attributes
         if extra_vars:
             print("   └── 🟡 Extra Attributes:")
-            for var in sorted(list(extra_vars)):
+            for var in extra_vars:
                 print(f"       - {var}")
+        if not missing_vars and not extra_vars:
+            print("   └── 🟡 Same variables, different dimensions or types.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Group ARGO profile files by schema signature.")
+    parser.add_argument('--root', default=root_data_folder)
+    parser.add_argument('--workers', type=int, default=None, help="Pool size (default: one per CPU core; 1 = serial).")
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Schema cache file.")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and don't write the schema cache.")
+    parser.add_argument('--json', action='store_true', help="Print the structured result as JSON.")
+    args = parser.parse_args(argv)
+
+    if not args.json:
+        print(f"--- 🌊 Starting Smart ARGO Attribute Inspector for folder: '{args.root}' ---\n")
+
+    file_paths = find_profile_files(args.root)
+    if not file_paths:
+        print(f"⚠️ No profile (.nc) files found in '{args.root}'. Exiting.")
+        return
+
+    result = scan_schemas(args.root, workers=args.workers, cache_path=None if args.no_cache else args.cache,
+                          executor=args.executor, file_paths=file_paths)
+    if args.json:
+        print(json.dumps(result.to_dict(), indent=2))
+        return result
+
+    print(f"Found {len(file_paths)} profile files to scan...")
+    print_report(result)
+    print("\n--- Inspector Finished ---")
+    return result
 
-print("\n--- Inspector Finished ---")
 
+if __name__ == "__main__":
+    main()
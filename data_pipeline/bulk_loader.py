@@ -0,0 +1,128 @@
+# Bulk-load backend for the Data Squad's ETL.
+# Buffers columnar batches from many files and writes them in large transactions.
+# On PostgreSQL the rows are streamed with COPY FROM STDIN from an in-memory CSV buffer;
+# on any other engine (e.g. a SQLite stand-in used for testing) it falls back to a
+# single executemany INSERT per flush.
+
+import io
+import numpy as np
+import pandas as pd
+
+from data_pipeline.profile_extractor import PROFILE_COLUMNS, batch_length
+# The table's DDL lives in schema.py; re-exported for the ETL modules that import it from here.
+from data_pipeline.schema import TABLE_NAME, profiles_table, ensure_profiles_table
+
+# Rows buffered before a flush; each flush is one transaction.
+DEFAULT_BATCH_ROWS = 250_000
+
+
+class BulkLoadError(Exception):
+    """
+    A flush failed. `batches` lists (tag, rows) for every batch it held, so the caller can
+    report all of them as failed, not just the one whose add() triggered the flush.
+    """
+
+    def __init__(self, message, batches):
+        super().__init__(message)
+        self.batches = batches
+
+
+class BulkLoader:
+    """
+    Accumulates columnar batches and writes them to argo_profiles in bulk.
+    Use as a context manager so the final partial batch is flushed:
+
+        with BulkLoader(engine) as loader:
+            loader.add(columns, tag=path)
+
+    A failed flush raises BulkLoadError naming the tags of every batch that was lost.
+    """
+
+    def __init__(self, engine, table_name=TABLE_NAME, columns=PROFILE_COLUMNS, batch_rows=DEFAULT_BATCH_ROWS):
+        self.engine = engine
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.batch_rows = batch_rows
+        self.use_copy = engine.dialect.name == 'postgresql'
+        self.rows_written = 0
+        self.flushes = 0
+        self._pending = []
+        self._pending_tags = []
+        self._pending_rows = 0
+
+    def add(self, columns, tag=None):
+        """
+        Queues one batch; flushes when the buffer is full. Returns the rows queued.
+        `tag` (e.g. the source file) identifies the batch in a BulkLoadError.
+        """
+        n_rows = batch_length(columns)
+        if n_rows == 0:
+            return 0
+        self._pending.append(columns)
+        self._pending_tags.append((tag, n_rows))
+        self._pending_rows += n_rows
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+        return n_rows
+
+    def _pending_frame(self):
+        merged = {name: np.concatenate([batch[name] for batch in self._pending]) for name in self.columns}
+        return pd.DataFrame(merged, columns=self.columns)
+
+    def flush(self):
+        """Writes everything buffered so far in a single transaction."""
+        if not self._pending:
+            return 0
+        batches = self._pending_tags
+        try:
+            df = self._pending_frame()
+            if self.use_copy:
+                self._copy(df)
+            else:
+                self._insert(df)
+        except Exception as e:
+            raise BulkLoadError(f"{type(e).__name__}: {e}", batches) from e
+        finally:
+            # A failed flush is reported once by the caller, not re-raised on every later add().
+            self._pending = []
+            self._pending_tags = []
+            self._pending_rows = 0
+        written = len(df)
+        self.rows_written += written
+        self.flushes += 1
+        return written
+
+    def _copy(self, df):
+        # Empty unquoted fields are NULL in COPY's CSV format, which is what to_csv writes for NaN/None.
+        buffer = io.StringIO()
+        df.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        column_list = ", ".join(self.columns)
+        raw_connection = self.engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                cursor.copy_expert(f"COPY {self.table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            raw_connection.commit()
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+
+    def _insert(self, df):
+        # The typed table lets the dialect bind datetimes and numpy scalars correctly.
+        target = profiles_table(name=self.table_name)
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        with self.engine.begin() as connection:
+            connection.execute(target.insert(), records)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
@@ -1,12 +1,18 @@
 # check_and_download_from_index.py
-# Usage: python check_and_download_from_index.py
-import pandas as pd
+# Usage: python -m data_pipeline.check_and_download_from_index
+# The GDAC index is kept as a local, indexed Parquet copy (see index_cache.py) that is only
+# re-downloaded when it changed; set ARGO_INDEX_URL to a local file or HTTP stand-in to work offline.
+# Matches are fetched concurrently with resume/retry (see downloader.py):
+#   python -m data_pipeline.check_and_download_from_index [--limit N] [--workers 8] [--dest DIR] [--etl]
+#   --etl loads every file into the database as soon as it has been downloaded and verified.
 import os
-import requests
+import argparse
 from urllib.parse import urljoin
 
-INDEX_URL = "https://data-argo.ifremer.fr/ar_index_global_prof.txt"
-HTTP_ROOT = "https://data-argo.ifremer.fr/"
+from data_pipeline.index_cache import IndexCache, INDEX_URL
+from data_pipeline.downloader import Downloader, EtlHandoff, tasks_from_index, DEFAULT_WORKERS
+
+HTTP_ROOT = os.getenv("ARGO_HTTP_ROOT", "https://data-argo.ifremer.fr/")
 
 # YOUR BOX / DATES - tweak these if needed
 LON_MIN, LON_MAX = 68.0, 76.0
@@ -16,28 +22,21 @@ END   = "2023-03-05"   # inclusive
 
 # how many netcdf files to download as a test
 N_DOWNLOAD = 3
+DOWNLOAD_DIR = 'profiles_test'
 
 def load_index():
-    print("Downloading index (this may take a few seconds)...")
-    df = pd.read_csv(INDEX_URL, comment='#', header=0)
-    # index has columns: file,date,latitude,longitude,ocean,profiler_type,institution,date_update (common)
-    # convert date if it's numeric like YYYYMMDDHHMISS or text
-    try:
-        df['date'] = pd.to_datetime(df['date'], format='%Y%m%d%H%M%S')
-    except Exception:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    return df
+    cache = IndexCache(source=INDEX_URL)
+    print("Refreshing local index copy (only downloads when the GDAC index changed)...")
+    status = cache.refresh()
+    print(f"Index {status}: {len(cache)} profiles")
+    return cache
 
-def filter_index(df):
-    mask = (
-        df['longitude'].between(LON_MIN, LON_MAX) &
-        df['latitude'].between(LAT_MIN, LAT_MAX) &
-        df['date'].between(START, END)
-    )
-    sel = df[mask].copy()
+def filter_index(cache):
+    # Grid + date sort key: a few binary searches instead of a scan over every profile.
+    sel = cache.query(LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, START, END)
     return sel
 
-def show_and_download(sel):
+def show_and_download(sel, limit=N_DOWNLOAD, workers=DEFAULT_WORKERS, dest_dir=DOWNLOAD_DIR, etl=False):
     print(f"Matches found: {len(sel)}")
     if len(sel) == 0:
         print("No profiles in index for that range. Try expanding the box or date range.")
@@ -51,31 +50,31 @@ def show_and_download(sel):
     print("\nFirst 10 download URLs:")
     for u in sel['url'].head(10).tolist():
         print(u)
-    # create profiles dir and download first N
-    os.makedirs('profiles_test', exist_ok=True)
-    to_download = sel['url'].head(N_DOWNLOAD).tolist()
-    for url in to_download:
-        fn = os.path.join('profiles_test', os.path.basename(url))
-        if os.path.exists(fn):
-            print("Already exists:", fn)
-            continue
-        print("Downloading:", url)
-        try:
-            r = requests.get(url, stream=True, timeout=60)
-            r.raise_for_status()
-            with open(fn, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print("Saved:", fn)
-        except Exception as e:
-            print("Download failed:", e)
-            print("You can try the FTP root or check network/SSL.")
-            break
 
-def main():
-    df = load_index()
-    sel = filter_index(df)
-    show_and_download(sel)
+    # download the first N (0 = all) concurrently; a failed file no longer stops the batch
+    to_download = sel if not limit else sel.head(limit)
+    tasks = tasks_from_index(to_download, HTTP_ROOT, dest_dir)
+    handoff = EtlHandoff() if etl else None
+    stats = Downloader(workers=workers, on_complete=handoff).run(tasks)
+    if handoff is not None:
+        handoff.close()
+        print(f"✅ ETL hand-off: {handoff.rows_loaded} rows from {handoff.files_loaded} files loaded.")
+    print(f"📈 Download: {stats.summary()}")
+    if stats.failed:
+        print("Some downloads failed; re-run to resume them, or try the FTP root / check network/SSL.")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find profiles in the GDAC index and download them.")
+    parser.add_argument('--limit', type=int, default=N_DOWNLOAD, help="Files to download (0 = every match).")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent downloads.")
+    parser.add_argument('--dest', default=DOWNLOAD_DIR, help="Download folder (<wmo>/profiles/ layout).")
+    parser.add_argument('--etl', action='store_true', help="Load each file into the database once downloaded.")
+    args = parser.parse_args(argv)
+
+    cache = load_index()
+    sel = filter_index(cache)
+    show_and_download(sel, limit=args.limit, workers=args.workers, dest_dir=args.dest, etl=args.etl)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,490 @@
+# Gridded climatology of temperature and salinity (Data Squad).
+# Every measurement in argo_profiles is binned, with vectorized numpy, into a
+# month x depth x latitude x longitude grid:
+#
+#   month      12 calendar months (or 6 / 4 / 3 / 2 / 1 seasons: --months)
+#   depth      the standard levels of profile_rollups.DEPTH_BIN_EDGES (dbar), or --depth-edges
+#   lat / lon  --degrees cells (default 2), rows from 90S, columns from 180W
+#
+# Each variable keeps three arrays per cell -- sum, sum of squares (float64) and count (int32) --
+# so mean and standard deviation of any block of cells (a region, several depth levels, the whole
+# year) are exact combinations, and a load can be added to (or taken out of) the grid by adding
+# its own sums. The arrays are plain .npy files in CLIMATOLOGY_DIR (default climatology_grids),
+# next to meta.json (the grid spec and the data generation the grids reflect); readers open them
+# memory-mapped, so a slice only touches the pages it needs. With the default depth levels a 2-degree
+# grid takes about 220 MB for both variables; a 1-degree grid four times that.
+#
+# The ETL keeps the grids current: publish_staged_load bins the rows a load removes and the rows
+# it stages inside its transaction, and applies the difference to the arrays once it committed
+# (a full reload rebuilds them). The grids are only maintained once they exist (--rebuild); if a
+# publish ever runs without updating them, meta.json is marked stale and readers stop using them
+# until the next --rebuild.
+#
+# Usage: python -m data_pipeline.climatology --rebuild [--degrees 2] [--months 12] [--depth-edges 0,10,...]
+#        python -m data_pipeline.climatology --status
+
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from data_pipeline.bulk_loader import TABLE_NAME
+from data_pipeline.profile_rollups import DEPTH_BIN_EDGES
+from data_pipeline.result_cache import read_generation
+
+DEFAULT_GRID_DIR = os.getenv("CLIMATOLOGY_DIR", "climatology_grids")
+CLIMATOLOGY_VARIABLES = ('temperature', 'salinity')
+CLIMATOLOGY_STATS = ('mean', 'std', 'count')
+DEFAULT_DEGREES = 2.0
+DEFAULT_MONTHS = 12
+
+# Bump whenever the array layout changes; readers refuse other versions.
+GRID_VERSION = 1
+META_FILE = 'meta.json'
+ARRAYS = (('sum', np.float64), ('sumsq', np.float64), ('count', np.int32))
+READ_CHUNK_ROWS = 500_000
+# (float, cycle) profiles looked up per statement when collecting the rows a load replaces.
+REMOVED_CHUNK = 200
+SOURCE_COLUMNS = "profile_date, latitude, longitude, pressure, temperature, salinity"
+
+
+class GridSpec:
+    """Shape of the grids and the mapping from a measurement to its cell."""
+
+    def __init__(self, degrees=DEFAULT_DEGREES, depth_edges=DEPTH_BIN_EDGES, months=DEFAULT_MONTHS):
+        if degrees <= 0 or abs(180 / degrees - round(180 / degrees)) > 1e-9:
+            raise ValueError(f"degrees must divide 180 (got {degrees})")
+        if months not in (1, 2, 3, 4, 6, 12):
+            raise ValueError(f"months must divide 12 (got {months})")
+        if list(depth_edges) != sorted(set(depth_edges)):
+            raise ValueError("depth edges must be strictly increasing")
+        self.degrees = float(degrees)
+        self.depth_edges = tuple(float(edge) for edge in depth_edges)
+        self.months = int(months)
+        self.n_lat = int(round(180 / degrees))
+        self.n_lon = 2 * self.n_lat
+        # The last depth bin is everything deeper than the last edge, as in profile_rollups.
+        self.n_depth = len(self.depth_edges)
+        self.shape = (self.months, self.n_depth, self.n_lat, self.n_lon)
+
+    def to_dict(self):
+        return {'degrees': self.degrees, 'depth_edges': list(self.depth_edges), 'months': self.months}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values['degrees'], values['depth_edges'], values['months'])
+
+    def __eq__(self, other):
+        return isinstance(other, GridSpec) and self.to_dict() == other.to_dict()
+
+    def month_index(self, month):
+        return (int(month) - 1) * self.months // 12
+
+    def cell_indices(self, frame):
+        """Flat cell index of every row of `frame` (SOURCE_COLUMNS), and the mask of rows that have one."""
+        months = pd.to_datetime(frame['profile_date'], errors='coerce').dt.month.to_numpy(dtype=np.float64,
+                                                                                           na_value=np.nan)
+        lat = frame['latitude'].to_numpy(dtype=np.float64, na_value=np.nan)
+        lon = frame['longitude'].to_numpy(dtype=np.float64, na_value=np.nan)
+        pressure = frame['pressure'].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~(np.isnan(months) | np.isnan(lat) | np.isnan(lon) | np.isnan(pressure))
+
+        month = ((np.nan_to_num(months, nan=1) - 1) * self.months // 12).astype(np.int64)
+        depth = np.clip(np.searchsorted(self.depth_edges, np.nan_to_num(pressure), side='right') - 1,
+                        0, self.n_depth - 1)
+        row = np.clip(np.floor((np.nan_to_num(lat) + 90) / self.degrees), 0, self.n_lat - 1).astype(np.int64)
+        col = np.floor((np.nan_to_num(lon) + 180) / self.degrees).astype(np.int64) % self.n_lon
+        return ((month * self.n_depth + depth) * self.n_lat + row) * self.n_lon + col, valid
+
+    def depth_bins(self, depth_min=None, depth_max=None):
+        """(first bin, last bin, covered min, covered max) of the bins overlapping [depth_min, depth_max)."""
+        edges = self.depth_edges
+        first = 0 if depth_min is None else max(int(np.searchsorted(edges, depth_min, side='right')) - 1, 0)
+        last = self.n_depth - 1 if depth_max is None else \
+            max(int(np.searchsorted(edges, depth_max, side='left')) - 1, first)
+        return first, last, edges[first], edges[last + 1] if last + 1 < len(edges) else None
+
+    def rows_for(self, lat_min, lat_max, centres=True):
+        """(first, last) latitude rows: cells whose centre is in the range (`centres`) or that overlap it."""
+        d = self.degrees
+        if centres:
+            first, last = int(np.ceil((lat_min + 90) / d - 0.5)), int(np.floor((lat_max + 90) / d - 0.5))
+            if first <= last:
+                return max(first, 0), min(last, self.n_lat - 1)
+        first = int(np.floor((lat_min + 90) / d))
+        last = int(np.ceil((lat_max + 90) / d)) - 1
+        return max(min(first, self.n_lat - 1), 0), min(max(last, first, 0), self.n_lat - 1)
+
+    def column_spans(self, lon_min, lon_max, centres=True):
+        """Inclusive column spans (two across the antimeridian, lon_min > lon_max), chosen as rows_for does."""
+        d, n = self.degrees, self.n_lon
+        if lon_min <= lon_max and lon_max - lon_min >= 360 - 1e-9:
+            return [(0, n - 1)]
+        if centres:
+            first, last = int(np.ceil((lon_min + 180) / d - 0.5)), int(np.floor((lon_max + 180) / d - 0.5))
+        else:
+            first, last = int(np.floor((lon_min + 180) / d)), int(np.ceil((lon_max + 180) / d)) - 1
+        first, last = first % n, last % n
+        crossing = lon_min > lon_max
+        if not crossing and first > last:
+            if centres:
+                return self.column_spans(lon_min, lon_max, centres=False)
+            last = first
+        if crossing:
+            return [(first, n - 1), (0, last)] if first > last else [(0, n - 1)]
+        return [(first, last)]
+
+    def covered_bbox(self, rows, spans):
+        d = self.degrees
+        return (-90 + rows[0] * d, -90 + (rows[1] + 1) * d,
+                -180 + spans[0][0] * d, -180 + (spans[-1][1] + 1) * d)
+
+
+def bin_rows(spec, frame, variables=CLIMATOLOGY_VARIABLES):
+    """
+    {variable: (cells, sum, sumsq, count)} of the rows of `frame`: one entry per touched cell,
+    cells ascending.
+    """
+    cells, valid = spec.cell_indices(frame)
+    binned = {}
+    for variable in variables:
+        values = frame[variable].to_numpy(dtype=np.float64, na_value=np.nan)
+        ok = valid & ~np.isnan(values)
+        touched, inverse = np.unique(cells[ok], return_inverse=True)
+        values = values[ok]
+        binned[variable] = (touched,
+                            np.bincount(inverse, weights=values, minlength=len(touched)),
+                            np.bincount(inverse, weights=values * values, minlength=len(touched)),
+                            np.bincount(inverse, minlength=len(touched)).astype(np.int64))
+    return binned
+
+
+class GridDelta:
+    """Binned sums of rows added to (sign +1) or removed from (sign -1) the archive, cell by cell."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.parts = {variable: [] for variable in CLIMATOLOGY_VARIABLES}
+        self.rows = 0
+
+    def add(self, frame, sign=1):
+        if frame.empty:
+            return
+        for variable, (cells, sums, sumsq, counts) in bin_rows(self.spec, frame).items():
+            self.parts[variable].append((cells, sign * sums, sign * sumsq, sign * counts))
+        self.rows += sign * len(frame)
+
+    def reduced(self):
+        """{variable: (cells, sum, sumsq, count)} with every cell once."""
+        out = {}
+        for variable, parts in self.parts.items():
+            if not parts:
+                continue
+            cells = np.concatenate([p[0] for p in parts])
+            touched, inverse = np.unique(cells, return_inverse=True)
+            out[variable] = (touched,) + tuple(
+                np.bincount(inverse, weights=np.concatenate([p[i] for p in parts]), minlength=len(touched))
+                for i in (1, 2, 3))
+        return out
+
+
+def read_meta(path=DEFAULT_GRID_DIR):
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, META_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+def _array_path(path, variable, name):
+    return os.path.join(path, f"{variable}_{name}.npy")
+
+
+def build_climatology(engine, path=DEFAULT_GRID_DIR, spec=None, chunk_rows=READ_CHUNK_ROWS):
+    """
+    Bins all of argo_profiles into fresh grids (streamed in chunks, accumulated into memory-mapped
+    arrays) and swaps them into `path`. Returns the meta written.
+    """
+    spec = spec or GridSpec()
+    building = path.rstrip(os.sep) + '.building'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+    arrays = {variable: {name: np.lib.format.open_memmap(_array_path(building, variable, name), mode='w+',
+                                                         dtype=dtype, shape=spec.shape)
+                         for name, dtype in ARRAYS}
+              for variable in CLIMATOLOGY_VARIABLES}
+
+    rows = 0
+    with engine.connect() as connection:
+        generation = read_generation(connection)
+        streaming = connection.execution_options(stream_results=True)
+        for frame in pd.read_sql(text(f"SELECT {SOURCE_COLUMNS} FROM {TABLE_NAME}"), streaming,
+                                 chunksize=chunk_rows):
+            for variable, (cells, sums, sumsq, counts) in bin_rows(spec, frame).items():
+                grid = arrays[variable]
+                grid['sum'].reshape(-1)[cells] += sums
+                grid['sumsq'].reshape(-1)[cells] += sumsq
+                grid['count'].reshape(-1)[cells] += counts.astype(np.int32)
+            rows += len(frame)
+    # A publish that committed during the scan may or may not be in the grids.
+    generation_after = read_generation(engine)
+    for grid in arrays.values():
+        for array in grid.values():
+            array.flush()
+    del arrays
+
+    meta = {'version': GRID_VERSION, **spec.to_dict(), 'variables': list(CLIMATOLOGY_VARIABLES),
+            'generation': generation, 'rows': rows, 'built_at': datetime.now().isoformat(),
+            'updated_at': datetime.now().isoformat(), 'stale': generation_after != generation}
+    _write_meta(building, meta)
+    old = path.rstrip(os.sep) + '.old'
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(building, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def apply_delta(delta, generation_before, generation_after, path=DEFAULT_GRID_DIR):
+    """
+    Adds a publish's GridDelta to the grids in place. Only applied on top of the generation the
+    publish started from; otherwise the grids missed a publish and are marked stale. Returns
+    whether the delta was applied.
+    """
+    meta = read_meta(path)
+    if meta is None:
+        return False
+    if meta.get('stale') or meta.get('generation') != generation_before:
+        meta['stale'] = True
+        _write_meta(path, meta)
+        return False
+    for variable, (cells, sums, sumsq, counts) in delta.reduced().items():
+        for name, values in (('sum', sums), ('sumsq', sumsq), ('count', counts)):
+            array = np.load(_array_path(path, variable, name), mmap_mode='r+')
+            flat = array.reshape(-1)
+            flat[cells] += values.astype(array.dtype)
+            array.flush()
+            del array, flat
+    meta.update(generation=generation_after, rows=meta.get('rows', 0) + delta.rows,
+                updated_at=datetime.now().isoformat())
+    _write_meta(path, meta)
+    return True
+
+
+class ClimatologyUpdate:
+    """
+    publish_staged_load's side of the grids: removed() and staged() inside the publish transaction
+    bin the rows it deletes and inserts; commit() applies them once it committed. Does nothing
+    when no grids were built.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_GRID_DIR
+        meta = read_meta(self.path)
+        self.enabled = meta is not None and not meta.get('stale') and meta.get('version') == GRID_VERSION
+        self.delta = GridDelta(GridSpec.from_dict(meta)) if self.enabled else None
+        self.generation_before = None
+
+    def removed(self, connection, groups):
+        """Bins the current rows of `groups` ((float_id, cycle or None) pairs) before they are deleted."""
+        if not self.enabled:
+            return
+        self.generation_before = read_generation(connection)
+        groups = list(groups)
+        for start in range(0, len(groups), REMOVED_CHUNK):
+            clauses, params = [], {}
+            for i, (float_id, cycle) in enumerate(groups[start:start + REMOVED_CHUNK]):
+                if cycle is None:
+                    clauses.append(f"float_id = :f{i}")
+                else:
+                    clauses.append(f"(float_id = :f{i} AND cycle_number = :c{i})")
+                    params[f"c{i}"] = cycle
+                params[f"f{i}"] = float_id
+            frame = pd.read_sql(text(f"SELECT {SOURCE_COLUMNS} FROM {TABLE_NAME} WHERE {' OR '.join(clauses)}"),
+                                connection, params=params)
+            self.delta.add(frame, sign=-1)
+
+    def staged(self, connection, table):
+        """Bins the rows of `table` (the staging table) about to be published."""
+        if not self.enabled:
+            return
+        for frame in pd.read_sql(text(f"SELECT {SOURCE_COLUMNS} FROM {table}"), connection,
+                                 chunksize=READ_CHUNK_ROWS):
+            self.delta.add(frame)
+
+    def commit(self, generation_after):
+        if self.enabled and apply_delta(self.delta, self.generation_before, generation_after, self.path):
+            return True
+        if self.enabled:
+            print(f"🟡 Climatology grids in {self.path} missed a publish and are marked stale; "
+                  f"run python -m data_pipeline.climatology --rebuild")
+        return False
+
+
+# --- Reading ---
+
+class ClimatologyGrids:
+    """Memory-mapped grids of one build, with the pooled statistics of any block of cells."""
+
+    def __init__(self, path=DEFAULT_GRID_DIR):
+        meta = read_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"No climatology grids in {path}")
+        if meta.get('version') != GRID_VERSION:
+            raise ValueError(f"Climatology grids in {path} have version {meta.get('version')}, expected "
+                             f"{GRID_VERSION}; rebuild them")
+        self.path = path
+        self.meta = meta
+        self.spec = GridSpec.from_dict(meta)
+        self.arrays = {variable: {name: np.load(_array_path(path, variable, name), mmap_mode='r')
+                                  for name, _ in ARRAYS}
+                       for variable in meta['variables']}
+
+    @property
+    def generation(self):
+        return self.meta.get('generation')
+
+    @property
+    def stale(self):
+        return bool(self.meta.get('stale'))
+
+    def describe(self):
+        return {**self.meta, 'shape': list(self.spec.shape), 'depth_bins': self.spec.n_depth}
+
+    def _block(self, variable, month, depth, rows, spans):
+        """Sum, sumsq and count over months and depth bins: (rows x columns) arrays."""
+        spec = self.spec
+        months = slice(None) if month is None else slice(spec.month_index(month), spec.month_index(month) + 1)
+        first, last = depth[0], depth[1]
+        pooled = []
+        for name, _ in ARRAYS:
+            array = self.arrays[variable][name]
+            parts = [array[months, first:last + 1, rows[0]:rows[1] + 1, lo:hi + 1].sum(axis=(0, 1), dtype=np.float64)
+                     for lo, hi in spans]
+            pooled.append(np.concatenate(parts, axis=1))
+        return pooled
+
+    def region(self, variable, bbox=None, month=None, depth_min=None, depth_max=None):
+        """
+        Mean, standard deviation and count of `variable` over the cells whose centre lies in `bbox`
+        (lat_min, lat_max, lon_min, lon_max), the depth bins overlapping [depth_min, depth_max) and
+        `month` (None: the whole year). The covered box and depths are returned alongside.
+        """
+        spec = self.spec
+        lat_min, lat_max, lon_min, lon_max = bbox if bbox is not None else (-90, 90, -180, 180)
+        rows, spans = spec.rows_for(lat_min, lat_max), spec.column_spans(lon_min, lon_max)
+        first, last, covered_min, covered_max = spec.depth_bins(depth_min, depth_max)
+        sums, sumsq, counts = (block.sum() for block in self._block(variable, month, (first, last), rows, spans))
+        mean, std = _mean_std(sums, sumsq, counts)
+        return {
+            'variable': variable, 'month': month, 'mean': mean, 'std': std, 'count': int(counts),
+            'bbox': spec.covered_bbox(rows, spans), 'depth_range': [covered_min, covered_max],
+            'cells': (rows[1] - rows[0] + 1) * sum(hi - lo + 1 for lo, hi in spans),
+        }
+
+    def grid(self, variable, stat='mean', bbox=None, month=None, depth_min=None, depth_max=None):
+        """
+        2-D field (rows from south, columns from the west edge) of `stat` over the cells that overlap
+        `bbox`, pooled over `month` and the depth bins of [depth_min, depth_max). Empty cells are NaN.
+        """
+        spec = self.spec
+        lat_min, lat_max, lon_min, lon_max = bbox if bbox is not None else (-90, 90, -180, 180)
+        rows = spec.rows_for(lat_min, lat_max, centres=False)
+        spans = spec.column_spans(lon_min, lon_max, centres=False)
+        first, last, covered_min, covered_max = spec.depth_bins(depth_min, depth_max)
+        sums, sumsq, counts = self._block(variable, month, (first, last), rows, spans)
+        if stat == 'count':
+            values = counts.astype(np.float32)
+        else:
+            mean, std = _mean_std(sums, sumsq, counts)
+            values = (mean if stat == 'mean' else std).astype(np.float32)
+        return values, {
+            'variable': variable, 'stat': stat, 'month': month, 'depth_range': [covered_min, covered_max],
+            'bbox': spec.covered_bbox(rows, spans), 'degrees': spec.degrees, 'shape': list(values.shape),
+        }
+
+
+def _mean_std(sums, sumsq, counts):
+    """Mean and (population) standard deviation from sums; NaN where a cell has no data."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        counts = np.asarray(counts, dtype=np.float64)
+        mean = np.where(counts > 0, sums / counts, np.nan)
+        variance = np.where(counts > 0, sumsq / counts - mean * mean, np.nan)
+        std = np.sqrt(np.maximum(variance, 0))
+    if np.ndim(mean) == 0:
+        return (float(mean) if counts > 0 else None), (float(std) if counts > 0 else None)
+    return mean, std
+
+
+class ClimatologyReader:
+    """The current grids in `path`, reopened whenever a rebuild or update rewrote meta.json."""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_GRID_DIR
+        self._grids = None
+        self._stamp = None
+
+    def current(self):
+        """ClimatologyGrids, or None when no usable grids exist."""
+        try:
+            stat = os.stat(os.path.join(self.path, META_FILE))
+        except OSError:
+            self._grids = self._stamp = None
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp != self._stamp:
+            try:
+                self._grids = ClimatologyGrids(self.path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Climatology grids not usable: {e}")
+                self._grids = None
+            self._stamp = stamp
+        return self._grids
+
+
+def main(argv=None):
+    from data_pipeline.build_database import create_db_engine
+
+    parser = argparse.ArgumentParser(description="Build and inspect the gridded climatology.")
+    parser.add_argument('--rebuild', action='store_true', help="Bin all of argo_profiles into fresh grids.")
+    parser.add_argument('--status', action='store_true', help="Print the grid spec and the generation they reflect.")
+    parser.add_argument('--path', default=DEFAULT_GRID_DIR)
+    parser.add_argument('--degrees', type=float, default=DEFAULT_DEGREES)
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS)
+    parser.add_argument('--depth-edges', help="Comma-separated depth edges in dbar (default: the rollup levels).")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        edges = [float(e) for e in args.depth_edges.split(",")] if args.depth_edges else DEPTH_BIN_EDGES
+        spec = GridSpec(args.degrees, edges, args.months)
+        engine = create_db_engine()
+        meta = build_climatology(engine, args.path, spec)
+        size_mb = sum(os.path.getsize(os.path.join(args.path, f)) for f in os.listdir(args.path)) / 1e6
+        print(f"✅ Climatology grids {spec.shape} in {args.path}: {meta['rows']} rows binned, {size_mb:.0f} MB")
+        if meta['stale']:
+            print("🟡 A load was published during the build; run --rebuild again for exact grids.")
+    elif args.status:
+        meta = read_meta(args.path)
+        if meta is None:
+            print(f"🟡 No climatology grids in {args.path}; build them with --rebuild.")
+            return
+        print(f"📋 {meta}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
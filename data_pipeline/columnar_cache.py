@@ -0,0 +1,285 @@
+# Decode-once columnar store for the Data Squad.
+# NetCDF files are decoded a single time into partitioned Parquet files that the ETL,
+# the quality checker and the backend's analytics endpoints can all read instead of
+# going back to xarray. Layout (hive-style, so partition keys double as filters):
+#
+#   profile_cache/
+#     _schema.json                                   <- schema version + column list
+#     float_id=1902672/month=2023-10/part-0.parquet
+#     float_id=1902672/month=2023-11/part-0.parquet
+#
+# Reads support predicate pushdown (float_id/month partitions are pruned, row groups are
+# skipped using Parquet min/max statistics on profile_date/latitude/longitude) and column
+# pushdown (only the requested columns are read from disk).
+# Usage: python -m data_pipeline.columnar_cache build [--root 'nc files'] [--workers N]
+
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pads = pq = None
+
+from data_pipeline.profile_extractor import SkipFile
+from data_pipeline.float_source import find_float_directories, extract_float_columns
+from data_pipeline.parallel_etl import run_ingest
+
+DEFAULT_CACHE_DIR = os.getenv("PROFILE_CACHE_DIR", "profile_cache")
+
+# Bump whenever the stored columns or their types change; readers refuse other versions.
+SCHEMA_VERSION = 1
+SCHEMA_FILE = '_schema.json'
+SCHEMA_VERSION_KEY = b'floatchat_schema_version'
+
+# Stored (non-partition) columns, in file order.
+CACHE_COLUMNS = [
+    'cycle_number', 'profile_date', 'latitude', 'longitude',
+    'pressure', 'temperature', 'salinity',
+    'pressure_qc', 'temperature_qc', 'salinity_qc',
+]
+PARTITION_COLUMNS = ['float_id', 'month']
+
+ROW_GROUP_SIZE = 64_000
+
+
+class CacheSchemaMismatch(Exception):
+    """The cache on disk was written with a different SCHEMA_VERSION and must be rebuilt."""
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar profile cache (pip install pyarrow).")
+
+
+def cache_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ('cycle_number', pa.int32()),
+        ('profile_date', pa.timestamp('s')),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('pressure', pa.float32()),
+        ('temperature', pa.float32()),
+        ('salinity', pa.float32()),
+        ('pressure_qc', pa.int8()),
+        ('temperature_qc', pa.int8()),
+        ('salinity_qc', pa.int8()),
+    ], metadata={SCHEMA_VERSION_KEY: str(SCHEMA_VERSION).encode()})
+
+
+def partition_schema():
+    _require_pyarrow()
+    return pa.schema([('float_id', pa.int64()), ('month', pa.string())])
+
+
+def month_keys(profile_dates):
+    """'YYYY-MM' partition key per row ('unknown' for rows without a date)."""
+    months = np.datetime_as_string(profile_dates.astype('datetime64[M]'), unit='M').astype(object)
+    months[np.isnat(profile_dates)] = 'unknown'
+    return months
+
+
+def extract_float_for_cache(float_dir):
+    """Worker entry point for cache builds: a whole float, QC flags included."""
+    return extract_float_columns(float_dir, include_qc=True)
+
+
+class ProfileCache:
+    """Reader/writer for the partitioned Parquet profile store."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        _require_pyarrow()
+        self.root = root
+
+    # --- Schema versioning ---
+
+    def _schema_path(self):
+        return os.path.join(self.root, SCHEMA_FILE)
+
+    def _ensure_schema_file(self):
+        os.makedirs(self.root, exist_ok=True)
+        stored = self.stored_version()
+        if stored is None:
+            with open(self._schema_path(), 'w') as f:
+                json.dump({'schema_version': SCHEMA_VERSION, 'columns': PARTITION_COLUMNS + CACHE_COLUMNS}, f)
+        elif stored != SCHEMA_VERSION:
+            raise CacheSchemaMismatch(
+                f"Cache at '{self.root}' has schema v{stored}, expected v{SCHEMA_VERSION}. Rebuild it.")
+
+    def stored_version(self):
+        if not os.path.exists(self._schema_path()):
+            return None
+        with open(self._schema_path()) as f:
+            return json.load(f).get('schema_version')
+
+    def exists(self):
+        return self.stored_version() is not None
+
+    # --- Writing ---
+
+    def _float_dir(self, float_id):
+        return os.path.join(self.root, f"float_id={int(float_id)}")
+
+    def write_float(self, float_id, columns):
+        """
+        Replaces every partition of one float with the rows in `columns` (a columnar batch
+        with QC flags). The new partitions are written to a hidden directory and swapped in,
+        so readers never see a half-written float.
+        """
+        self._ensure_schema_file()
+        schema = cache_schema()
+        order = np.lexsort((columns['pressure'], columns['profile_date']))
+        months = month_keys(columns['profile_date'])[order]
+
+        final_dir = self._float_dir(float_id)
+        tmp_dir = os.path.join(self.root, f".float_id={int(float_id)}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        for month in np.unique(months):
+            rows = order[months == month]
+            table = pa.table({name: columns[name][rows] for name in CACHE_COLUMNS}, schema=schema)
+            month_dir = os.path.join(tmp_dir, f"month={month}")
+            os.makedirs(month_dir, exist_ok=True)
+            pq.write_table(table, os.path.join(month_dir, 'part-0.parquet'), row_group_size=ROW_GROUP_SIZE)
+
+        old_dir = os.path.join(self.root, f".float_id={int(float_id)}.old")
+        if os.path.exists(final_dir):
+            os.replace(final_dir, old_dir)
+        if os.path.exists(tmp_dir):
+            os.replace(tmp_dir, final_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return len(order)
+
+    # --- Reading ---
+
+    def float_ids(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(int(name.split('=', 1)[1]) for name in os.listdir(self.root) if name.startswith('float_id='))
+
+    def float_files(self, float_id):
+        """Parquet files of one float, sorted (used as manifest sources when loading from the cache)."""
+        paths = []
+        for root, dirs, files in os.walk(self._float_dir(float_id)):
+            paths.extend(os.path.join(root, f) for f in files if f.endswith('.parquet'))
+        return sorted(paths)
+
+    def dataset(self):
+        if self.stored_version() != SCHEMA_VERSION:
+            raise CacheSchemaMismatch(
+                f"Cache at '{self.root}' has schema v{self.stored_version()}, expected v{SCHEMA_VERSION}.")
+        return pads.dataset(
+            self.root, format='parquet',
+            partitioning=pads.partitioning(partition_schema(), flavor='hive'),
+        )
+
+    @staticmethod
+    def build_filter(bbox=None, start_date=None, end_date=None, float_ids=None):
+        """
+        Arrow filter expression. Partition keys (float_id, month) prune whole directories;
+        the rest is checked against row-group statistics before any data is decoded.
+        bbox is (lat_min, lat_max, lon_min, lon_max); any element may be None.
+        """
+        expr = None
+
+        def add(term):
+            nonlocal expr
+            expr = term if expr is None else expr & term
+
+        field = pads.field
+        if float_ids:
+            add(field('float_id').isin([int(f) for f in float_ids]))
+        if start_date is not None:
+            start = np.datetime64(start_date, 's')
+            add(field('month') >= str(start.astype('datetime64[M]')))
+            add(field('profile_date') >= pa.scalar(start, type=pa.timestamp('s')))
+        if end_date is not None:
+            end = np.datetime64(end_date, 's')
+            add(field('month') <= str(end.astype('datetime64[M]')))
+            add(field('profile_date') <= pa.scalar(end, type=pa.timestamp('s')))
+        if bbox is not None:
+            lat_min, lat_max, lon_min, lon_max = bbox
+            if lat_min is not None:
+                add(field('latitude') >= lat_min)
+            if lat_max is not None:
+                add(field('latitude') <= lat_max)
+            if lon_min is not None:
+                add(field('longitude') >= lon_min)
+            if lon_max is not None:
+                add(field('longitude') <= lon_max)
+        return expr
+
+    def read_table(self, columns=None, bbox=None, start_date=None, end_date=None, float_ids=None):
+        """Arrow table of the matching rows, reading only `columns` (default: everything)."""
+        if not self.exists():
+            return pa.table({})
+        expr = self.build_filter(bbox, start_date, end_date, float_ids)
+        return self.dataset().to_table(columns=columns, filter=expr)
+
+    def read(self, columns=None, bbox=None, start_date=None, end_date=None, float_ids=None):
+        """Same as read_table, as a pandas DataFrame."""
+        return self.read_table(columns, bbox, start_date, end_date, float_ids).to_pandas()
+
+    def read_float_columns(self, float_id):
+        """One float's rows as a columnar batch (argo_profiles layout), for loading into the database."""
+        table = self.read_table(columns=PARTITION_COLUMNS[:1] + CACHE_COLUMNS, float_ids=[float_id])
+        if table.num_rows == 0:
+            raise SkipFile("float has no rows in the cache")
+        columns = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+        columns['platform_number'] = np.full(table.num_rows, str(int(float_id)), dtype=object)
+        return columns
+
+
+def read_cached_float(float_dir):
+    """
+    Worker entry point for `build_database.py --source cache`: `float_dir` is a
+    float_id=<wmo> directory of the cache. Returns (columns, {parquet file: rows}).
+    """
+    cache = ProfileCache(os.path.dirname(float_dir.rstrip(os.sep)))
+    float_id = int(os.path.basename(float_dir.rstrip(os.sep)).split('=', 1)[1])
+    columns = cache.read_float_columns(float_id)
+    source_rows = {path: pq.ParquetFile(path).metadata.num_rows for path in cache.float_files(float_id)}
+    return columns, source_rows
+
+
+def cache_groups(cache):
+    """Load-plan groups for --source cache: {(float_id, None): parquet files}, plus their directories."""
+    groups, directories = {}, {}
+    for float_id in cache.float_ids():
+        groups[(float_id, None)] = cache.float_files(float_id)
+        directories[(float_id, None)] = cache._float_dir(float_id)
+    return groups, directories
+
+
+def build_cache(root_folder, cache_root=DEFAULT_CACHE_DIR, workers=1):
+    """Decodes every float under `root_folder` once and writes it to the cache."""
+    cache = ProfileCache(cache_root)
+    float_dirs = find_float_directories(root_folder)
+    dir_to_float = {float_dir: float_id for float_id, float_dir in float_dirs.items()}
+
+    def store(float_dir, decoded):
+        return cache.write_float(dir_to_float[float_dir], decoded[0])
+
+    return run_ingest(list(dir_to_float), store, workers=workers, extractor=extract_float_for_cache)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the partitioned Parquet profile cache.")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--root', default='nc files', help="Folder to scan for float directories.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"--- 🗄️ Building profile cache '{args.cache_dir}' from '{args.root}' ---")
+    stats = build_cache(args.root, args.cache_dir, args.workers)
+    print(f"📈 Throughput: {stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
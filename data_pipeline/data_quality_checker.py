@@ -1,91 +1,151 @@
 # This is a powerful utility for the Data Squad. It acts as a "Data Quality Checker".
-# It scans all .nc files, performs the standard transformation, and then checks
-# if the resulting data is valid (i.e., not empty or full of null values).
+# It scans all .nc files, computes per-profile quality metrics with the vectorized engine in
+# quality_metrics.py (only PRES/TEMP/PSAL and their QC flags are read), and flags profiles that
+# are empty, all-NaN, constant, out of range or have non-monotonic pressure.
 # This script should be run AFTER the attribute_inspector.py and BEFORE the final ETL load.
+# Usage: python -m data_pipeline.data_quality_checker [--from-cache] [--workers N] [--write-db]
+#   --from-cache runs the same checks on the decode-once Parquet cache instead of re-decoding NetCDF.
+#   --write-db stores the metrics in the profile_quality/float_quality tables served by /api/quality.
 
 import os
-import xarray as xr
-import pandas as pd
+import argparse
+
+from data_pipeline.parallel_etl import iter_decoded
+from data_pipeline.ingest_manifest import preferred_files
+from data_pipeline.quality_metrics import (
+    compute_file_metrics, compute_row_metrics, profile_issue, merge_metrics, store_metrics
+)
 
 # --- Configuration ---
 root_data_folder = 'nc files'
 
-print(f"--- 🌊 Starting Data Quality Checker for folder: '{root_data_folder}' ---\n")
-
-# --- Recursively find all profile files ---
-nc_files_to_check = []
-for root, dirs, files in os.walk(root_data_folder):
-    for file in files:
-        if file.endswith('.nc') and (file.startswith('D') or file.startswith('R')):
-            nc_files_to_check.append(os.path.join(root, file))
-
-if not nc_files_to_check:
-    print(f"⚠️ No profile (.nc) files found in '{root_data_folder}'. Exiting.")
-    exit()
 
-print(f"Found {len(nc_files_to_check)} profile files to check for valid data.\n")
-print("="*50)
-
-# --- Loop through each file and check its data content ---
-flagged_files = [] # We'll store any bad files here
-
-for file_path in nc_files_to_check:
-    filename = os.path.basename(file_path)
-    
-    try:
-        dataset = xr.open_dataset(file_path)
-        argo_df = dataset.to_dataframe().reset_index()
-
-        # Perform the same smart attribute selection as the ETL script
-        column_map = {}
-        potential_names = {
-            'temperature': ['temp_adjusted', 'TEMP_ADJUSTED'],
-            'salinity': ['psal_adjusted', 'PSAL_ADJUSTED'],
-            'pressure': ['pres_adjusted', 'PRES_ADJUSTED']
-        }
-        
-        # We only need to find the core measurement columns for this check
-        for clean_name, ugly_names in potential_names.items():
-            for ugly_name in ugly_names:
-                if ugly_name in argo_df.columns:
-                    column_map[ugly_name] = clean_name
-                    break
-        
-        if len(column_map) != 3:
-            raise ValueError("File is missing one or more core measurement variables (temp, psal, pres).")
-
-        final_df = argo_df[list(column_map.keys())].copy()
-        final_df.rename(columns=column_map, inplace=True)
-
-        # --- Data Quality Checks ---
-        if final_df.empty:
-            flagged_files.append((filename, "File is empty; contains no data rows."))
-            continue # Move to the next file
-
-        # Check if all core measurement values are null (NaN)
-        if final_df['temperature'].isnull().all() and final_df['salinity'].isnull().all():
-            flagged_files.append((filename, "All temperature and salinity values are null (NaN)."))
-            continue
-
-        # Check if all values in a column are the same (e.g., all zeroes)
-        if final_df['temperature'].std() == 0 and final_df['pressure'].std() == 0:
-            flagged_files.append((filename, "All measurement values are identical (e.g., all zeroes)."))
-            continue
-
-    except Exception as e:
-        flagged_files.append((filename, f"Failed to process or read. Error: {e}"))
-
-# --- Final Report ---
-print("\n--- Data Quality Report ---")
-if not flagged_files:
-    print("\n✅ SUCCESS: All scanned files appear to contain valid, non-empty data.")
-else:
-    print(f"\n⚠️ WARNING: Found {len(flagged_files)} potentially problematic files.")
-    for filename, reason in flagged_files:
-        print(f"\n📄 File: {filename}")
-        print(f"   └── 🔴 Issue: {reason}")
-print("\n" + "="*50)
-print("\n--- Checker Finished ---")
+def find_profile_files(root_folder):
+    """Recursively find all profile files."""
+    nc_files_to_check = []
+    for root, dirs, files in os.walk(root_folder):
+        for file in files:
+            if file.endswith('.nc') and (file.startswith('D') or file.startswith('R')):
+                nc_files_to_check.append(os.path.join(root, file))
+    return nc_files_to_check
+
+
+def flag_profiles(metrics, label):
+    """[(label, issue)] for every flagged profile in a metrics batch."""
+    flagged = []
+    for i in range(len(metrics['float_id'])):
+        issue = profile_issue(metrics, i)
+        if issue:
+            flagged.append((label(i), issue))
+    return flagged
+
+
+def check_files(nc_files_to_check, workers=1):
+    """
+    Computes metrics for every file (in parallel when workers > 1).
+    Returns ([(filename, issue)] for the flagged profiles, [metrics batch per readable file]).
+    """
+    flagged_files, batches = [], []
+    for file_path, metrics, status, message in iter_decoded(nc_files_to_check, workers=workers,
+                                                            extractor=compute_file_metrics):
+        filename = os.path.basename(file_path)
+        if status == 'skipped':
+            flagged_files.append((filename, message))
+        elif status == 'failed':
+            flagged_files.append((filename, f"Failed to process or read. Error: {message}"))
+        else:
+            batches.append(metrics)
+            multi = len(metrics['float_id']) > 1
+            flagged_files.extend(flag_profiles(
+                metrics, lambda i: f"{filename} profile {i}" if multi else filename))
+    return flagged_files, batches
+
+
+def check_cached_profiles(cache):
+    """
+    Same checks, read from the Parquet profile cache. Only the measurement and QC columns
+    (plus the float/cycle keys) are read. Note the cache only holds levels that passed the
+    ETL's NaN filter, so profiles that were entirely empty show up as missing, not flagged.
+    """
+    table = cache.read_table(columns=['float_id', 'cycle_number', 'pressure', 'temperature', 'salinity',
+                                      'pressure_qc', 'temperature_qc', 'salinity_qc'])
+    if table.num_rows == 0:
+        return [], []
+    columns = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+    metrics = compute_row_metrics(columns)
+    flagged_profiles = flag_profiles(
+        metrics, lambda i: f"float {metrics['float_id'][i]} cycle {metrics['cycle_number'][i]}")
+    return flagged_profiles, [metrics]
+
+
+def format_report(flagged_files):
+    lines = ["\n--- Data Quality Report ---"]
+    if not flagged_files:
+        lines.append("\n✅ SUCCESS: All scanned files appear to contain valid, non-empty data.")
+    else:
+        lines.append(f"\n⚠️ WARNING: Found {len(flagged_files)} potentially problematic files.")
+        for filename, reason in flagged_files:
+            lines.append(f"\n📄 File: {filename}")
+            lines.append(f"   └── 🔴 Issue: {reason}")
+    return "\n".join(lines)
+
+
+def check_data_quality(from_cache=True, root_folder=root_data_folder):
+    """
+    Runs the checker and returns the report text. By default it only reads the Parquet
+    cache (cheap enough to call from the backend); pass from_cache=False to re-decode
+    every NetCDF file instead.
+    """
+    if not from_cache:
+        return format_report(check_files(find_profile_files(root_folder))[0])
+    from data_pipeline.columnar_cache import ProfileCache
+    cache = ProfileCache()
+    if not cache.exists():
+        return "Profile cache not built yet. Run: python -m data_pipeline.columnar_cache build"
+    return format_report(check_cached_profiles(cache)[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check ARGO profiles for empty or invalid data.")
+    parser.add_argument('--root', default=root_data_folder)
+    parser.add_argument('--from-cache', action='store_true', help="Check the Parquet profile cache instead.")
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--workers', type=int, default=1, help="Decode processes for NetCDF checks.")
+    parser.add_argument('--write-db', action='store_true', help="Store the metrics for /api/quality.")
+    args = parser.parse_args(argv)
+
+    if args.from_cache:
+        from data_pipeline.columnar_cache import ProfileCache, DEFAULT_CACHE_DIR
+        cache = ProfileCache(args.cache_dir or DEFAULT_CACHE_DIR)
+        print(f"--- 🌊 Starting Data Quality Checker for cache: '{cache.root}' ---\n")
+        print("="*50)
+        flagged_files, batches = check_cached_profiles(cache)
+    else:
+        print(f"--- 🌊 Starting Data Quality Checker for folder: '{args.root}' ---\n")
+        nc_files_to_check = find_profile_files(args.root)
+        if not nc_files_to_check:
+            print(f"⚠️ No profile (.nc) files found in '{args.root}'. Exiting.")
+            return
+        if args.write_db:
+            # Store one row per profile: when both exist, the delayed-mode (D) file wins over R.
+            nc_files_to_check = sorted(p for paths in preferred_files(nc_files_to_check).values() for p in paths)
+        print(f"Found {len(nc_files_to_check)} profile files to check for valid data.\n")
+        print("="*50)
+        flagged_files, batches = check_files(nc_files_to_check, workers=args.workers)
+
+    # --- Final Report ---
+    print(format_report(flagged_files))
+    print("\n" + "="*50)
+
+    if args.write_db and batches:
+        from data_pipeline.build_database import create_db_engine
+        stored = store_metrics(create_db_engine(), merge_metrics(batches))
+        print(f"\n✅ Stored quality metrics for {stored} profiles.")
+    print("\n--- Checker Finished ---")
+
+
+if __name__ == "__main__":
+    main()
 
 
 ### What to Do Now
@@ -0,0 +1,303 @@
+# Concurrent, resumable download engine for Argo NetCDF files (Data Squad).
+# Files are fetched by a bounded thread pool over one connection-pooled HTTP session:
+#
+#   - resume:   bytes go to <dest>.part; a retry or a later run continues with "Range: bytes=N-"
+#   - retry:    connection errors, timeouts, 429 and 5xx are retried with exponential backoff + jitter;
+#               one bad file never stops the batch
+#   - verify:   the received size must match the server's length (and the index's size / sha256 when
+#               known) and the payload must look like NetCDF before it is renamed into place atomically
+#   - hand-off: an optional on_complete callback sees every verified file as soon as it lands
+#               (EtlHandoff feeds them to build_database.load_files in small batches)
+#
+# Usage: from code, Downloader(workers=8).run(tasks); check_and_download_from_index.py is the CLI.
+
+import os
+import time
+import queue
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+CHUNK_SIZE = 256 * 1024
+PART_SUFFIX = '.part'
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# NetCDF classic / 64-bit offset ("CDF\x01", "CDF\x02") and NetCDF-4 (HDF5) signatures.
+NETCDF_MAGIC = (b'CDF\x01', b'CDF\x02', b'\x89HDF')
+
+
+class DownloadError(Exception):
+    """A download failed in a way that retrying will not fix (e.g. 404, verification failure)."""
+
+
+class DownloadTask:
+    """One file to fetch. expected_size / expected_sha256 come from the index when it has them."""
+
+    def __init__(self, url, dest, expected_size=None, expected_sha256=None):
+        self.url = url
+        self.dest = dest
+        self.expected_size = expected_size
+        self.expected_sha256 = expected_sha256
+
+
+class DownloadStats:
+    """Counters for a download run, plus a throughput summary."""
+
+    def __init__(self):
+        self.downloaded = 0
+        self.resumed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.errors = []
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def record(self, task, status, received, error=None):
+        if status == 'failed':
+            self.failed += 1
+            self.errors.append((task, error))
+            return
+        setattr(self, status, getattr(self, status) + 1)
+        self.bytes += received
+
+    @property
+    def elapsed(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+        return self
+
+    def summary(self):
+        files = self.downloaded + self.resumed + self.skipped + self.failed
+        return (
+            f"{files} files ({self.downloaded} downloaded, {self.resumed} resumed, {self.skipped} already present, "
+            f"{self.failed} failed), {self.bytes / 1e6:.1f} MB in {self.elapsed:.1f}s | "
+            f"{self.bytes / 1e6 / self.elapsed:.1f} MB/s"
+        )
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tasks_from_index(rows, http_root, dest_dir):
+    """
+    DownloadTasks for index rows (DataFrame with a 'file' column like
+    'incois/1902672/profiles/R1902672_001.nc'). Files are laid out as
+    <dest_dir>/<wmo>/profiles/<name>, the same layout as 'nc files'.
+    Optional 'size' / 'sha256' columns are used for verification.
+    """
+    tasks = []
+    for row in rows.itertuples(index=False):
+        relative = row.file.split('/', 1)[1] if '/' in row.file else row.file
+        tasks.append(DownloadTask(
+            urljoin(http_root, row.file),
+            os.path.join(dest_dir, *relative.split('/')),
+            expected_size=getattr(row, 'size', None),
+            expected_sha256=getattr(row, 'sha256', None),
+        ))
+    return tasks
+
+
+class Downloader:
+    """Bounded-concurrency downloader sharing one pooled requests.Session across its threads."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 timeout=60, session=None, on_complete=None, verbose=True):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.on_complete = on_complete
+        self.verbose = verbose
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    # --- One file ---
+
+    def _is_complete(self, task):
+        if not os.path.exists(task.dest):
+            return False
+        if task.expected_size is not None and os.path.getsize(task.dest) != task.expected_size:
+            return False
+        return task.expected_sha256 is None or file_sha256(task.dest) == task.expected_sha256
+
+    def _fetch(self, task, part_path):
+        """One attempt: appends to the .part file from where it stops. Returns (bytes received, resumed, total size)."""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with self.session.get(task.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Nothing left to send: the .part is either complete or longer than the file.
+                total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                if total.isdigit() and int(total) == offset:
+                    return 0, True, offset
+                os.remove(part_path)
+                raise requests.ConnectionError("partial file larger than remote; restarting")
+            if response.status_code in RETRY_STATUS:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            if response.status_code >= 400:
+                raise DownloadError(f"HTTP {response.status_code} for {task.url}")
+
+            if response.status_code == 206:
+                start = int(response.headers['Content-Range'].split(' ', 1)[1].split('-', 1)[0])
+                if start != offset:
+                    raise DownloadError(f"server resumed at byte {start}, expected {offset}")
+                total = int(response.headers['Content-Range'].rpartition('/')[2])
+                mode = 'ab'
+            else:
+                # Server ignored the range (or no partial file): start from scratch.
+                offset = 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length is not None else None
+                mode = 'wb'
+
+            received = 0
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+            return received, offset > 0, total
+
+    def _verify(self, task, part_path, total):
+        size = os.path.getsize(part_path)
+        if total is not None and size != total:
+            raise requests.ConnectionError(f"short read: {size} of {total} bytes")
+        if task.expected_size is not None and size != task.expected_size:
+            raise DownloadError(f"size {size} does not match the index ({task.expected_size})")
+        with open(part_path, 'rb') as f:
+            if not f.read(4).startswith(NETCDF_MAGIC):
+                raise DownloadError("payload is not a NetCDF file")
+        if task.expected_sha256 is not None and file_sha256(part_path) != task.expected_sha256:
+            raise DownloadError("sha256 does not match the index")
+
+    def download(self, task):
+        """Fetches one file. Never raises: returns (task, status, bytes received, error or None)."""
+        if self._is_complete(task):
+            # Still handed on: a previous run may have stopped between download and load
+            # (the ETL manifest makes re-offering an already loaded file cheap).
+            if self.on_complete is not None:
+                self.on_complete(task.dest)
+            return task, 'skipped', 0, None
+
+        os.makedirs(os.path.dirname(task.dest) or '.', exist_ok=True)
+        part_path = task.dest + PART_SUFFIX
+        received_total, resumed = 0, os.path.exists(part_path)
+        for attempt in range(self.retries + 1):
+            try:
+                received, resumed_now, total = self._fetch(task, part_path)
+                received_total += received
+                resumed = resumed or resumed_now
+                self._verify(task, part_path, total)
+                os.replace(part_path, task.dest)
+                if self.on_complete is not None:
+                    self.on_complete(task.dest)
+                return task, 'resumed' if resumed else 'downloaded', received_total, None
+            except DownloadError as e:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                return task, 'failed', received_total, str(e)
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    return task, 'failed', received_total, f"{type(e).__name__}: {e}"
+                # The .part file is kept, so the next attempt resumes where this one stopped.
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+        return task, 'failed', received_total, "retries exhausted"
+
+    # --- Many files ---
+
+    def run(self, tasks):
+        """Downloads every task with at most `workers` in flight. Returns DownloadStats."""
+        stats = DownloadStats()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.download, task) for task in tasks]
+            for future in as_completed(futures):
+                task, status, received, error = future.result()
+                stats.record(task, status, received, error)
+                if self.verbose:
+                    name = os.path.basename(task.dest)
+                    if status == 'failed':
+                        print(f"🔴 ERROR: Download failed for {task.url}: {error}")
+                    elif status == 'skipped':
+                        print(f"Already exists: {name}")
+                    else:
+                        print(f"✅ {name}: {status} ({received / 1e3:.0f} kB)")
+        return stats.finish()
+
+
+class EtlHandoff:
+    """
+    on_complete target that loads finished downloads while the rest are still downloading.
+    Files are queued and a single background thread loads them in batches of up to
+    `batch_files` with build_database.load_files (only the affected profiles are replaced).
+    """
+
+    def __init__(self, engine=None, batch_files=50, etl_workers=1):
+        from data_pipeline.build_database import create_db_engine
+        self.engine = engine if engine is not None else create_db_engine()
+        self.batch_files = batch_files
+        self.etl_workers = etl_workers
+        self.rows_loaded = 0
+        self.files_loaded = 0
+        self.errors = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __call__(self, path):
+        self._queue.put(path)
+
+    def _run(self):
+        from data_pipeline.build_database import load_files
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_files:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = [path for path in batch if path is not None]
+            if not batch:
+                continue
+            try:
+                stats = load_files(self.engine, batch, workers=self.etl_workers)
+            except Exception as e:
+                self.errors.append((batch, str(e)))
+                print(f"🔴 ERROR: ETL hand-off failed for {len(batch)} files: {e}")
+                continue
+            if stats is not None:
+                self.files_loaded += stats.files_loaded
+                self.rows_loaded += stats.rows_loaded
+                self.errors.extend(stats.errors)
+
+    def close(self):
+        """Waits until every queued file has been loaded."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,129 @@
+# Float-level source mode for the Data Squad's ETL.
+# Every float directory ships a <wmo>_prof.nc that already aggregates all of its cycles.
+# Reading it costs one file open and one vectorized pass, instead of one open and
+# header decode per R*/D*.nc file. Per-cycle files are only used for the cycles the
+# aggregated file cannot answer for:
+#   - cycles that are newer than the _prof.nc (not in it at all), and
+#   - cycles whose per-cycle file is in delayed mode (D) while the _prof.nc still
+#     holds the real-time/adjusted version.
+
+import os
+import numpy as np
+import xarray as xr
+
+from data_pipeline.profile_extractor import (
+    extract_profile_columns, extract_dataset_columns, find_variable, decode_char_values, as_float_array,
+    OPTIONAL_NAMES, SkipFile
+)
+from data_pipeline.ingest_manifest import preferred_files, parse_profile_filename
+
+
+def find_float_directories(root_folder):
+    """{float_id: directory} for every folder holding a <wmo>_prof.nc or R/D profile files."""
+    float_dirs = {}
+    for root, dirs, files in os.walk(root_folder):
+        for file in files:
+            if file.endswith('_prof.nc') and file.split('_')[0].isdigit():
+                float_dirs[int(file.split('_')[0])] = root
+            elif parse_profile_filename(file) is not None:
+                float_id = parse_profile_filename(file)[1]
+                # Per-cycle files live in <float_dir>/profiles/.
+                parent = os.path.dirname(root) if os.path.basename(root) == 'profiles' else root
+                float_dirs.setdefault(float_id, parent)
+    return dict(sorted(float_dirs.items()))
+
+
+def float_files(float_dir):
+    """Returns (aggregated _prof.nc path or None, sorted per-cycle R/D paths) for one float."""
+    prof_path = None
+    cycle_files = []
+    for root, dirs, files in os.walk(float_dir):
+        for file in files:
+            if file.endswith('_prof.nc') and root == float_dir:
+                prof_path = os.path.join(root, file)
+            elif parse_profile_filename(file) is not None:
+                cycle_files.append(os.path.join(root, file))
+    return prof_path, sorted(cycle_files)
+
+
+def float_groups(root_folder):
+    """
+    Load-plan groups for float mode: {(float_id, None): every source file of the float},
+    plus {(float_id, None): float directory} to hand to extract_float_columns.
+    """
+    groups, directories = {}, {}
+    for float_id, float_dir in find_float_directories(root_folder).items():
+        prof_path, cycle_files = float_files(float_dir)
+        groups[(float_id, None)] = ([prof_path] if prof_path else []) + cycle_files
+        directories[(float_id, None)] = float_dir
+    return groups, directories
+
+
+def read_prof_index(ds):
+    """{(cycle, direction): data_mode} for every profile in an open aggregated _prof.nc dataset."""
+    cycle_var = find_variable(ds, OPTIONAL_NAMES['cycle_number'])
+    if cycle_var is None:
+        return {}
+    cycles = np.atleast_1d(as_float_array(ds[cycle_var].values))
+    n_prof = len(cycles)
+    direction_var = find_variable(ds, OPTIONAL_NAMES['direction'])
+    mode_var = find_variable(ds, ['data_mode', 'DATA_MODE'])
+    directions = decode_char_values(ds[direction_var].values if direction_var else None, n_prof, 'A')
+    modes = decode_char_values(ds[mode_var].values if mode_var else None, n_prof, 'R')
+    return {(int(c), d): m for c, d, m in zip(cycles, directions, modes) if np.isfinite(c)}
+
+
+def select_float_sources(prof_index, cycle_files):
+    """
+    Decides which per-cycle files must be read on top of the aggregated file, given its
+    read_prof_index() (None when the float has no _prof.nc).
+    Returns (fallback per-cycle paths, set of (cycle, direction) to drop from the _prof.nc).
+    """
+    chosen = [path for paths in preferred_files(cycle_files).values() for path in paths]
+    if prof_index is None:
+        return chosen, set()
+
+    fallback = []
+    for file_path in chosen:
+        data_mode, _, cycle, direction = parse_profile_filename(file_path)
+        prof_mode = prof_index.get((cycle, direction))
+        if prof_mode is None or (data_mode == 'D' and prof_mode != 'D'):
+            fallback.append(file_path)
+    overridden = {parse_profile_filename(p)[2:] for p in fallback}
+    return fallback, overridden
+
+
+def extract_float_columns(float_dir, include_qc=False):
+    """
+    Decodes a whole float: its _prof.nc in one pass, plus the per-cycle files that are
+    newer or in delayed mode. Returns (columns, {source path: rows contributed}).
+    """
+    prof_path, cycle_files = float_files(float_dir)
+    batches = []
+    source_rows = {}
+
+    def collect(source_path, extract):
+        try:
+            columns = extract()
+        except SkipFile:
+            source_rows[source_path] = 0
+            return
+        batches.append(columns)
+        source_rows[source_path] = len(columns['float_id'])
+
+    if prof_path is None:
+        fallback, _ = select_float_sources(None, cycle_files)
+    else:
+        # One open of the aggregated file serves both the cycle index and the data pass.
+        with xr.open_dataset(prof_path, decode_times=False) as ds:
+            fallback, overridden = select_float_sources(read_prof_index(ds), cycle_files)
+            collect(prof_path, lambda: extract_dataset_columns(
+                ds, prof_path, exclude_profiles=overridden, include_qc=include_qc))
+
+    for path in fallback:
+        collect(path, lambda: extract_profile_columns(path, include_qc=include_qc))
+
+    if not batches:
+        raise SkipFile("no valid data points found in any source")
+    merged = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+    return merged, source_rows
@@ -0,0 +1,193 @@
+# Per-float summary table behind /api/floats (Data Squad).
+# One row per float, so listing and filtering floats never aggregates argo_profiles at request time:
+#
+#   float_summary  float_id (PK), platform_number, first/last profile date, last cycle,
+#                  last position, latest surface temperature / salinity (shallowest level of the
+#                  latest profile that has the variable), cycle and level counts, the float's bbox,
+#                  and whether it ever reported temperature / salinity
+#
+# The ETL refreshes it incrementally: publish_staged_load recomputes exactly the floats a load
+# touched, in the same transaction as the data, so the summary is never out of step with
+# argo_profiles. Indexes on last_date and (last_latitude, last_longitude) serve the endpoint's
+# date and bbox filters; paging is keyset on the primary key.
+#
+# Usage: python -m data_pipeline.float_summary --rebuild    builds it for an existing database
+
+import argparse
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Index, Integer, BigInteger, Float, Text, Boolean, DateTime
+from sqlalchemy import text, bindparam
+
+from data_pipeline.bulk_loader import TABLE_NAME
+
+FLOAT_SUMMARY_TABLE = 'float_summary'
+# Floats recomputed per query when refreshing a subset.
+REFRESH_CHUNK = 500
+
+
+def float_summary_table(metadata=None):
+    return Table(
+        FLOAT_SUMMARY_TABLE, metadata if metadata is not None else MetaData(),
+        Column('float_id', BigInteger, primary_key=True),
+        Column('platform_number', Text),
+        Column('first_date', DateTime),
+        Column('last_date', DateTime),
+        Column('last_cycle', Integer),
+        Column('last_latitude', Float),
+        Column('last_longitude', Float),
+        Column('surface_pressure', Float),
+        Column('surface_temperature', Float),
+        Column('surface_salinity', Float),
+        Column('cycles', Integer),
+        Column('levels', BigInteger),
+        Column('lat_min', Float),
+        Column('lat_max', Float),
+        Column('lon_min', Float),
+        Column('lon_max', Float),
+        Column('has_temperature', Boolean),
+        Column('has_salinity', Boolean),
+        Column('updated_at', DateTime),
+        Index('ix_float_summary_last_date', 'last_date'),
+        Index('ix_float_summary_position', 'last_latitude', 'last_longitude'),
+    )
+
+
+def ensure_float_summary_table(engine):
+    metadata = MetaData()
+    float_summary_table(metadata)
+    metadata.create_all(engine, checkfirst=True)
+
+
+def _float_filter(float_ids):
+    return "WHERE float_id IN :float_ids" if float_ids is not None else ""
+
+
+def _read(connection, query, float_ids):
+    statement = text(query)
+    params = {}
+    if float_ids is not None:
+        statement = statement.bindparams(bindparam('float_ids', expanding=True))
+        params['float_ids'] = list(float_ids)
+    return pd.read_sql(statement, connection, params=params)
+
+
+def _surface_value(last_rows, column):
+    """Shallowest non-null `column` of each float's latest profile."""
+    valid = last_rows.dropna(subset=[column, 'pressure'])
+    shallowest = valid.loc[valid.groupby('float_id')['pressure'].idxmin()]
+    return shallowest.set_index('float_id')[column]
+
+
+def summarize_floats(connection, float_ids=None):
+    """Summary records for `float_ids` (every float when None), computed from argo_profiles."""
+    where = _float_filter(float_ids)
+    aggregates = _read(connection, f"""
+        SELECT float_id,
+               MIN(platform_number) AS platform_number,
+               MIN(profile_date) AS first_date,
+               MAX(profile_date) AS last_date,
+               COUNT(DISTINCT cycle_number) AS cycles,
+               COUNT(*) AS levels,
+               MIN(latitude) AS lat_min, MAX(latitude) AS lat_max,
+               MIN(longitude) AS lon_min, MAX(longitude) AS lon_max,
+               MAX(CASE WHEN temperature IS NOT NULL THEN 1 ELSE 0 END) AS has_temperature,
+               MAX(CASE WHEN salinity IS NOT NULL THEN 1 ELSE 0 END) AS has_salinity
+        FROM {TABLE_NAME} {where}
+        GROUP BY float_id
+    """, float_ids)
+    if aggregates.empty:
+        return []
+    # Every level of each float's latest profile.
+    last_rows = _read(connection, f"""
+        SELECT p.float_id, p.cycle_number, p.latitude, p.longitude, p.pressure, p.temperature, p.salinity
+        FROM {TABLE_NAME} p
+        JOIN (SELECT float_id, MAX(profile_date) AS last_date FROM {TABLE_NAME} {where} GROUP BY float_id) l
+          ON p.float_id = l.float_id AND p.profile_date = l.last_date
+    """, float_ids)
+
+    summary = aggregates.set_index('float_id')
+    latest = last_rows.groupby('float_id').agg(last_cycle=('cycle_number', 'max'), last_latitude=('latitude', 'first'),
+                                               last_longitude=('longitude', 'first'))
+    summary = summary.join(latest)
+    summary['surface_pressure'] = last_rows.groupby('float_id')['pressure'].min()
+    summary['surface_temperature'] = _surface_value(last_rows, 'temperature')
+    summary['surface_salinity'] = _surface_value(last_rows, 'salinity')
+    for column in ('first_date', 'last_date'):
+        summary[column] = pd.to_datetime(summary[column])
+
+    now = datetime.now()
+    records = []
+    for float_id, row in summary.iterrows():
+        record = {'float_id': int(float_id), 'updated_at': now}
+        for name, value in row.items():
+            if pd.isna(value):
+                value = None
+            elif isinstance(value, pd.Timestamp):
+                value = value.to_pydatetime()
+            elif name in ('has_temperature', 'has_salinity'):
+                value = bool(value)
+            elif hasattr(value, 'item'):
+                value = value.item()
+            record[name] = value
+        records.append(record)
+    return records
+
+
+def refresh_float_summary(connection, float_ids=None):
+    """
+    Recomputes the summary rows of `float_ids` (all floats when None) inside the caller's
+    transaction. Floats that no longer have any rows are removed. Returns the rows written.
+    """
+    table = float_summary_table()
+    if float_ids is None:
+        connection.execute(text(f"DELETE FROM {FLOAT_SUMMARY_TABLE}"))
+        records = summarize_floats(connection)
+        if records:
+            connection.execute(table.insert(), records)
+        return len(records)
+
+    float_ids = sorted({int(f) for f in float_ids})
+    written = 0
+    for start in range(0, len(float_ids), REFRESH_CHUNK):
+        chunk = float_ids[start:start + REFRESH_CHUNK]
+        connection.execute(text(f"DELETE FROM {FLOAT_SUMMARY_TABLE} WHERE float_id = :float_id"),
+                           [{'float_id': f} for f in chunk])
+        records = summarize_floats(connection, chunk)
+        if records:
+            connection.execute(table.insert(), records)
+        written += len(records)
+    return written
+
+
+def rebuild_float_summary(engine):
+    """Creates the table if needed and recomputes every float in one transaction."""
+    ensure_float_summary_table(engine)
+    with engine.begin() as connection:
+        return refresh_float_summary(connection)
+
+
+def main(argv=None):
+    from data_pipeline.build_database import create_db_engine
+
+    parser = argparse.ArgumentParser(description="Build or refresh the float_summary table.")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute every float from argo_profiles.")
+    parser.add_argument('--float-id', type=int, action='append', help="Recompute only these floats.")
+    args = parser.parse_args(argv)
+
+    engine = create_db_engine()
+    ensure_float_summary_table(engine)
+    if args.float_id:
+        with engine.begin() as connection:
+            written = refresh_float_summary(connection, args.float_id)
+    elif args.rebuild:
+        written = rebuild_float_summary(engine)
+    else:
+        parser.print_help()
+        return
+    print(f"✅ {FLOAT_SUMMARY_TABLE}: {written} floats summarized.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+# Local, indexed copy of the GDAC profile index (ar_index_global_prof.txt) for the Data Squad.
+# The text index is downloaded/parsed once and stored as Parquet with typed columns
+# (timestamps, float32 coordinates, dictionary-encoded strings). Later refreshes are cheap:
+#
+#   - conditional:  HTTP If-None-Match / If-Modified-Since (local files: size + mtime), so an
+#                   unchanged index costs one request and no parsing
+#   - incremental:  when the source only grew, just the new bytes are fetched (HTTP Range /
+#                   file seek) and merged, after checking the previously seen tail is unchanged
+#   - delta files:  merge_delta() folds in ar_index_this_week_prof.txt-style files
+#
+# Rows are stored sorted by a (grid cell, date) key so a bbox + date query is a handful of
+# binary searches instead of a full boolean scan.
+# Usage: python -m data_pipeline.index_cache refresh [--source URL_OR_PATH]
+#        python -m data_pipeline.index_cache query --lat 8 20 --lon 68 76 --start 2023-03-01 --end 2023-03-05
+
+import os
+import io
+import json
+import time
+import base64
+import argparse
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+INDEX_URL = os.getenv("ARGO_INDEX_URL", "https://data-argo.ifremer.fr/ar_index_global_prof.txt")
+DEFAULT_INDEX_DIR = os.getenv("ARGO_INDEX_CACHE_DIR", "index_cache")
+
+# Bump whenever the stored columns or sort key change; older caches are rebuilt from the source.
+INDEX_VERSION = 1
+INDEX_FILE = 'ar_index_global_prof.parquet'
+META_FILE = '_meta.json'
+
+INDEX_COLUMNS = ['file', 'date', 'latitude', 'longitude', 'ocean', 'profiler_type', 'institution', 'date_update']
+GRID_DEGREES = 2.0
+# Bytes at the end of the previously parsed source that must be unchanged for an incremental append.
+TAIL_BYTES = 4096
+DOWNLOAD_CHUNK = 1 << 20
+
+# Sort key = cell << DATE_BITS | seconds since KEY_EPOCH (+1, so 0 means "no date").
+KEY_EPOCH = np.datetime64('1900-01-01T00:00:00', 's')
+DATE_BITS = 34
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the index cache (pip install pyarrow).")
+
+
+def is_url(source):
+    return source.startswith('http://') or source.startswith('https://')
+
+
+def parse_compact_dates(values):
+    """YYYYMMDDHHMISS numbers -> datetime64[s] with plain integer arithmetic (NaT where missing)."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values) & (values >= 1e13)
+    stamps = np.where(valid, values, 19700101000000).astype(np.int64)
+    year, rest = np.divmod(stamps, 10**10)
+    month, rest = np.divmod(rest, 10**8)
+    day, rest = np.divmod(rest, 10**6)
+    hour, rest = np.divmod(rest, 10**4)
+    minute, second = np.divmod(rest, 100)
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = (months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')).astype('datetime64[s]')
+    dates = dates + (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')
+    dates[~valid] = np.datetime64('NaT')
+    return dates
+
+
+def parse_index_text(data, header=True):
+    """Parses index text (bytes) into a typed DataFrame. `header=False` for appended chunks."""
+    df = pd.read_csv(
+        io.BytesIO(data), comment='#', header=0 if header else None,
+        names=None if header else INDEX_COLUMNS,
+        dtype={'file': str, 'date': np.float64, 'latitude': np.float32, 'longitude': np.float32,
+               'ocean': 'category', 'profiler_type': 'Int16', 'institution': 'category',
+               'date_update': np.float64},
+    )
+    df = df.reindex(columns=INDEX_COLUMNS)
+    for column in ('date', 'date_update'):
+        df[column] = parse_compact_dates(df[column].to_numpy())
+    return df
+
+
+class IndexGrid:
+    """Regular lat/lon grid used to bucket index rows; cells are numbered row-major from (-90, -180)."""
+
+    def __init__(self, degrees=GRID_DEGREES):
+        self.degrees = float(degrees)
+        self.n_lat = int(np.ceil(180 / self.degrees))
+        self.n_lon = int(np.ceil(360 / self.degrees))
+        # Rows without a position go in one extra cell that bbox queries never touch.
+        self.missing_cell = self.n_lat * self.n_lon
+
+    def lat_index(self, lat):
+        return np.clip(np.floor((np.asarray(lat, dtype=np.float64) + 90) / self.degrees), 0, self.n_lat - 1).astype(np.int64)
+
+    def lon_index(self, lon):
+        wrapped = (np.asarray(lon, dtype=np.float64) + 180) % 360
+        return np.clip(np.floor(wrapped / self.degrees), 0, self.n_lon - 1).astype(np.int64)
+
+    def cells(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        cells = np.full(lat.shape, self.missing_cell, dtype=np.int64)
+        cells[valid] = self.lat_index(lat[valid]) * self.n_lon + self.lon_index(lon[valid])
+        return cells
+
+    def bbox_cells(self, lat_min, lat_max, lon_min, lon_max):
+        """Every cell overlapping the box. lon_min > lon_max means the box crosses the antimeridian."""
+        lat_rows = np.arange(self.lat_index(lat_min), self.lat_index(lat_max) + 1)
+        if lon_max - lon_min >= 360:
+            lon_cols = np.arange(self.n_lon)
+        elif lon_min <= lon_max:
+            first = int(np.clip(np.floor((lon_min + 180) / self.degrees), 0, self.n_lon - 1))
+            last = int(np.clip(np.floor((lon_max + 180) / self.degrees), 0, self.n_lon - 1))
+            lon_cols = np.arange(first, last + 1)
+            if lon_max >= 180:
+                # lon == 180 is stored in the -180 column.
+                lon_cols = np.union1d(lon_cols, [0])
+        else:
+            first, last = int(self.lon_index(lon_min)), int(self.lon_index(lon_max))
+            lon_cols = np.concatenate([np.arange(first, self.n_lon), np.arange(0, last + 1)])
+        return (lat_rows[:, None] * self.n_lon + lon_cols[None, :]).ravel()
+
+
+def date_offsets(dates):
+    """Seconds since KEY_EPOCH + 1 per date (0 for NaT), as used in the sort key."""
+    dates = np.asarray(dates, dtype='datetime64[s]')
+    offsets = (dates - KEY_EPOCH).astype(np.int64) + 1
+    offsets[np.isnat(dates)] = 0
+    return offsets
+
+
+class IndexCache:
+    """The local Parquet copy of the GDAC profile index, plus the in-memory search arrays."""
+
+    def __init__(self, root=DEFAULT_INDEX_DIR, source=INDEX_URL, grid_degrees=GRID_DEGREES, session=None):
+        _require_pyarrow()
+        self.root = root
+        self.source = source
+        self.grid = IndexGrid(grid_degrees)
+        self.session = session
+        self._table = None
+        self._keys = None
+
+    # --- Metadata ---
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def read_meta(self):
+        try:
+            with open(self._path(META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (meta.get('version') != INDEX_VERSION or meta.get('grid_degrees') != self.grid.degrees
+                or meta.get('source') != self.source or not os.path.exists(self._path(INDEX_FILE))):
+            return None
+        return meta
+
+    def _write_meta(self, meta):
+        tmp_path = self._path(META_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self._path(META_FILE))
+
+    def exists(self):
+        return self.read_meta() is not None
+
+    # --- Fetching the source ---
+
+    def _get_session(self):
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        return self.session
+
+    def _fetch_http(self, meta, force):
+        """(status, bytes, validators); status is 'unchanged', 'range' (bytes start at meta's tail) or 'full'."""
+        headers = {}
+        if meta and not force:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+            if meta.get('length'):
+                headers['Range'] = f"bytes={meta['length'] - len(base64.b64decode(meta['tail']))}-"
+
+        response = self._get_session().get(self.source, headers=headers, stream=True, timeout=60)
+        if response.status_code == 304:
+            response.close()
+            return 'unchanged', None, {}
+        if response.status_code == 416:
+            # The source shrank below what we saw: start over.
+            response.close()
+            return self._fetch_http(None, True)
+        response.raise_for_status()
+
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        buffer = io.BytesIO()
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+            buffer.write(chunk)
+        status = 'range' if response.status_code == 206 else 'full'
+        return status, buffer.getvalue(), validators
+
+    def _fetch_file(self, meta, force):
+        stat = os.stat(self.source)
+        validators = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        if meta and not force:
+            if meta.get('size') == stat.st_size and meta.get('mtime') == stat.st_mtime:
+                return 'unchanged', None, validators
+            start = meta['length'] - len(base64.b64decode(meta['tail']))
+            if stat.st_size >= meta['length']:
+                with open(self.source, 'rb') as f:
+                    f.seek(start)
+                    return 'range', f.read(), validators
+        with open(self.source, 'rb') as f:
+            return 'full', f.read(), validators
+
+    # --- Refreshing ---
+
+    def refresh(self, force=False):
+        """
+        Brings the local copy up to date with the source. Returns 'unchanged', 'appended'
+        or 'rebuilt'.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        meta = self.read_meta()
+        fetch = self._fetch_http if is_url(self.source) else self._fetch_file
+        status, data, validators = fetch(meta, force)
+
+        if status == 'unchanged':
+            return 'unchanged'
+
+        if status == 'range':
+            tail = base64.b64decode(meta['tail'])
+            if data[:len(tail)] == tail:
+                consumed = self._consume_complete_lines(data[len(tail):])
+                new_rows = parse_index_text(data[len(tail):len(tail) + consumed], header=False)
+                frame = self._merge(self.load_frame(), new_rows)
+                self._store(frame, data[:len(tail) + consumed], meta['length'] + consumed, validators)
+                return 'appended'
+            # The source was rewritten, not appended to: fetch everything again.
+            status, data, validators = fetch(None, True)
+
+        consumed = self._consume_complete_lines(data)
+        frame = parse_index_text(data[:consumed], header=True)
+        self._store(frame, data[:consumed], consumed, validators)
+        return 'rebuilt'
+
+    @staticmethod
+    def _consume_complete_lines(data):
+        """Bytes up to and including the last newline; a half-written last line is left for next time."""
+        return data.rfind(b'\n') + 1
+
+    @staticmethod
+    def _merge(existing, new_rows):
+        """Newer rows replace older rows for the same file."""
+        if new_rows.empty:
+            return existing
+        frame = pd.concat([existing, new_rows], ignore_index=True)
+        for column in ('ocean', 'institution'):
+            frame[column] = frame[column].astype(object).astype('category')
+        return frame.drop_duplicates(subset='file', keep='last')
+
+    def merge_delta(self, delta_source):
+        """Folds a delta index (same format, e.g. ar_index_this_week_prof.txt) into the local copy."""
+        if is_url(delta_source):
+            response = self._get_session().get(delta_source, timeout=60)
+            response.raise_for_status()
+            data = response.content
+        else:
+            with open(delta_source, 'rb') as f:
+                data = f.read()
+        meta = self.read_meta()
+        if meta is None:
+            raise FileNotFoundError(f"No index cache at '{self.root}'. Run refresh() first.")
+        frame = self._merge(self.load_frame(), parse_index_text(data, header=True))
+        self._store(frame, None, meta['length'], {k: meta.get(k) for k in ('etag', 'last_modified', 'size', 'mtime')},
+                    tail=meta['tail'])
+        return len(frame)
+
+    def _store(self, frame, consumed_data, length, validators, tail=None):
+        """Sorts by (cell, date), writes the Parquet file and metadata atomically."""
+        cells = self.grid.cells(frame['latitude'].to_numpy(), frame['longitude'].to_numpy())
+        keys = (cells << DATE_BITS) | date_offsets(frame['date'].to_numpy())
+        order = np.argsort(keys, kind='stable')
+        frame = frame.iloc[order].reset_index(drop=True)
+        frame['sort_key'] = keys[order]
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        tmp_path = self._path(INDEX_FILE + '.tmp')
+        pq.write_table(table, tmp_path, row_group_size=256_000)
+        os.replace(tmp_path, self._path(INDEX_FILE))
+
+        if tail is None:
+            tail = base64.b64encode(consumed_data[-TAIL_BYTES:]).decode()
+        meta = {
+            'version': INDEX_VERSION, 'source': self.source, 'grid_degrees': self.grid.degrees,
+            'rows': len(frame), 'length': length, 'tail': tail, 'refreshed_at': time.time(),
+        }
+        meta.update(validators)
+        self._write_meta(meta)
+        self._table, self._keys = None, None
+
+    # --- Querying ---
+
+    def load(self):
+        """Loads the Parquet copy once; the sort-key column stays as a numpy array for searching."""
+        if self._table is None:
+            if not self.exists():
+                raise FileNotFoundError(f"No index cache at '{self.root}'. Run refresh() first.")
+            table = pq.read_table(self._path(INDEX_FILE))
+            self._keys = table.column('sort_key').to_numpy()
+            self._table = table.drop(['sort_key'])
+        return self._table
+
+    def load_frame(self):
+        return self.load().to_pandas()
+
+    def __len__(self):
+        return self.load().num_rows
+
+    def query_rows(self, lat_min=-90, lat_max=90, lon_min=-180, lon_max=180, start=None, end=None):
+        """Row numbers matching the bbox (inclusive) and date range (inclusive), in sort order."""
+        table = self.load()
+        cells = self.grid.bbox_cells(lat_min, lat_max, lon_min, lon_max)
+        low = 1 if start is None else int(date_offsets(np.array([start], dtype='datetime64[s]'))[0])
+        high = (1 << DATE_BITS) - 1 if end is None else int(date_offsets(np.array([end], dtype='datetime64[s]'))[0])
+        if start is None and end is None:
+            low = 0
+        starts = np.searchsorted(self._keys, (cells << DATE_BITS) | low, side='left')
+        ends = np.searchsorted(self._keys, (cells << DATE_BITS) | high, side='right')
+        counts = ends - starts
+        if counts.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        # Concatenate every [start, end) range without a Python loop.
+        rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        # Cells on the edge of the box hold some rows outside it.
+        lat = table.column('latitude').take(pa.array(rows)).to_numpy()
+        lon = table.column('longitude').take(pa.array(rows)).to_numpy()
+        inside = (lat >= lat_min) & (lat <= lat_max)
+        if lon_min <= lon_max:
+            inside &= (lon >= lon_min) & (lon <= lon_max)
+        else:
+            inside &= (lon >= lon_min) | (lon <= lon_max)
+        return rows[inside]
+
+    def query(self, lat_min=-90, lat_max=90, lon_min=-180, lon_max=180, start=None, end=None, columns=None):
+        """Matching index rows as a DataFrame (all INDEX_COLUMNS unless `columns` is given)."""
+        rows = self.query_rows(lat_min, lat_max, lon_min, lon_max, start, end)
+        table = self.load()
+        if columns:
+            table = table.select(columns)
+        return table.take(pa.array(rows)).to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain and query the local GDAC profile index.")
+    parser.add_argument('command', choices=['refresh', 'query'])
+    parser.add_argument('--source', default=INDEX_URL, help="Index URL or local file.")
+    parser.add_argument('--cache-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--force', action='store_true', help="Ignore validators and re-download.")
+    parser.add_argument('--delta', default=None, help="Also merge this delta index file/URL.")
+    parser.add_argument('--lat', nargs=2, type=float, default=[-90, 90])
+    parser.add_argument('--lon', nargs=2, type=float, default=[-180, 180])
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    args = parser.parse_args(argv)
+
+    cache = IndexCache(args.cache_dir, args.source)
+    if args.command == 'refresh':
+        started = time.perf_counter()
+        status = cache.refresh(force=args.force)
+        if args.delta:
+            cache.merge_delta(args.delta)
+        print(f"✅ Index {status}: {len(cache)} profiles in {time.perf_counter() - started:.2f}s")
+        return status
+
+    if not cache.exists():
+        cache.refresh()
+    started = time.perf_counter()
+    result = cache.query(args.lat[0], args.lat[1], args.lon[0], args.lon[1], args.start, args.end)
+    print(f"Matches found: {len(result)} in {(time.perf_counter() - started) * 1000:.1f} ms")
+    print(result.head(10).to_string(index=False))
+    return result
+
+
+if __name__ == "__main__":
+    main()
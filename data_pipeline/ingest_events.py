@@ -0,0 +1,221 @@
+# Ingest events: the ETL announces every profile it publishes, the backend relays them to /ws.
+# An event is one profile of the load:
+#
+#   {"float_id", "cycle", "latitude", "longitude", "time", "levels"}
+#
+# Events cross from the ETL process to the backend through a local pub/sub:
+#
+#   notify  PostgreSQL NOTIFY on INGEST_EVENTS_CHANNEL, sent inside the publish transaction, so
+#           listeners hear about a load exactly when (and only if) it commits. Payloads are
+#           batched under the 8000-byte NOTIFY limit.
+#   file    an append-only JSON-lines file (INGEST_EVENTS_FILE) written right after the commit;
+#           the stand-in for engines without NOTIFY (e.g. the SQLite files used for testing).
+#   off     no events.
+#
+# INGEST_EVENTS=auto (default) picks notify on PostgreSQL and file elsewhere. A load of more than
+# INGEST_EVENTS_MAX profiles (e.g. a full rebuild) is announced as one {"reload": true} event instead.
+#
+# Usage: from code, IngestEventSink(engine) in the ETL and IngestEventListener(engine, callback)
+#        in the backend; python -m data_pipeline.ingest_events --listen prints events as they arrive.
+
+import os
+import json
+import time
+import select
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+INGEST_EVENTS = os.getenv("INGEST_EVENTS", "auto")
+INGEST_EVENTS_CHANNEL = os.getenv("INGEST_EVENTS_CHANNEL", "floatchat_ingest")
+INGEST_EVENTS_FILE = os.getenv("INGEST_EVENTS_FILE", os.path.join(tempfile.gettempdir(), "floatchat_ingest_events.jsonl"))
+INGEST_EVENTS_MAX = int(os.getenv("INGEST_EVENTS_MAX", "20000"))
+# NOTIFY payloads must stay under 8000 bytes.
+NOTIFY_MAX_BYTES = 7000
+FILE_POLL_SECONDS = 0.2
+
+
+def events_mode(engine, mode=None):
+    mode = mode or INGEST_EVENTS
+    if mode == "auto":
+        return "notify" if engine.dialect.name == "postgresql" else "file"
+    if mode not in ("notify", "file", "off"):
+        raise ValueError(f"Unknown INGEST_EVENTS mode: {mode} (use auto, notify, file or off)")
+    return mode
+
+
+def staged_profile_events(connection, table):
+    """One event per (float, cycle) profile in `table`; call before the staging table is dropped."""
+    frame = pd.read_sql(text(f"""
+        SELECT float_id, cycle_number AS cycle, MIN(profile_date) AS time, MIN(latitude) AS latitude,
+               MIN(longitude) AS longitude, COUNT(*) AS levels
+        FROM {table}
+        GROUP BY float_id, cycle_number
+    """), connection)
+    if len(frame) > INGEST_EVENTS_MAX:
+        return [{"reload": True, "profiles": int(len(frame))}]
+    frame["time"] = pd.to_datetime(frame["time"])
+    events = []
+    for row in frame.itertuples(index=False):
+        events.append({
+            "float_id": int(row.float_id),
+            "cycle": int(row.cycle) if pd.notna(row.cycle) else None,
+            "latitude": float(row.latitude) if pd.notna(row.latitude) else None,
+            "longitude": float(row.longitude) if pd.notna(row.longitude) else None,
+            "time": row.time.isoformat() if pd.notna(row.time) else None,
+            "levels": int(row.levels),
+        })
+    return events
+
+
+def payload_batches(events, max_bytes=NOTIFY_MAX_BYTES):
+    """JSON payloads {"events": [...]} of at most `max_bytes` each."""
+    batch, size = [], 20
+    for event in events:
+        encoded = json.dumps(event)
+        if batch and size + len(encoded) + 1 > max_bytes:
+            yield json.dumps({"events": batch})
+            batch, size = [], 20
+        batch.append(event)
+        size += len(encoded) + 1
+    if batch:
+        yield json.dumps({"events": batch})
+
+
+class IngestEventSink:
+    """
+    The ETL side. stage() inside the publish transaction (NOTIFY is queued there and delivered
+    on commit); commit() after the transaction committed (the file stand-in is written then).
+    """
+
+    def __init__(self, engine, mode=None, path=None):
+        self.mode = events_mode(engine, mode)
+        self.path = path or INGEST_EVENTS_FILE
+        self.pending = []
+
+    def stage(self, connection, events):
+        if self.mode == "notify":
+            for payload in payload_batches(events):
+                connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                   {"channel": INGEST_EVENTS_CHANNEL, "payload": payload})
+        elif self.mode == "file":
+            self.pending.extend(events)
+
+    def commit(self):
+        if self.mode != "file" or not self.pending:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for payload in payload_batches(self.pending, max_bytes=1 << 20):
+                f.write(payload + "\n")
+        self.pending = []
+
+
+class IngestEventListener:
+    """
+    The backend side: a daemon thread that hands each published batch (a list of events) to
+    `callback`, from that thread. Only events published after start() are delivered.
+    """
+
+    def __init__(self, engine, callback, mode=None, path=None):
+        self.engine = engine
+        self.callback = callback
+        self.mode = events_mode(engine, mode)
+        self.path = path or INGEST_EVENTS_FILE
+        self.stopping = threading.Event()
+        self.thread = None
+        self.batches = 0
+
+    def start(self):
+        if self.mode == "off":
+            return self
+        target = self._listen_notify if self.mode == "notify" else self._tail_file
+        self.thread = threading.Thread(target=target, name="ingest-events", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def _deliver(self, payload):
+        try:
+            events = json.loads(payload).get("events", [])
+        except ValueError:
+            return
+        if events:
+            self.batches += 1
+            self.callback(events)
+
+    def _listen_notify(self):
+        while not self.stopping.is_set():
+            try:
+                connection = self.engine.raw_connection()
+                dbapi = connection.driver_connection
+                dbapi.autocommit = True
+                cursor = dbapi.cursor()
+                cursor.execute(f'LISTEN "{INGEST_EVENTS_CHANNEL}"')
+                while not self.stopping.is_set():
+                    if select.select([dbapi], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        self._deliver(dbapi.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"⚠️ Ingest event listener error: {e}; reconnecting")
+                time.sleep(1)
+            finally:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+    def _tail_file(self):
+        offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        partial = ""
+        while not self.stopping.wait(FILE_POLL_SECONDS):
+            if not os.path.exists(self.path):
+                offset, partial = 0, ""
+                continue
+            if os.path.getsize(self.path) < offset:
+                # Truncated or replaced: start over.
+                offset, partial = 0, ""
+            with open(self.path, encoding="utf-8") as f:
+                f.seek(offset)
+                data = f.read()
+                offset = f.tell()
+            lines = (partial + data).split("\n")
+            partial = lines.pop()
+            for line in lines:
+                if line.strip():
+                    self._deliver(line)
+
+
+def main(argv=None):
+    from data_pipeline.build_database import create_db_engine
+
+    parser = argparse.ArgumentParser(description="Watch the ingest events the ETL publishes.")
+    parser.add_argument('--listen', action='store_true', help="Print event batches as they arrive.")
+    args = parser.parse_args(argv)
+    if not args.listen:
+        parser.print_help()
+        return
+
+    engine = create_db_engine()
+    listener = IngestEventListener(
+        engine, lambda events: print(f"📈 {datetime.now():%H:%M:%S} {len(events)} events, first: {events[0]}")
+    ).start()
+    print(f"📋 Listening for ingest events ({listener.mode}); Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        listener.stop()
+
+
+if __name__ == "__main__":
+    main()
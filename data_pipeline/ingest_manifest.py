@@ -0,0 +1,293 @@
+# Incremental, idempotent re-ingest support for the Data Squad's ETL.
+# The 'ingest_manifest' table remembers every loaded file by (path, size, mtime, content hash),
+# so a re-run only decodes files that are new or changed. Files are grouped into profiles by
+# (float_id, cycle): when a delayed-mode D*.nc file supersedes its real-time R*.nc twin, the
+# whole profile is replaced.
+#
+# New rows are always bulk-loaded into a staging table first and then published to
+# argo_profiles in a single transaction (delete replaced profiles + insert staged rows),
+# so readers see either the old data or the new data, never an empty or half-loaded table.
+# The same transaction bumps the data generation, which invalidates cached query results
+# (see result_cache.py), recomputes the float_summary rows of every float the load touched
+# (see float_summary.py) along with the archive counters behind /api/stats (archive_stats.py),
+# and re-aggregates the profile_rollups of every profile it replaced
+# (see profile_rollups.py). Once it commits, the published profiles are announced as ingest
+# events for live /ws subscribers (see ingest_events.py), and the rows it removed and added are
+# applied to the gridded climatology, when one was built (see climatology.py).
+
+import os
+import re
+import hashlib
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, Float, Text, DateTime
+from sqlalchemy import text
+
+from data_pipeline.bulk_loader import profiles_table, TABLE_NAME
+from data_pipeline.profile_extractor import PROFILE_COLUMNS
+from data_pipeline.result_cache import ensure_generation_table, bump_generation, read_generation
+from data_pipeline.float_summary import ensure_float_summary_table
+from data_pipeline.archive_stats import ensure_archive_stats_table, refresh_summary_and_stats
+from data_pipeline.profile_rollups import ensure_profile_rollups_table, refresh_profile_rollups
+from data_pipeline.schema import ensure_partitions_for
+from data_pipeline.ingest_events import IngestEventSink, staged_profile_events
+from data_pipeline.climatology import ClimatologyUpdate, build_climatology
+
+MANIFEST_TABLE = 'ingest_manifest'
+STAGING_TABLE = 'argo_profiles_staging'
+
+# e.g. R1902672_001.nc, D1902672_001D.nc (trailing D = descending profile)
+PROFILE_FILENAME = re.compile(r'^([RD])(\d+)_(\d+)(D?)\.nc$')
+# Parquet files of the columnar cache live under .../float_id=<wmo>/...
+CACHE_FLOAT_DIR = re.compile(r'float_id=(\d+)')
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def manifest_table(metadata=None):
+    return Table(
+        MANIFEST_TABLE, metadata if metadata is not None else MetaData(),
+        Column('path', Text, primary_key=True),
+        Column('size', BigInteger),
+        Column('mtime', Float),
+        Column('content_hash', Text),
+        Column('float_id', BigInteger),
+        Column('cycle_number', Integer),
+        Column('data_mode', Text),
+        Column('row_count', Integer),
+        Column('loaded_at', DateTime),
+    )
+
+
+def ensure_manifest_table(engine):
+    metadata = MetaData()
+    manifest_table(metadata)
+    metadata.create_all(engine, checkfirst=True)
+
+
+def parse_profile_filename(file_path):
+    """Returns (data_mode, float_id, cycle, direction) for an R/D profile file, or None."""
+    match = PROFILE_FILENAME.match(os.path.basename(file_path))
+    if not match:
+        return None
+    data_mode, float_id, cycle, direction = match.groups()
+    return data_mode, int(float_id), int(cycle), direction or 'A'
+
+
+def file_content_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def preferred_files(file_paths):
+    """
+    Picks one file per (float_id, cycle, direction), preferring delayed mode (D) over
+    real-time (R). Returns {(float_id, cycle): [paths]} grouped by profile.
+    """
+    chosen = {}
+    for file_path in file_paths:
+        parsed = parse_profile_filename(file_path)
+        if parsed is None:
+            continue
+        data_mode, float_id, cycle, direction = parsed
+        key = (float_id, cycle, direction)
+        current = chosen.get(key)
+        if current is None or (data_mode == 'D' and parse_profile_filename(current)[0] == 'R'):
+            chosen[key] = file_path
+
+    groups = {}
+    for (float_id, cycle, _), file_path in sorted(chosen.items()):
+        groups.setdefault((float_id, cycle), []).append(file_path)
+    return groups
+
+
+def read_manifest(engine):
+    """{path: row dict} for every file in the manifest."""
+    with engine.connect() as connection:
+        result = connection.execute(text(f"SELECT * FROM {MANIFEST_TABLE}"))
+        return {row.path: row._asdict() for row in result}
+
+
+def describe_source_file(file_path):
+    """
+    (data_mode, float_id, cycle) for any source file; an aggregated <wmo>_prof.nc or a
+    columnar-cache Parquet file covers a whole float and has no mode or cycle.
+    """
+    parsed = parse_profile_filename(file_path)
+    if parsed is not None:
+        return parsed[0], parsed[1], parsed[2]
+    cache_match = CACHE_FLOAT_DIR.search(file_path)
+    if cache_match:
+        return None, int(cache_match.group(1)), None
+    return None, int(os.path.basename(file_path).split('_')[0]), None
+
+
+class LoadPlan:
+    """
+    What a run has to do. Work is organised in groups: (float_id, cycle) when loading
+    per-cycle files, or (float_id, None) when loading whole floats. A changed group is
+    reloaded as a unit and its old rows are deleted when the load is published.
+    """
+
+    def __init__(self, replace_all):
+        self.replace_all = replace_all
+        self.groups_to_load = []
+        # {group: manifest paths the group no longer has}, e.g. an R file superseded by its D twin.
+        self.stale_paths = {}
+        self.file_info = {}
+        self.unchanged_files = 0
+
+    @property
+    def files_to_load(self):
+        return [path for _, paths in self.groups_to_load for path in paths]
+
+    def describe(self):
+        if self.replace_all:
+            return f"full reload of {len(self.files_to_load)} files in {len(self.groups_to_load)} groups"
+        return (f"{len(self.files_to_load)} files in {len(self.groups_to_load)} new/changed groups, "
+                f"{self.unchanged_files} unchanged files skipped")
+
+
+def plan_load(engine, groups, incremental=True, partial=False):
+    """
+    Compares the files on disk with the manifest. `groups` maps a group key to the files
+    that make it up (see preferred_files). Size and mtime are checked first; the content
+    hash is only computed for new files or files whose stat changed.
+    An empty manifest always produces a full reload, unless `partial` says `groups` is only
+    part of the archive (e.g. freshly downloaded files): then only those groups are replaced.
+    """
+    manifest = read_manifest(engine) if incremental else {}
+    plan = LoadPlan(replace_all=not manifest and not partial)
+    manifest_by_float = {}
+    for path, entry in manifest.items():
+        manifest_by_float.setdefault(entry['float_id'], []).append(entry)
+
+    for group, paths in groups.items():
+        float_id, cycle = group
+        known_paths = {entry['path'] for entry in manifest_by_float.get(float_id, [])
+                       if cycle is None or entry['cycle_number'] == cycle}
+        group_changed = set(paths) != known_paths
+        group_info = {}
+        for file_path in paths:
+            stat = os.stat(file_path)
+            entry = manifest.get(file_path)
+            info = {'size': stat.st_size, 'mtime': stat.st_mtime}
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                info['content_hash'] = entry['content_hash']
+            else:
+                info['content_hash'] = file_content_hash(file_path)
+                if not entry or entry['content_hash'] != info['content_hash']:
+                    group_changed = True
+            group_info[file_path] = info
+
+        if plan.replace_all or group_changed:
+            plan.groups_to_load.append((group, paths))
+            plan.file_info.update(group_info)
+            plan.stale_paths[group] = sorted(known_paths - set(paths))
+        else:
+            plan.unchanged_files += len(paths)
+    return plan
+
+
+def create_staging_table(engine):
+    """(Re)creates an empty staging table with the argo_profiles layout."""
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    profiles_table(name=STAGING_TABLE, staging=True).create(engine)
+
+
+def delete_groups(connection, table, groups):
+    """Deletes the rows of `groups` ((float_id, cycle) pairs; cycle None = the whole float) from `table`."""
+    cycles = [{'float_id': f, 'cycle_number': c} for f, c in groups if c is not None]
+    floats = [{'float_id': f} for f, c in groups if c is None]
+    if cycles:
+        connection.execute(text(
+            f"DELETE FROM {table} WHERE float_id = :float_id AND cycle_number = :cycle_number"
+        ), cycles)
+    if floats:
+        connection.execute(text(f"DELETE FROM {table} WHERE float_id = :float_id"), floats)
+
+
+def publish_staged_load(engine, plan, row_counts, failed_groups=()):
+    """
+    Atomically moves the staged rows into argo_profiles and records the loaded files
+    in the manifest. `row_counts` maps each loaded path to the rows it produced. Groups in
+    `failed_groups` are left alone: their current rows and manifest entries stay (so the next
+    run retries them) and whatever they staged is dropped. When every group failed, nothing
+    is published.
+    Publishing bumps the data generation, so cached results of older data stop being served,
+    and refreshes the float_summary rows, archive counters and profile_rollups of the floats and
+    profiles it touched. The published profiles are announced as ingest events (a full reload as
+    a single reload event) and applied to the climatology grids, if any (a full reload rebuilds them).
+    """
+    column_list = ", ".join(PROFILE_COLUMNS)
+    now = datetime.now()
+    failed_groups = set(failed_groups)
+    loaded = [(group, paths) for group, paths in plan.groups_to_load if group not in failed_groups]
+    if not loaded:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+        print(f"⚠️ All {len(plan.groups_to_load)} groups failed to load; argo_profiles was left unchanged.")
+        return
+    manifest_rows = []
+    for group, paths in loaded:
+        for file_path in paths:
+            data_mode, float_id, cycle = describe_source_file(file_path)
+            manifest_rows.append({
+                'path': file_path,
+                **plan.file_info[file_path],
+                'float_id': float_id,
+                'cycle_number': cycle,
+                'data_mode': data_mode,
+                'row_count': row_counts.get(file_path, 0),
+                'loaded_at': now,
+            })
+
+    ensure_generation_table(engine)
+    ensure_float_summary_table(engine)
+    ensure_archive_stats_table(engine)
+    ensure_profile_rollups_table(engine)
+    events = IngestEventSink(engine)
+    climatology = ClimatologyUpdate()
+    with engine.begin() as connection:
+        if plan.replace_all:
+            connection.execute(text(f"DELETE FROM {TABLE_NAME}"))
+            connection.execute(text(f"DELETE FROM {MANIFEST_TABLE}"))
+        else:
+            climatology.removed(connection, [group for group, _ in loaded])
+            delete_groups(connection, TABLE_NAME, [group for group, _ in loaded])
+            stale = [{'path': p} for group, paths in loaded for p in plan.stale_paths.get(group, []) + paths]
+            if stale:
+                connection.execute(text(f"DELETE FROM {MANIFEST_TABLE} WHERE path = :path"), stale)
+        # A group that failed part way (one of its files) may have staged some rows.
+        delete_groups(connection, STAGING_TABLE, failed_groups)
+
+        # A monthly-partitioned argo_profiles needs the staged months to exist first.
+        ensure_partitions_for(connection, STAGING_TABLE)
+        connection.execute(text(
+            f"INSERT INTO {TABLE_NAME} ({column_list}) SELECT {column_list} FROM {STAGING_TABLE}"
+        ))
+        if manifest_rows:
+            connection.execute(manifest_table().insert(), manifest_rows)
+        if events.mode != "off":
+            events.stage(connection, [{"reload": True}] if plan.replace_all
+                         else staged_profile_events(connection, STAGING_TABLE))
+        if not plan.replace_all:
+            climatology.staged(connection, STAGING_TABLE)
+        connection.execute(text(f"DROP TABLE {STAGING_TABLE}"))
+        if plan.replace_all:
+            refresh_summary_and_stats(connection)
+            refresh_profile_rollups(connection)
+        else:
+            refresh_summary_and_stats(connection, {f for (f, _), _ in loaded})
+            refresh_profile_rollups(connection, [group for group, _ in loaded])
+        bump_generation(connection)
+        generation = read_generation(connection)
+    events.commit()
+    if climatology.enabled:
+        if plan.replace_all:
+            build_climatology(engine, climatology.path, climatology.delta.spec)
+        else:
+            climatology.commit(generation)
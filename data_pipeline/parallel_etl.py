@@ -0,0 +1,160 @@
+# Parallel ingest engine for the Data Squad's ETL.
+# A process pool decodes NetCDF files into columnar batches while a single loader
+# (running in the parent process) writes them to the database. Results are consumed
+# in input order, so the load order is deterministic regardless of worker timing.
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from data_pipeline.profile_extractor import extract_profile_columns, SkipFile
+from data_pipeline.bulk_loader import BulkLoadError
+
+
+class IngestStats:
+    """Running counters for an ingest run, plus a throughput summary."""
+
+    def __init__(self):
+        self.files_loaded = 0
+        self.files_skipped = 0
+        self.files_failed = 0
+        self.rows_loaded = 0
+        self.errors = []
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    @property
+    def files_seen(self):
+        return self.files_loaded + self.files_skipped + self.files_failed
+
+    @property
+    def elapsed(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+        return self
+
+    def summary(self):
+        return (
+            f"{self.files_seen} files ({self.files_loaded} loaded, {self.files_skipped} skipped, "
+            f"{self.files_failed} failed), {self.rows_loaded} rows in {self.elapsed:.1f}s | "
+            f"{self.files_seen / self.elapsed:.1f} files/sec, {self.rows_loaded / self.elapsed:.0f} rows/sec"
+        )
+
+
+def decode_file(file_path, extractor=extract_profile_columns):
+    """
+    Worker entry point. Never raises: every outcome is returned as
+    (file_path, columns, status, message) so a bad file cannot take down a worker.
+    """
+    try:
+        return file_path, extractor(file_path), 'ok', None
+    except SkipFile as e:
+        return file_path, None, 'skipped', str(e)
+    except Exception as e:
+        return file_path, None, 'failed', f"{type(e).__name__}: {e}"
+
+
+def resolve_worker_count(workers):
+    """0 or a negative number means 'use every core'."""
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def iter_decoded(file_paths, workers=1, prefetch=4, extractor=extract_profile_columns):
+    """
+    Yields decode results in the same order as `file_paths`.
+    With workers == 1 everything runs in-process; otherwise at most
+    `workers * prefetch` files are in flight, which bounds memory on large archives.
+    """
+    workers = resolve_worker_count(workers)
+    if workers == 1:
+        for file_path in file_paths:
+            yield decode_file(file_path, extractor)
+        return
+
+    max_in_flight = workers * max(prefetch, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        paths = iter(file_paths)
+        for file_path in paths:
+            pending.append(pool.submit(decode_file, file_path, extractor))
+            if len(pending) >= max_in_flight:
+                break
+        while pending:
+            yield pending.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(pool.submit(decode_file, next_path, extractor))
+
+
+def record_failed_batch(stats, error, file_path=None):
+    """
+    A bulk write failed (BulkLoadError): every file whose rows it held failed, including the
+    ones already counted as loaded when they were queued. `file_path` is the file being loaded
+    when it happened, if any (not counted yet).
+    """
+    failed = [file_path] if file_path is not None else []
+    for task, rows in error.batches:
+        if task is None or task == file_path:
+            continue
+        stats.files_loaded -= 1
+        stats.rows_loaded -= rows
+        failed.append(task)
+    for task in failed:
+        stats.files_failed += 1
+        stats.errors.append((task, f"load: {error}"))
+        print(f"🔴 ERROR: Failed to load {os.path.basename(task)}. Reason: {error}")
+
+
+def run_ingest(file_paths, load_batch, workers=1, prefetch=4, extractor=extract_profile_columns, verbose=True,
+               flush=None):
+    """
+    Decodes `file_paths` (in parallel when workers != 1) and passes each non-empty
+    result to `load_batch(file_path, columns)`, which must return the number of rows written.
+    `flush` runs once every file was handed over (e.g. BulkLoader.flush for the last partial
+    batch). A BulkLoadError from either fails every file of the lost batch, so give the loader
+    each file path as its tag.
+    `extractor` must be a module-level function so worker processes can import it.
+    Returns an IngestStats with files/sec and rows/sec figures.
+    """
+    stats = IngestStats()
+    for file_path, columns, status, message in iter_decoded(file_paths, workers, prefetch, extractor):
+        filename = os.path.basename(file_path)
+        if status == 'skipped':
+            stats.files_skipped += 1
+            if verbose:
+                print(f"🟡 INFO: Skipping {filename}: {message}.")
+            continue
+        if status == 'failed':
+            stats.files_failed += 1
+            stats.errors.append((file_path, message))
+            print(f"🔴 ERROR: Failed to process file {file_path}. Reason: {message}")
+            continue
+
+        try:
+            rows_loaded = load_batch(file_path, columns)
+        except BulkLoadError as e:
+            record_failed_batch(stats, e, file_path)
+            continue
+        except Exception as e:
+            stats.files_failed += 1
+            stats.errors.append((file_path, f"load: {e}"))
+            print(f"🔴 ERROR: Failed to load {filename}. Reason: {e}")
+            continue
+
+        stats.files_loaded += 1
+        stats.rows_loaded += rows_loaded
+        if verbose:
+            print(f"✅ {filename}: loaded {rows_loaded} rows.")
+
+    if flush is not None:
+        try:
+            flush()
+        except BulkLoadError as e:
+            record_failed_batch(stats, e)
+    return stats.finish()
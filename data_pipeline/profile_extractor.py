@@ -0,0 +1,203 @@
+# Decoding helpers for the Data Squad's ETL.
+# Turns an ARGO profile NetCDF file into a "columnar batch": a plain dict
+# mapping each argo_profiles column to a contiguous numpy array. Batches are cheap
+# to pickle, so they can be produced in worker processes and handed to a single loader.
+#
+# Extraction is vectorized: every variable is read once as an N_PROF x N_LEVELS grid,
+# per-profile values (JULD, LATITUDE, LONGITUDE, ...) are broadcast across the levels,
+# and a single boolean mask drops missing measurements. This works the same for a
+# single-cycle R/D file (N_PROF = 1) and for a multi-profile *_prof.nc file.
+
+import os
+import xarray as xr
+import numpy as np
+
+# Columns produced for every batch, in load order.
+PROFILE_COLUMNS = [
+    'platform_number', 'float_id', 'cycle_number', 'profile_date', 'latitude', 'longitude',
+    'pressure', 'temperature', 'salinity'
+]
+
+# --- Smart Attribute Selection ---
+POTENTIAL_NAMES = {
+    'profile_date': ['juld', 'JULD'], 'latitude': ['latitude', 'LATITUDE'],
+    'longitude': ['longitude', 'LONGITUDE'], 'pressure': ['pres_adjusted', 'PRES_ADJUSTED'],
+    'temperature': ['temp_adjusted', 'TEMP_ADJUSTED'], 'salinity': ['psal_adjusted', 'PSAL_ADJUSTED']
+}
+OPTIONAL_NAMES = {
+    'platform_number': ['platform_number', 'PLATFORM_NUMBER'],
+    'cycle_number': ['cycle_number', 'CYCLE_NUMBER'],
+    'direction': ['direction', 'DIRECTION'],
+}
+
+# Per-level QC flags, only decoded when a caller asks for them (argo_profiles does not store them).
+QC_NAMES = {
+    'pressure_qc': ['pres_adjusted_qc', 'PRES_ADJUSTED_QC'],
+    'temperature_qc': ['temp_adjusted_qc', 'TEMP_ADJUSTED_QC'],
+    'salinity_qc': ['psal_adjusted_qc', 'PSAL_ADJUSTED_QC'],
+}
+QC_COLUMNS = list(QC_NAMES)
+MISSING_QC = -1
+
+# ARGO fill values are 99999 (measurements) and 999999 (JULD). xarray normally masks them
+# from _FillValue, but files written without the attribute still carry the raw sentinel.
+FILL_VALUE_THRESHOLD = 99999.0
+
+# JULD is "days since 1950-01-01 00:00:00 UTC" with a resolution of ~1 second.
+JULD_EPOCH = np.datetime64('1950-01-01T00:00:00', 's')
+SECONDS_PER_DAY = 86_400
+
+
+class SkipFile(Exception):
+    """Raised when a file is readable but holds nothing worth loading."""
+
+
+def float_id_from_filename(file_path):
+    """Derive the WMO float id from a profile file name (e.g. D1902672_001.nc -> 1902672)."""
+    return int(os.path.basename(file_path).split('_')[0].replace('D', '').replace('R', ''))
+
+
+def batch_length(columns):
+    """Number of rows in a columnar batch."""
+    return len(columns['float_id']) if columns else 0
+
+
+def find_variable(ds, candidates):
+    """Returns the first of `candidates` present in the dataset, or None."""
+    for name in candidates:
+        if name in ds.variables:
+            return name
+    return None
+
+
+def as_float_array(values):
+    """Float copy of a variable with fill values turned into NaN."""
+    array = np.asarray(values, dtype=np.float64)
+    array[np.abs(array) >= FILL_VALUE_THRESHOLD] = np.nan
+    return array
+
+
+def juld_to_datetime(juld):
+    """Converts JULD days (NaN for missing) to datetime64[s] (NaT for missing)."""
+    valid = np.isfinite(juld)
+    seconds = np.rint(np.where(valid, juld * SECONDS_PER_DAY, 0)).astype(np.int64)
+    dates = JULD_EPOCH + seconds.astype('timedelta64[s]')
+    dates[~valid] = np.datetime64('NaT')
+    return dates
+
+
+def decode_platform_numbers(values, n_prof, fallback):
+    """Per-profile WMO ids as stripped strings (char arrays come back as bytes)."""
+    if values is None:
+        return np.full(n_prof, str(fallback), dtype=object)
+    flat = np.asarray(values).reshape(-1)
+    if flat.size != n_prof:
+        flat = np.resize(flat, n_prof)
+    decoded = [v.decode('ascii', 'ignore') if isinstance(v, bytes) else str(v) for v in flat]
+    return np.array([v.strip() or str(fallback) for v in decoded], dtype=object)
+
+
+def decode_char_values(values, n_prof, default):
+    """Per-profile single-character flags (DATA_MODE, DIRECTION) as plain strings."""
+    if values is None:
+        return np.full(n_prof, default, dtype=object)
+    flat = np.resize(np.asarray(values).reshape(-1), n_prof)
+    decoded = [v.decode('ascii', 'ignore') if isinstance(v, bytes) else str(v) for v in flat]
+    return np.array([v.strip() or default for v in decoded], dtype=object)
+
+
+def qc_to_int(values, shape):
+    """Character QC flags ('0'..'9') as int8 codes, MISSING_QC for blanks and fill values."""
+    if values is None:
+        return np.full(shape, MISSING_QC, dtype=np.int8)
+    chars = np.asarray(values, dtype='S1').reshape(shape)
+    codes = chars.view(np.uint8).astype(np.int16) - ord('0')
+    codes[(codes < 0) | (codes > 9)] = MISSING_QC
+    return codes.astype(np.int8)
+
+
+def platform_to_float_ids(platform_numbers, fallback):
+    """Integer float ids from the platform numbers, using the file-name id when one is unparseable."""
+    float_ids = np.empty(len(platform_numbers), dtype=np.int64)
+    for i, value in enumerate(platform_numbers):
+        float_ids[i] = int(value) if value.isdigit() else fallback
+    return float_ids
+
+
+def extract_profile_columns(file_path, exclude_profiles=None, include_qc=False):
+    """
+    Decodes a NetCDF profile file (single- or multi-profile) into a columnar batch.
+    Raises SkipFile when the file has no usable data and lets any other
+    decoding error propagate to the caller.
+    """
+    with xr.open_dataset(file_path, decode_times=False) as ds:
+        return extract_dataset_columns(ds, file_path, exclude_profiles, include_qc)
+
+
+def extract_dataset_columns(ds, file_path, exclude_profiles=None, include_qc=False):
+    """
+    Same as extract_profile_columns, for a dataset the caller already opened.
+    `exclude_profiles` is an optional set of (cycle_number, direction) pairs to leave out,
+    used when some cycles of an aggregated *_prof.nc file are taken from per-cycle files.
+    With `include_qc` the batch also carries the QC_COLUMNS as int8 codes.
+    """
+    file_float_id = float_id_from_filename(file_path)
+
+    names = {clean: find_variable(ds, ugly) for clean, ugly in POTENTIAL_NAMES.items()}
+    if any(name is None for name in names.values()):
+        raise KeyError("Could not find all required variables.")
+
+    # Load each variable exactly once.
+    pressure = np.atleast_2d(as_float_array(ds[names['pressure']].values))
+    temperature = np.atleast_2d(as_float_array(ds[names['temperature']].values))
+    salinity = np.atleast_2d(as_float_array(ds[names['salinity']].values))
+    juld = np.atleast_1d(as_float_array(ds[names['profile_date']].values))
+    latitude = np.atleast_1d(as_float_array(ds[names['latitude']].values))
+    longitude = np.atleast_1d(as_float_array(ds[names['longitude']].values))
+
+    n_prof, n_levels = pressure.shape
+    platform_var = find_variable(ds, OPTIONAL_NAMES['platform_number'])
+    cycle_var = find_variable(ds, OPTIONAL_NAMES['cycle_number'])
+    platform_numbers = decode_platform_numbers(
+        ds[platform_var].values if platform_var else None, n_prof, file_float_id)
+    cycles = (np.atleast_1d(as_float_array(ds[cycle_var].values)) if cycle_var
+              else np.full(n_prof, np.nan))
+    direction_var = find_variable(ds, OPTIONAL_NAMES['direction'])
+    directions = decode_char_values(ds[direction_var].values if direction_var else None, n_prof, 'A')
+    qc_flags = {}
+    if include_qc:
+        for clean_name, ugly_names in QC_NAMES.items():
+            qc_var = find_variable(ds, ugly_names)
+            qc_flags[clean_name] = qc_to_int(ds[qc_var].values if qc_var else None, (n_prof, n_levels))
+
+    if np.isnan(temperature).all() or np.isnan(salinity).all():
+        raise SkipFile("all NaN values in TEMP or PSAL")
+
+    # A level is kept when it has a depth and both primary measurements.
+    mask = np.isfinite(pressure) & np.isfinite(temperature) & np.isfinite(salinity)
+
+    # -1 marks a profile without a usable CYCLE_NUMBER.
+    cycle_numbers = np.where(np.isfinite(cycles), cycles, -1).astype(np.int32)
+    if exclude_profiles:
+        excluded = np.array([(int(c), d) in exclude_profiles for c, d in zip(cycle_numbers, directions)])
+        mask &= ~excluded[:, None]
+    if not mask.any():
+        raise SkipFile("no valid data points found")
+
+    # Row index of every kept level -> gathers per-profile values without materializing the full grid.
+    profile_index = np.broadcast_to(np.arange(n_prof)[:, None], (n_prof, n_levels))[mask]
+
+    columns = {
+        'platform_number': platform_numbers[profile_index],
+        'float_id': platform_to_float_ids(platform_numbers, file_float_id)[profile_index],
+        'cycle_number': cycle_numbers[profile_index],
+        'profile_date': juld_to_datetime(juld)[profile_index],
+        'latitude': latitude[profile_index],
+        'longitude': longitude[profile_index],
+        'pressure': pressure[mask].astype(np.float32),
+        'temperature': temperature[mask].astype(np.float32),
+        'salinity': salinity[mask].astype(np.float32),
+    }
+    for clean_name, codes in qc_flags.items():
+        columns[clean_name] = codes[mask]
+    return columns
@@ -0,0 +1,199 @@
+# Pre-aggregated rollups of argo_profiles behind the bucketed timeseries (Data Squad).
+# One row per float x profile (cycle and date) x standard depth bin:
+#
+#   profile_rollups  float_id, cycle_number, profile_date, depth_bin, levels, and for temperature
+#                    and salinity the sum, count, min and max of the levels in the bin
+#
+# Sums and counts rather than means, so any coarser bucket (day, week, month, several depth bins)
+# is an exact combination of rollup rows: mean = SUM(sum) / SUM(count). Depth bins follow the
+# standard levels in DEPTH_BIN_EDGES (dbar); bin i holds pressures in [edge i, edge i+1).
+#
+# The ETL refreshes it incrementally: publish_staged_load deletes and re-aggregates exactly the
+# (float, cycle) profiles a load replaced, in the same transaction as the data, so the rollups
+# are never out of step with argo_profiles.
+#
+# Usage: python -m data_pipeline.profile_rollups --rebuild    builds it for an existing database
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Index, Integer, SmallInteger, BigInteger, Float, DateTime
+from sqlalchemy import text, bindparam
+
+from data_pipeline.bulk_loader import TABLE_NAME
+
+ROLLUP_TABLE = 'profile_rollups'
+ROLLUP_VARIABLES = ('temperature', 'salinity')
+# Standard depth levels (dbar); the last bin is everything deeper than the last edge.
+DEPTH_BIN_EDGES = (0, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 700, 800, 900,
+                   1000, 1200, 1400, 1600, 1800, 2000, 2500, 3000, 4000, 6000)
+# Timeseries buckets: 'cycle' is one point per profile, the rest are calendar periods.
+ROLLUP_BUCKETS = ('cycle', 'day', 'week', 'month')
+# Floats refreshed per statement when a load replaces whole floats.
+REFRESH_CHUNK = 500
+
+
+def profile_rollups_table(metadata=None):
+    stats = [Column(f'{variable}_{stat}', Integer if stat == 'count' else Float)
+             for variable in ROLLUP_VARIABLES for stat in ('sum', 'count', 'min', 'max')]
+    return Table(
+        ROLLUP_TABLE, metadata if metadata is not None else MetaData(),
+        Column('float_id', BigInteger, nullable=False),
+        Column('cycle_number', Integer),
+        Column('profile_date', DateTime, nullable=False),
+        Column('depth_bin', SmallInteger, nullable=False),
+        Column('levels', Integer),
+        *stats,
+        Index('ix_profile_rollups_float_date', 'float_id', 'profile_date', 'depth_bin'),
+        Index('ix_profile_rollups_float_cycle', 'float_id', 'cycle_number'),
+    )
+
+
+def ensure_profile_rollups_table(engine):
+    metadata = MetaData()
+    profile_rollups_table(metadata)
+    metadata.create_all(engine, checkfirst=True)
+
+
+def depth_bin_sql(column='pressure'):
+    """CASE expression mapping `column` (dbar) to its DEPTH_BIN_EDGES bin."""
+    cases = " ".join(f"WHEN {column} < {edge} THEN {i}" for i, edge in enumerate(DEPTH_BIN_EDGES[1:]))
+    return f"CASE {cases} ELSE {len(DEPTH_BIN_EDGES) - 1} END"
+
+
+def depth_bin_bounds(depth_bin):
+    """(lower edge, exclusive upper edge or None for the last bin) of a depth bin."""
+    upper = DEPTH_BIN_EDGES[depth_bin + 1] if depth_bin + 1 < len(DEPTH_BIN_EDGES) else None
+    return DEPTH_BIN_EDGES[depth_bin], upper
+
+
+def depth_bins_for(depth_min, depth_max):
+    """
+    (first bin, last bin, covered min, covered max) of the bins overlapping [depth_min, depth_max).
+    The covered range is snapped outwards to bin edges; covered max is None for the open last bin.
+    """
+    first = max(int(np.searchsorted(DEPTH_BIN_EDGES, depth_min, side='right')) - 1, 0)
+    last = max(int(np.searchsorted(DEPTH_BIN_EDGES, depth_max, side='left')) - 1, first)
+    return first, last, depth_bin_bounds(first)[0], depth_bin_bounds(last)[1]
+
+
+def _insert_sql(where=""):
+    stats = ", ".join(f"SUM({v}), COUNT({v}), MIN({v}), MAX({v})" for v in ROLLUP_VARIABLES)
+    columns = ", ".join(f"{v}_{stat}" for v in ROLLUP_VARIABLES for stat in ('sum', 'count', 'min', 'max'))
+    return f"""
+        INSERT INTO {ROLLUP_TABLE} (float_id, cycle_number, profile_date, depth_bin, levels, {columns})
+        SELECT float_id, cycle_number, profile_date, {depth_bin_sql()} AS depth_bin, COUNT(*), {stats}
+        FROM {TABLE_NAME}
+        WHERE profile_date IS NOT NULL AND pressure IS NOT NULL {where}
+        GROUP BY float_id, cycle_number, profile_date, {depth_bin_sql()}
+    """
+
+
+def refresh_profile_rollups(connection, groups=None):
+    """
+    Re-aggregates the rollups of `groups` inside the caller's transaction: (float_id, cycle_number)
+    pairs, where a None cycle stands for the whole float; every float when `groups` is None.
+    Profiles that no longer have any rows simply lose their rollups. Returns the number of groups
+    refreshed (None for a full rebuild).
+    """
+    if groups is None:
+        connection.execute(text(f"DELETE FROM {ROLLUP_TABLE}"))
+        connection.execute(text(_insert_sql()))
+        return None
+
+    whole_floats = sorted({int(f) for f, c in groups if c is None})
+    skip = set(whole_floats)
+    cycles = sorted({(int(f), int(c)) for f, c in groups if c is not None and int(f) not in skip})
+
+    for start in range(0, len(whole_floats), REFRESH_CHUNK):
+        chunk = whole_floats[start:start + REFRESH_CHUNK]
+        for statement in (f"DELETE FROM {ROLLUP_TABLE} WHERE float_id IN :float_ids",
+                          _insert_sql("AND float_id IN :float_ids")):
+            connection.execute(text(statement).bindparams(bindparam('float_ids', expanding=True)),
+                               {'float_ids': chunk})
+    if cycles:
+        params = [{'float_id': f, 'cycle_number': c} for f, c in cycles]
+        connection.execute(text(
+            f"DELETE FROM {ROLLUP_TABLE} WHERE float_id = :float_id AND cycle_number = :cycle_number"
+        ), params)
+        connection.execute(text(_insert_sql("AND float_id = :float_id AND cycle_number = :cycle_number")), params)
+    return len(whole_floats) + len(cycles)
+
+
+def rebuild_profile_rollups(engine):
+    """Creates the table if needed and re-aggregates every float in one transaction; returns the rows."""
+    ensure_profile_rollups_table(engine)
+    with engine.begin() as connection:
+        refresh_profile_rollups(connection)
+        return connection.execute(text(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}")).scalar()
+
+
+def bucket_starts(dates, bucket):
+    """datetime64 start of each date's bucket; 'cycle' keeps the dates, weeks start on Monday."""
+    dates = np.asarray(dates, dtype='datetime64[s]')
+    if bucket == 'cycle':
+        return dates
+    if bucket == 'month':
+        return dates.astype('datetime64[M]').astype('datetime64[s]')
+    days = dates.astype('datetime64[D]')
+    if bucket == 'week':
+        # 1970-01-05, day 4 of the epoch, was a Monday.
+        days = days - (days.astype(np.int64) - 4) % 7
+    return days.astype('datetime64[s]')
+
+
+def combine_rollups(rows, bucket):
+    """
+    Rollup rows of one float and variable, one per profile -- (cycle_number, profile_date, sum,
+    count, min, max) with the depth bins already summed -- combined into one record per bucket:
+    timestamp (bucket start or profile date), mean, min, max, count (levels) and profiles.
+    Buckets without any value of the variable are left out.
+    """
+    rows = [row for row in rows if row[3]]
+    if not rows:
+        return []
+    _, dates, sums, counts, minimums, maximums = zip(*rows)
+    starts = bucket_starts(pd.to_datetime(list(dates)).to_numpy(), bucket)
+    keys, bucket_of = np.unique(starts, return_inverse=True)
+    size = len(keys)
+    total = np.bincount(bucket_of, weights=np.asarray(sums, dtype=np.float64), minlength=size)
+    count = np.bincount(bucket_of, weights=np.asarray(counts, dtype=np.float64), minlength=size)
+    profiles = np.bincount(bucket_of, minlength=size)
+    low = np.full(size, np.inf)
+    np.minimum.at(low, bucket_of, np.asarray(minimums, dtype=np.float64))
+    high = np.full(size, -np.inf)
+    np.maximum.at(high, bucket_of, np.asarray(maximums, dtype=np.float64))
+    return [
+        {'timestamp': timestamp, 'mean': mean, 'min': minimum, 'max': maximum, 'count': int(n), 'profiles': int(p)}
+        for timestamp, mean, minimum, maximum, n, p in zip(
+            np.datetime_as_string(keys, unit='s').tolist(), (total / count).tolist(), low.tolist(),
+            high.tolist(), count.tolist(), profiles.tolist())
+    ]
+
+
+def main(argv=None):
+    from data_pipeline.build_database import create_db_engine
+
+    parser = argparse.ArgumentParser(description="Build or refresh the profile_rollups table.")
+    parser.add_argument('--rebuild', action='store_true', help="Re-aggregate every float from argo_profiles.")
+    parser.add_argument('--float-id', type=int, action='append', help="Re-aggregate only these floats.")
+    args = parser.parse_args(argv)
+
+    engine = create_db_engine()
+    ensure_profile_rollups_table(engine)
+    if args.float_id:
+        with engine.begin() as connection:
+            refresh_profile_rollups(connection, [(f, None) for f in args.float_id])
+            written = connection.execute(text(f"SELECT COUNT(*) FROM {ROLLUP_TABLE} WHERE float_id IN :ids")
+                                         .bindparams(bindparam('ids', expanding=True)), {'ids': args.float_id}).scalar()
+    elif args.rebuild:
+        written = rebuild_profile_rollups(engine)
+    else:
+        parser.print_help()
+        return
+    print(f"✅ {ROLLUP_TABLE}: {written} rollup rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# Vectorized data-quality engine for the Data Squad.
+# Computes per-profile quality metrics with numpy on only the variables that matter
+# (adjusted PRES/TEMP/PSAL and their QC flags), instead of materializing the whole
+# dataset into pandas. Results are persisted to two tables that /api/quality serves:
+#
+#   profile_quality  one row per (float_id, cycle_number, direction)
+#   float_quality    one row per float_id (level-weighted roll-up of its profiles)
+#
+# Metrics per profile:
+#   - NaN fraction of pressure, temperature and salinity
+#   - QC-flag distribution: fraction of levels flagged good (1, 2) and bad (3, 4)
+#   - constant-column checks (all valid values identical)
+#   - global range checks (Argo real-time QC test 6 limits)
+#   - pressure monotonicity over the valid levels
+#   - temperature/salinity quality = fraction of levels that are present, in range and not flagged bad
+
+from datetime import datetime
+import numpy as np
+import xarray as xr
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, Float, Text, Boolean, DateTime
+from sqlalchemy import text
+
+from data_pipeline.profile_extractor import (
+    POTENTIAL_NAMES, QC_NAMES, OPTIONAL_NAMES, find_variable, as_float_array, qc_to_int,
+    decode_char_values, float_id_from_filename, SkipFile
+)
+
+PROFILE_QUALITY_TABLE = 'profile_quality'
+FLOAT_QUALITY_TABLE = 'float_quality'
+
+# Argo global range test limits.
+VALID_RANGES = {
+    'pressure': (-5.0, 12000.0),
+    'temperature': (-2.5, 40.0),
+    'salinity': (2.0, 41.0),
+}
+GOOD_QC = (1, 2)
+BAD_QC = (3, 4)
+
+METRIC_COLUMNS = [
+    'float_id', 'cycle_number', 'direction', 'n_levels',
+    'pressure_nan_fraction', 'temperature_nan_fraction', 'salinity_nan_fraction',
+    'temperature_qc_good_fraction', 'temperature_qc_bad_fraction',
+    'salinity_qc_good_fraction', 'salinity_qc_bad_fraction',
+    'temperature_out_of_range', 'salinity_out_of_range', 'pressure_out_of_range',
+    'temperature_constant', 'salinity_constant', 'pressure_monotonic',
+    'temperature_quality', 'salinity_quality', 'overall_quality',
+]
+
+
+def profile_quality_table(metadata=None):
+    return Table(
+        PROFILE_QUALITY_TABLE, metadata if metadata is not None else MetaData(),
+        Column('float_id', BigInteger, nullable=False, index=True),
+        Column('cycle_number', Integer, nullable=False),
+        Column('direction', Text, nullable=False),
+        Column('n_levels', Integer),
+        Column('pressure_nan_fraction', Float),
+        Column('temperature_nan_fraction', Float),
+        Column('salinity_nan_fraction', Float),
+        Column('temperature_qc_good_fraction', Float),
+        Column('temperature_qc_bad_fraction', Float),
+        Column('salinity_qc_good_fraction', Float),
+        Column('salinity_qc_bad_fraction', Float),
+        Column('temperature_out_of_range', Integer),
+        Column('salinity_out_of_range', Integer),
+        Column('pressure_out_of_range', Integer),
+        Column('temperature_constant', Boolean),
+        Column('salinity_constant', Boolean),
+        Column('pressure_monotonic', Boolean),
+        Column('temperature_quality', Float),
+        Column('salinity_quality', Float),
+        Column('overall_quality', Float),
+        Column('computed_at', DateTime),
+    )
+
+
+def float_quality_table(metadata=None):
+    return Table(
+        FLOAT_QUALITY_TABLE, metadata if metadata is not None else MetaData(),
+        Column('float_id', BigInteger, primary_key=True),
+        Column('profiles', Integer),
+        Column('levels', BigInteger),
+        Column('overall_quality', Float),
+        Column('temperature_quality', Float),
+        Column('salinity_quality', Float),
+        Column('missing_data_fraction', Float),
+        Column('flagged_profiles', Integer),
+        Column('computed_at', DateTime),
+    )
+
+
+def ensure_quality_tables(engine):
+    metadata = MetaData()
+    profile_quality_table(metadata)
+    float_quality_table(metadata)
+    metadata.create_all(engine, checkfirst=True)
+
+
+def _fraction(count, total):
+    return np.divide(count, total, out=np.zeros(count.shape, dtype=np.float64), where=total > 0)
+
+
+def _is_constant(values, valid):
+    """True per profile when there are >= 2 valid values and they are all identical."""
+    filled_max = np.where(valid, values, -np.inf).max(axis=1)
+    filled_min = np.where(valid, values, np.inf).min(axis=1)
+    return (valid.sum(axis=1) >= 2) & (filled_max == filled_min)
+
+
+def _is_monotonic(pressure, valid):
+    """True per profile when pressure strictly increases over its valid levels."""
+    # Compact valid levels to the left, keeping their order, then compare neighbours.
+    order = np.argsort(~valid, axis=1, kind='stable')
+    compact = np.take_along_axis(np.where(valid, pressure, np.nan), order, axis=1)
+    diffs = np.diff(compact, axis=1)
+    both_valid = np.isfinite(diffs)
+    return ~(both_valid & (diffs <= 0)).any(axis=1)
+
+
+def compute_metrics(pressure, temperature, salinity, qc):
+    """
+    Metrics for an N_PROF x N_LEVELS block. `qc` maps 'pressure_qc' / 'temperature_qc' /
+    'salinity_qc' to int8 code arrays of the same shape. Returns {metric: array of N_PROF}.
+    """
+    levels = np.isfinite(pressure) | np.isfinite(temperature) | np.isfinite(salinity)
+    n_levels = levels.sum(axis=1)
+    metrics = {'n_levels': n_levels}
+
+    for name, values in [('pressure', pressure), ('temperature', temperature), ('salinity', salinity)]:
+        valid = np.isfinite(values)
+        metrics[f'{name}_nan_fraction'] = _fraction((levels & ~valid).sum(axis=1), n_levels)
+        low, high = VALID_RANGES[name]
+        out_of_range = valid & ((values < low) | (values > high))
+        metrics[f'{name}_out_of_range'] = out_of_range.sum(axis=1)
+
+        if name == 'pressure':
+            metrics['pressure_monotonic'] = _is_monotonic(values, valid)
+            continue
+
+        codes = qc[f'{name}_qc']
+        good = np.isin(codes, GOOD_QC) & valid
+        bad = np.isin(codes, BAD_QC) & valid
+        metrics[f'{name}_qc_good_fraction'] = _fraction(good.sum(axis=1), n_levels)
+        metrics[f'{name}_qc_bad_fraction'] = _fraction(bad.sum(axis=1), n_levels)
+        metrics[f'{name}_constant'] = _is_constant(values, valid)
+        usable = valid & ~out_of_range & ~bad
+        metrics[f'{name}_quality'] = _fraction(usable.sum(axis=1), n_levels)
+
+    metrics['overall_quality'] = (metrics['temperature_quality'] + metrics['salinity_quality']) / 2
+    return metrics
+
+
+def compute_dataset_metrics(ds, file_path):
+    """Per-profile metrics for an open dataset (single- or multi-profile). Reads only the needed variables."""
+    names = {clean: find_variable(ds, POTENTIAL_NAMES[clean]) for clean in ('pressure', 'temperature', 'salinity')}
+    if any(name is None for name in names.values()):
+        raise KeyError("File is missing one or more core measurement variables (temp, psal, pres).")
+
+    pressure = np.atleast_2d(as_float_array(ds[names['pressure']].values))
+    temperature = np.atleast_2d(as_float_array(ds[names['temperature']].values))
+    salinity = np.atleast_2d(as_float_array(ds[names['salinity']].values))
+    n_prof, n_levels = pressure.shape
+    if n_levels == 0:
+        raise SkipFile("File is empty; contains no data rows.")
+
+    qc = {}
+    for clean_name, ugly_names in QC_NAMES.items():
+        qc_var = find_variable(ds, ugly_names)
+        qc[clean_name] = qc_to_int(ds[qc_var].values if qc_var else None, (n_prof, n_levels))
+
+    cycle_var = find_variable(ds, OPTIONAL_NAMES['cycle_number'])
+    direction_var = find_variable(ds, OPTIONAL_NAMES['direction'])
+    cycles = np.atleast_1d(as_float_array(ds[cycle_var].values)) if cycle_var else np.full(n_prof, np.nan)
+
+    metrics = compute_metrics(pressure, temperature, salinity, qc)
+    metrics['float_id'] = np.full(n_prof, float_id_from_filename(file_path), dtype=np.int64)
+    metrics['cycle_number'] = np.where(np.isfinite(cycles), cycles, -1).astype(np.int32)
+    metrics['direction'] = decode_char_values(ds[direction_var].values if direction_var else None, n_prof, 'A')
+    return metrics
+
+
+def compute_file_metrics(file_path):
+    """Worker entry point: per-profile metrics for one NetCDF file."""
+    with xr.open_dataset(file_path, decode_times=False) as ds:
+        return compute_dataset_metrics(ds, file_path)
+
+
+def compute_row_metrics(columns):
+    """
+    Per-profile metrics for a long columnar batch (one row per level, e.g. read back from the
+    Parquet cache). Rows are scattered into an N_PROF x N_LEVELS grid keyed by
+    (float_id, cycle_number) and handed to compute_metrics.
+    """
+    float_ids = np.asarray(columns['float_id'], dtype=np.int64)
+    cycles = np.asarray(columns['cycle_number'], dtype=np.int64)
+    order = np.lexsort((cycles, float_ids))
+    keys = np.stack([float_ids[order], cycles[order]], axis=1)
+    unique_keys, starts, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+    profile = np.repeat(np.arange(len(unique_keys)), counts)
+    level = np.arange(len(order)) - np.repeat(starts, counts)
+    shape = (len(unique_keys), int(counts.max()))
+
+    def grid(values, fill, dtype):
+        out = np.full(shape, fill, dtype=dtype)
+        out[profile, level] = np.asarray(values)[order]
+        return out
+
+    measurements = {name: grid(columns[name], np.nan, np.float64) for name in VALID_RANGES}
+    qc = {}
+    for name in QC_NAMES:
+        qc[name] = grid(columns[name], -1, np.int8) if name in columns else np.full(shape, -1, dtype=np.int8)
+
+    metrics = compute_metrics(measurements['pressure'], measurements['temperature'], measurements['salinity'], qc)
+    metrics['float_id'] = unique_keys[:, 0]
+    metrics['cycle_number'] = unique_keys[:, 1].astype(np.int32)
+    metrics['direction'] = np.full(len(unique_keys), 'A', dtype=object)
+    return metrics
+
+
+def profile_issue(metrics, i):
+    """Human-readable reason a profile is flagged, or None if it looks valid."""
+    if metrics['n_levels'][i] == 0:
+        return "File is empty; contains no data rows."
+    if metrics['temperature_nan_fraction'][i] == 1 and metrics['salinity_nan_fraction'][i] == 1:
+        return "All temperature and salinity values are null (NaN)."
+    if metrics['temperature_constant'][i] and metrics['salinity_constant'][i]:
+        return "All measurement values are identical (e.g., all zeroes)."
+    if not metrics['pressure_monotonic'][i]:
+        return "Pressure is not monotonically increasing."
+    out_of_range = sum(int(metrics[f'{n}_out_of_range'][i]) for n in VALID_RANGES)
+    if out_of_range:
+        return f"{out_of_range} values outside the global valid range."
+    return None
+
+
+def merge_metrics(batches):
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in METRIC_COLUMNS}
+
+
+def store_metrics(engine, metrics, replace_floats=True):
+    """
+    Writes per-profile metrics and refreshes the per-float roll-up for every float they cover.
+    With replace_floats, all previous profile rows of those floats are replaced in the same
+    transaction, so the endpoint never sees a partial update.
+    """
+    ensure_quality_tables(engine)
+    now = datetime.now()
+    float_ids = sorted({int(f) for f in metrics['float_id']})
+    records = []
+    for i in range(len(metrics['float_id'])):
+        record = {}
+        for name in METRIC_COLUMNS:
+            value = metrics[name][i]
+            record[name] = value.item() if hasattr(value, 'item') else value
+        record['computed_at'] = now
+        records.append(record)
+
+    level_weight = "CAST(n_levels AS FLOAT)"
+    with engine.begin() as connection:
+        if replace_floats and float_ids:
+            connection.execute(text(f"DELETE FROM {PROFILE_QUALITY_TABLE} WHERE float_id = :float_id"),
+                               [{'float_id': f} for f in float_ids])
+        if records:
+            connection.execute(profile_quality_table().insert(), records)
+        if float_ids:
+            connection.execute(text(f"DELETE FROM {FLOAT_QUALITY_TABLE} WHERE float_id = :float_id"),
+                               [{'float_id': f} for f in float_ids])
+            connection.execute(text(f"""
+                INSERT INTO {FLOAT_QUALITY_TABLE}
+                    (float_id, profiles, levels, overall_quality, temperature_quality, salinity_quality,
+                     missing_data_fraction, flagged_profiles, computed_at)
+                SELECT float_id,
+                       COUNT(*),
+                       SUM(n_levels),
+                       SUM(overall_quality * {level_weight}) / NULLIF(SUM({level_weight}), 0),
+                       SUM(temperature_quality * {level_weight}) / NULLIF(SUM({level_weight}), 0),
+                       SUM(salinity_quality * {level_weight}) / NULLIF(SUM({level_weight}), 0),
+                       SUM((temperature_nan_fraction + salinity_nan_fraction) / 2 * {level_weight})
+                           / NULLIF(SUM({level_weight}), 0),
+                       SUM(CASE WHEN NOT pressure_monotonic OR (temperature_constant AND salinity_constant)
+                                  OR temperature_out_of_range + salinity_out_of_range > 0
+                                THEN 1 ELSE 0 END),
+                       :computed_at
+                FROM {PROFILE_QUALITY_TABLE}
+                WHERE float_id = :float_id
+                GROUP BY float_id
+            """), [{'float_id': f, 'computed_at': now} for f in float_ids])
+    return len(records)
+
+
+def fetch_float_quality(connectable, float_id):
+    """The stored roll-up for one float (primary-key lookup), or None if it was never computed.
+    `connectable` is an Engine or an open Connection."""
+    query = text(f"SELECT * FROM {FLOAT_QUALITY_TABLE} WHERE float_id = :float_id")
+    if hasattr(connectable, 'execute'):
+        row = connectable.execute(query, {'float_id': int(float_id)}).fetchone()
+    else:
+        with connectable.connect() as connection:
+            row = connection.execute(query, {'float_id': int(float_id)}).fetchone()
+    return row._asdict() if row is not None else None
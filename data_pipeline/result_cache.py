@@ -0,0 +1,219 @@
+# Query-result cache invalidated by ETL load generations (shared by the backend and the AI core).
+# argo_profiles only changes when the ETL publishes a load, so instead of guessing TTLs every
+# publish bumps a counter in the one-row 'data_generation' table, in the same transaction as
+# the data itself. Cached results are tagged with the generation they were read at and are only
+# served while that is still the current generation:
+#
+#   - key:      normalized SQL text (whitespace / case of keywords do not matter) + bound parameters
+#   - validity: entry generation == current generation; a new generation drops every entry
+#   - memory:   entries are sized (rows, strings, DataFrames) and evicted least-recently-used once
+#               RESULT_CACHE_MAX_BYTES is exceeded; single results over a quarter of it are never cached
+#
+# Readers learn the current generation by polling the table at most every
+# RESULT_CACHE_GENERATION_POLL seconds (default 1), so a finished load is visible within that
+# interval; 0 checks on every lookup.
+#
+# Usage: from code, ResultCache(generation_reader=...); build_database / ingest_manifest bump the generation.
+
+import os
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, DateTime
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+GENERATION_TABLE = 'data_generation'
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_GENERATION_POLL = float(os.getenv("RESULT_CACHE_GENERATION_POLL", "1.0"))
+
+# String literals and quoted identifiers are case-sensitive and kept as written.
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# --- Data generation (written by the ETL) ---
+
+def generation_table(metadata=None):
+    return Table(
+        GENERATION_TABLE, metadata if metadata is not None else MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('generation', BigInteger, nullable=False),
+        Column('updated_at', DateTime),
+    )
+
+
+def ensure_generation_table(engine):
+    metadata = MetaData()
+    generation_table(metadata)
+    metadata.create_all(engine, checkfirst=True)
+
+
+def bump_generation(connection):
+    """Advances the data generation; call inside the transaction that publishes the new data."""
+    updated = connection.execute(text(
+        f"UPDATE {GENERATION_TABLE} SET generation = generation + 1, updated_at = :now WHERE id = 1"
+    ), {'now': datetime.now()})
+    if updated.rowcount == 0:
+        connection.execute(generation_table().insert(), {'id': 1, 'generation': 1, 'updated_at': datetime.now()})
+
+
+def read_generation(connectable):
+    """Current data generation (0 before the first tracked load). Accepts an Engine or a Connection."""
+    query = text(f"SELECT generation FROM {GENERATION_TABLE} WHERE id = 1")
+    try:
+        if isinstance(connectable, Engine):
+            with connectable.connect() as connection:
+                value = connection.execute(query).scalar()
+        else:
+            value = connectable.execute(query).scalar()
+    except SQLAlchemyError:
+        # No table yet: nothing has been loaded through a tracked publish.
+        return 0
+    return int(value) if value is not None else 0
+
+
+# --- Cache ---
+
+def normalize_sql(sql):
+    """Collapses whitespace and lower-cases everything outside quotes."""
+    parts = _QUOTED.split(sql.strip().rstrip(';'))
+    return ''.join(part if i % 2 else _WHITESPACE.sub(' ', part).lower() for i, part in enumerate(parts)).strip()
+
+
+def cache_key(sql, params=None):
+    frozen = tuple(sorted((name, repr(value)) for name, value in (params or {}).items()))
+    return normalize_sql(sql), frozen
+
+
+def estimate_bytes(value, _depth=0):
+    """Approximate memory held by a cached result (rows, tuples, strings, numbers, DataFrames)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (str, bytes, int, float)) or value is None or _depth > 3:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k, _depth + 1) + estimate_bytes(v, _depth + 1)
+                                          for k, v in value.items())
+    if isinstance(value, (list, tuple)) or hasattr(value, '_mapping'):
+        items = tuple(value)
+        if not items:
+            return sys.getsizeof(value)
+        # Rows of one result have the same shape: size a sample and scale.
+        sample = items[:32]
+        per_item = sum(estimate_bytes(item, _depth + 1) for item in sample) / len(sample)
+        return sys.getsizeof(value) + int(per_item * len(items))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Thread-safe, byte-bounded LRU cache of query results, valid for one data generation.
+    `generation_reader()` (optional) returns the current generation; callers that read it
+    themselves (e.g. asynchronously) pass it to get()/put() and use generation_due().
+    """
+
+    MISS = object()
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, generation_reader=None,
+                 poll_seconds=RESULT_CACHE_GENERATION_POLL):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4
+        self.generation_reader = generation_reader
+        self.poll_seconds = poll_seconds
+        self.generation = None
+        self.entries = OrderedDict()     # key -> (value, bytes)
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "too_large": 0}
+        self._lock = threading.Lock()
+        self._checked_at = float('-inf')
+
+    # --- Generation ---
+
+    def generation_due(self):
+        return time.monotonic() - self._checked_at >= self.poll_seconds
+
+    def set_generation(self, generation):
+        """Records the current generation; entries from any other generation are dropped."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if generation != self.generation:
+                if self.entries:
+                    self.stats["invalidations"] += 1
+                self.entries.clear()
+                self.bytes = 0
+                self.generation = generation
+
+    def current_generation(self):
+        if self.generation_reader is not None and self.generation_due():
+            self.set_generation(self.generation_reader())
+        return self.generation
+
+    # --- Lookup / store ---
+
+    def get(self, sql, params=None, generation=None):
+        """The cached result, or ResultCache.MISS."""
+        generation = generation if generation is not None else self.current_generation()
+        key = cache_key(sql, params)
+        with self._lock:
+            entry = self.entries.get(key) if generation == self.generation else None
+            if entry is None:
+                self.stats["misses"] += 1
+                return self.MISS
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, sql, params, value, generation=None):
+        """Caches `value` if it was read at the current generation and fits the byte budget."""
+        generation = generation if generation is not None else self.generation
+        size = estimate_bytes(value)
+        key = cache_key(sql, params)
+        with self._lock:
+            if generation is None or generation != self.generation:
+                return
+            if size > self.max_entry_bytes:
+                self.stats["too_large"] += 1
+                return
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            self.stats["stores"] += 1
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.stats["evictions"] += 1
+
+    def get_or_run(self, sql, params, run):
+        """Synchronous read-through: returns the cached result or `run()`'s, caching it."""
+        generation = self.current_generation()
+        value = self.get(sql, params, generation)
+        if value is self.MISS:
+            value = run()
+            self.put(sql, params, value, generation)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def status(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "generation": self.generation,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+                **self.stats,
+            }
@@ -0,0 +1,336 @@
+# Physical schema of argo_profiles (Data Squad). This module owns its DDL; the ETL, the staging
+# table and the migration all build the table from here.
+#
+#   types       float32 (REAL) measurements and positions, smallint cycle numbers, int4 WMO ids:
+#               about half the row width of the float64/TEXT table to_sql used to create
+#   grid_cell   1-degree grid cell of the position, a stored generated column:
+#               floor(lat + 90) * 360 + floor(lon + 180) % 360, NULL without a position. Cells are
+#               latitude-major, so a bbox is one contiguous grid_cell range per latitude row (see bbox_grid_clause)
+#   indexes     B-tree (float_id, profile_date, pressure) for per-float profile / timeseries reads,
+#               BRIN on profile_date for date windows (a plain B-tree off PostgreSQL),
+#               B-tree on grid_cell for bbox queries
+#   partitions  optional monthly RANGE partitions on profile_date (PostgreSQL only), with a DEFAULT
+#               partition; publish_staged_load creates the months a load needs
+#
+# SQLite (the test stand-in) stores every REAL as 8 bytes, so only the indexes and the grid
+# column pay off there; the type savings are PostgreSQL's.
+#
+# Usage: python -m data_pipeline.schema --status
+#        python -m data_pipeline.schema --migrate [--partition monthly] [--keep-old]
+#   --migrate copies an existing argo_profiles into the managed layout, swaps the tables in one
+#   transaction and builds the indexes; --keep-old keeps the previous table as argo_profiles_legacy.
+
+import os
+import math
+import argparse
+from datetime import date
+
+from sqlalchemy import MetaData, Table, Column, Index, Computed, Integer, SmallInteger, REAL, Text, DateTime
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+TABLE_NAME = 'argo_profiles'
+MIGRATION_TABLE = 'argo_profiles_migrating'
+LEGACY_TABLE = 'argo_profiles_legacy'
+# "monthly" makes new databases partition argo_profiles (PostgreSQL only).
+PARTITIONING = os.getenv("ARGO_PARTITIONING", "none")
+GRID_COLUMNS = 360
+
+# NULL for rows without a position (SQLite's FLOOR is a Python function that fails on NULL);
+# latitude 90 goes into the top row, as grid_cell() and bbox_cell_ranges() put it.
+GRID_CELL_SQL = ("CASE WHEN latitude IS NULL OR longitude IS NULL THEN NULL ELSE "
+                 f"(CASE WHEN latitude >= 90 THEN 179 ELSE CAST(FLOOR(latitude + 90) AS INTEGER) END) * {GRID_COLUMNS} "
+                 f"+ CAST(FLOOR(longitude + 180) AS INTEGER) % {GRID_COLUMNS} END")
+
+
+def profile_indexes(table):
+    """The managed indexes of a profiles table (named after TABLE_NAME, whatever the table is called)."""
+    return [
+        Index(f'ix_{TABLE_NAME}_float_date_pressure', table.c.float_id, table.c.profile_date, table.c.pressure),
+        Index(f'ix_{TABLE_NAME}_profile_date_brin', table.c.profile_date, postgresql_using='brin'),
+        Index(f'ix_{TABLE_NAME}_grid_cell', table.c.grid_cell),
+    ]
+
+
+def profiles_table(metadata=None, name=TABLE_NAME, staging=False, indexes=True, partitioned=False):
+    """
+    The argo_profiles table. `staging=True` is the plain bulk-load target (no generated column,
+    no indexes); `indexes=False` leaves index creation to the caller (the migration builds them
+    after copying); `partitioned=True` declares monthly range partitioning on PostgreSQL.
+    """
+    columns = [
+        Column('platform_number', Text),
+        Column('float_id', Integer),            # WMO numbers are 7 digits
+        Column('cycle_number', SmallInteger),
+        Column('profile_date', DateTime),
+        Column('latitude', REAL),
+        Column('longitude', REAL),
+        Column('pressure', REAL),
+        Column('temperature', REAL),
+        Column('salinity', REAL),
+    ]
+    if not staging:
+        columns.append(Column('grid_cell', Integer, Computed(GRID_CELL_SQL, persisted=True)))
+    options = {'postgresql_partition_by': 'RANGE (profile_date)'} if partitioned else {}
+    table = Table(name, metadata if metadata is not None else MetaData(), *columns, **options)
+    if not staging and indexes:
+        profile_indexes(table)
+    return table
+
+
+# --- Inspection ---
+
+def is_partitioned(connectable, name=TABLE_NAME):
+    if connectable.dialect.name != 'postgresql':
+        return False
+    query = text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                 "WHERE c.relname = :name")
+    if isinstance(connectable, Engine):
+        with connectable.connect() as connection:
+            return connection.execute(query, {'name': name}).first() is not None
+    return connectable.execute(query, {'name': name}).first() is not None
+
+
+def describe_profiles_table(engine):
+    """What the current argo_profiles looks like: columns with types, indexes, managed or legacy."""
+    inspector = inspect(engine)
+    if not inspector.has_table(TABLE_NAME):
+        return None
+    columns = {col['name']: str(col['type']) for col in inspector.get_columns(TABLE_NAME)}
+    indexes = sorted(index['name'] for index in inspector.get_indexes(TABLE_NAME))
+    expected = {index.name for index in profile_indexes(profiles_table(indexes=False))}
+    return {
+        'columns': columns,
+        'indexes': indexes,
+        'managed': 'grid_cell' in columns and expected <= set(indexes),
+        'partitioned': is_partitioned(engine),
+    }
+
+
+# --- Creation ---
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_names(connection, name=TABLE_NAME):
+    return [row[0] for row in connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+    ), {'name': name})]
+
+
+def rename_partitions(connection, name, old_prefix, new_prefix):
+    """Partitions are named <table>_<yyyy_mm> / <table>_default; keeps that true across table renames."""
+    for partition in partition_names(connection, name):
+        if partition.startswith(old_prefix + '_'):
+            connection.execute(text(f"ALTER TABLE {partition} RENAME TO {new_prefix}{partition[len(old_prefix):]}"))
+
+
+def ensure_monthly_partitions(connection, first, last, name=TABLE_NAME):
+    """Creates the monthly partitions of `name` covering first..last (dates) that do not exist yet."""
+    existing = set(partition_names(connection, name))
+    created = 0
+    month = month_start(first)
+    while month <= last:
+        partition = f"{name}_{month:%Y_%m}"
+        if partition not in existing:
+            connection.execute(text(
+                f"CREATE TABLE {partition} PARTITION OF {name} "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+            ))
+            created += 1
+        month = next_month(month)
+    return created
+
+
+def ensure_partitions_for(connection, source_table):
+    """Before inserting `source_table`'s rows into a partitioned argo_profiles: creates their months."""
+    if not is_partitioned(connection):
+        return 0
+    first, last = connection.execute(text(f"SELECT MIN(profile_date), MAX(profile_date) FROM {source_table}")).one()
+    if first is None:
+        return 0
+    return ensure_monthly_partitions(connection, first, last)
+
+
+def create_profiles_table(engine, name=TABLE_NAME, partitioned=False, indexes=True):
+    metadata = MetaData()
+    table = profiles_table(metadata, name=name, indexes=indexes, partitioned=partitioned)
+    metadata.create_all(engine, checkfirst=True)
+    if partitioned:
+        with engine.begin() as connection:
+            connection.execute(text(f"CREATE TABLE IF NOT EXISTS {name}_default PARTITION OF {name} DEFAULT"))
+    return table
+
+
+def ensure_profiles_table(engine):
+    """
+    Creates argo_profiles in the managed layout if it does not exist yet, and adds any plain
+    column the ETL now writes that an older table is missing. An existing legacy table is
+    left as it is: migrating copies every row, so it is an explicit step (--migrate).
+    """
+    partitioned = PARTITIONING == 'monthly' and engine.dialect.name == 'postgresql'
+    if not inspect(engine).has_table(TABLE_NAME):
+        create_profiles_table(engine, partitioned=partitioned)
+        return
+
+    table = profiles_table(indexes=False)
+    existing = {col['name'] for col in inspect(engine).get_columns(TABLE_NAME)}
+    missing = [col for col in table.columns if col.name not in existing and col.computed is None]
+    if missing:
+        with engine.begin() as connection:
+            for col in missing:
+                col_type = col.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {col.name} {col_type}"))
+            if any(col.name == 'cycle_number' for col in missing):
+                require_full_reload(connection)
+    if 'grid_cell' not in existing:
+        print(f"🟡 {TABLE_NAME} predates the managed schema (no indexes); "
+              f"run: python -m data_pipeline.schema --migrate")
+
+
+def require_full_reload(connection):
+    """
+    Rows written before argo_profiles had cycle_number have none, and per-cycle reloads (which
+    delete by float_id and cycle_number) would add to them rather than replace them. Emptying
+    the ingest manifest makes the next ETL run a full reload, which rewrites every row.
+    """
+    from data_pipeline.ingest_manifest import MANIFEST_TABLE
+
+    if inspect(connection).has_table(MANIFEST_TABLE):
+        connection.execute(text(f"DELETE FROM {MANIFEST_TABLE}"))
+    print(f"🟡 {TABLE_NAME} holds rows without cycle_number; the ingest manifest was cleared, so the next "
+          f"python -m data_pipeline.build_database run reloads everything. Run it before any partial load.")
+
+
+# --- Migration ---
+
+def migrate_profiles_table(engine, partitioned=False, keep_old=False):
+    """
+    Rebuilds argo_profiles in the managed layout: copy into a new table, swap the two in one
+    transaction (readers see the old table until the swap), then build the indexes. A table
+    without cycle_number clears the ingest manifest in the swap (see require_full_reload).
+    Returns the rows copied.
+    """
+    from data_pipeline.profile_extractor import PROFILE_COLUMNS
+
+    partitioned = partitioned and engine.dialect.name == 'postgresql'
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {MIGRATION_TABLE}"))
+    new_table = create_profiles_table(engine, name=MIGRATION_TABLE, partitioned=partitioned, indexes=False)
+    was_partitioned = is_partitioned(engine)
+
+    existing = {col['name'] for col in inspect(engine).get_columns(TABLE_NAME)}
+    columns = [c for c in PROFILE_COLUMNS if c in existing]
+    column_list = ", ".join(columns)
+    with engine.begin() as connection:
+        if partitioned:
+            first, last = connection.execute(text(
+                f"SELECT MIN(profile_date), MAX(profile_date) FROM {TABLE_NAME}")).one()
+            if first is not None:
+                ensure_monthly_partitions(connection, first, last, name=MIGRATION_TABLE)
+        copied = connection.execute(text(
+            f"INSERT INTO {MIGRATION_TABLE} ({column_list}) SELECT {column_list} FROM {TABLE_NAME}"
+        )).rowcount
+
+    with engine.begin() as connection:
+        if 'cycle_number' not in existing:
+            require_full_reload(connection)
+        connection.execute(text(f"DROP TABLE IF EXISTS {LEGACY_TABLE}"))
+        if was_partitioned:
+            rename_partitions(connection, TABLE_NAME, TABLE_NAME, LEGACY_TABLE)
+        connection.execute(text(f"ALTER TABLE {TABLE_NAME} RENAME TO {LEGACY_TABLE}"))
+        connection.execute(text(f"ALTER TABLE {MIGRATION_TABLE} RENAME TO {TABLE_NAME}"))
+        if partitioned:
+            rename_partitions(connection, TABLE_NAME, MIGRATION_TABLE, TABLE_NAME)
+        if keep_old:
+            # Index names are per schema; the legacy table's copies of the managed ones go.
+            for index in profile_indexes(new_table):
+                connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        else:
+            connection.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+
+    table = profiles_table(indexes=False)
+    for index in profile_indexes(table):
+        index.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        connection.execute(text(f"ANALYZE {TABLE_NAME}"))
+    return copied
+
+
+def grid_cell(latitude, longitude):
+    """The grid_cell of a position, as GRID_CELL_SQL computes it (None without a position)."""
+    if latitude is None or longitude is None:
+        return None
+    row = int(math.floor(min(max(latitude, -90), 89.999) + 90))
+    return row * GRID_COLUMNS + int(math.floor(longitude + 180)) % GRID_COLUMNS
+
+
+def bbox_cell_ranges(lat_min, lat_max, lon_min, lon_max):
+    """
+    Inclusive (first, last) grid_cell ranges of the 1-degree cells covering a bbox (lon_min > lon_max
+    crosses the antimeridian): one per latitude row, two when crossing, one in all for whole rows.
+    """
+    lat_min, lat_max = max(lat_min, -90), min(lat_max, 89.999)
+    lon_min, lon_max = min(max(lon_min, -180), 179.999), min(max(lon_max, -180), 179.999)
+    first_row, last_row = int(lat_min + 90), int(lat_max + 90)
+    first_col, last_col = int(lon_min + 180) % GRID_COLUMNS, int(lon_max + 180) % GRID_COLUMNS
+    spans = [(first_col, last_col)] if lon_min <= lon_max else [(first_col, GRID_COLUMNS - 1), (0, last_col)]
+    if spans == [(0, GRID_COLUMNS - 1)]:
+        # Whole latitude rows are contiguous: one range.
+        return [(first_row * GRID_COLUMNS, last_row * GRID_COLUMNS + GRID_COLUMNS - 1)]
+    return [(row * GRID_COLUMNS + col_lo, row * GRID_COLUMNS + col_hi)
+            for row in range(first_row, last_row + 1) for col_lo, col_hi in spans]
+
+
+def bbox_grid_clause(lat_min, lat_max, lon_min, lon_max, prefix='g'):
+    """
+    SQL over grid_cell selecting the 1-degree cells that cover a bbox (lon_min > lon_max crosses
+    the antimeridian), and its parameters. It narrows the scan to the index; keep the exact
+    latitude / longitude predicates next to it.
+    """
+    ranges = bbox_cell_ranges(lat_min, lat_max, lon_min, lon_max)
+    if len(ranges) == 1:
+        return (f"grid_cell BETWEEN :{prefix}_lo AND :{prefix}_hi",
+                {f"{prefix}_lo": ranges[0][0], f"{prefix}_hi": ranges[0][1]})
+    clauses, params = [], {}
+    for i, (lo, hi) in enumerate(ranges):
+        clauses.append(f"grid_cell BETWEEN :{prefix}{i}_lo AND :{prefix}{i}_hi")
+        params[f"{prefix}{i}_lo"] = lo
+        params[f"{prefix}{i}_hi"] = hi
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def main(argv=None):
+    from data_pipeline.build_database import create_db_engine
+
+    parser = argparse.ArgumentParser(description="Inspect or migrate the argo_profiles physical schema.")
+    parser.add_argument('--status', action='store_true', help="Show the current columns and indexes.")
+    parser.add_argument('--migrate', action='store_true', help="Rebuild argo_profiles in the managed layout.")
+    parser.add_argument('--partition', choices=['none', 'monthly'], default='none',
+                        help="Monthly range partitions on profile_date (PostgreSQL only).")
+    parser.add_argument('--keep-old', action='store_true', help=f"Keep the previous table as {LEGACY_TABLE}.")
+    args = parser.parse_args(argv)
+
+    engine = create_db_engine()
+    if args.migrate:
+        copied = migrate_profiles_table(engine, partitioned=args.partition == 'monthly', keep_old=args.keep_old)
+        print(f"✅ Migrated {copied} rows into the managed {TABLE_NAME} layout.")
+    description = describe_profiles_table(engine)
+    if description is None:
+        print(f"⚠️ {TABLE_NAME} does not exist yet.")
+        return
+    print(f"📋 {TABLE_NAME}: {'managed' if description['managed'] else 'legacy'} layout"
+          f"{', partitioned by month' if description['partitioned'] else ''}")
+    for name, col_type in description['columns'].items():
+        print(f"   {name:<16} {col_type}")
+    print(f"   indexes: {', '.join(description['indexes']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
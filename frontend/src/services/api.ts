@@ -153,6 +153,11 @@ class FloatChatAPI {
 
       ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
+        // Server heartbeat: answer so the connection is not closed as idle.
+        if (data?.type === 'ping') {
+          ws.send(JSON.stringify({ type: 'pong' }));
+          return;
+        }
         onMessage(data);
       };
 